@@ -1,13 +1,30 @@
-from playwright.sync_api import sync_playwright
+"""
+登录微博并保存 Playwright 会话状态：
+    python generate_weibo_state.py                      # 单账号，写入 spiders/weibo_auth_state.json
+    python generate_weibo_state.py --name alice         # 多账号，写入 spiders/accounts/alice.json (WEIBO_ACCOUNTS_DIR)
+    python generate_weibo_state.py --output path.json   # 指定输出文件
+账号会话失效后用同一个 --name 重新运行即可，爬虫会在检测到文件更新后恢复该账号。
+"""
+import argparse
+import os
+import re
 import time
-AUTH_STATE_PATH = r"C:\Users\17193\Desktop\spider\scrapy_project\weibo_collector\spiders\weibo_auth_state.json" # 请修改为您的实际期望路径
+
+from playwright.sync_api import sync_playwright
+
+SPIDERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrapy_project", "weibo_collector", "spiders")
+AUTH_STATE_PATH = os.path.join(SPIDERS_DIR, "weibo_auth_state.json")
+ACCOUNTS_DIR = os.path.join(SPIDERS_DIR, "accounts")
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36" # 使用您常用的User-Agent
 VIEWPORT = {"width": 1920, "height": 1080}
 LOCALE = "zh-CN"
 TIMEZONE_ID = "Asia/Shanghai"
 
-def save_weibo_auth_state():
+def save_weibo_auth_state(auth_state_path=AUTH_STATE_PATH):
+    directory = os.path.dirname(auth_state_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=False, slow_mo=300)
         context = browser.new_context(
@@ -21,7 +38,7 @@ def save_weibo_auth_state():
         print("正在导航到微博登录页面 (m.weibo.cn)...")
         page.goto("https://m.weibo.cn/", wait_until="networkidle")
         print("请在弹出的浏览器窗口中手动登录微博。")
-        print(f"登录成功后，这个脚本会自动检测并保存会话状态到: {AUTH_STATE_PATH}")
+        print(f"登录成功后，这个脚本会自动检测并保存会话状态到: {auth_state_path}")
         print("如果您长时间未登录，脚本可能会超时。")
 
         try:
@@ -29,17 +46,36 @@ def save_weibo_auth_state():
 
 
             print("检测到登录成功迹象！正在保存会话状态...")
-            context.storage_state(path=AUTH_STATE_PATH)
-            print(f"会话状态已成功保存到: {AUTH_STATE_PATH}")
+            context.storage_state(path=auth_state_path)
+            print(f"会话状态已成功保存到: {auth_state_path}")
             print("您可以关闭浏览器窗口了。")
 
         except Exception as e:
             print(f"错误：未能自动检测到登录成功状态或发生超时: {e}")
             print("请确保您已在浏览器中成功登录。如果已登录，脚本可能未能正确检测到。")
             print("您可以尝试在登录后，手动修改此脚本，直接执行 context.storage_state() 保存。")
-            context.storage_state(path=AUTH_STATE_PATH)
+            context.storage_state(path=auth_state_path)
         time.sleep(10)
         browser.close()
 
+def resolve_output_path(args):
+    """--output 优先；--name 时写入账号目录下的 <名称>.json；否则为默认单账号文件"""
+    if args.output:
+        return args.output
+    if args.name:
+        if not re.fullmatch(r"[\w.-]+", args.name):
+            raise SystemExit(f"账号名称只能包含字母、数字、下划线、点和连字符: {args.name!r}")
+        return os.path.join(args.accounts_dir, f"{args.name}.json")
+    return AUTH_STATE_PATH
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="登录微博并保存 Playwright 会话状态")
+    parser.add_argument("--name", help="账号名称，保存为 <accounts-dir>/<名称>.json")
+    parser.add_argument("--accounts-dir", default=ACCOUNTS_DIR, help="多账号状态文件目录 (对应 WEIBO_ACCOUNTS_DIR)")
+    parser.add_argument("--output", help="直接指定输出文件路径")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    save_weibo_auth_state()
\ No newline at end of file
+    save_weibo_auth_state(resolve_output_path(parse_args()))
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+分析模型的持久化状态：gensim 字典、LDA 模型、聚类向量化器与质心，以及增量处理的水位线 (_id)。
+"""
+import json
+import os
+from datetime import datetime
+
+WATERMARK_FILE = "watermark.json"
+DICTIONARY_FILE = "dictionary.gensim"
+LDA_FILE = "lda.model"
+CLUSTERING_FILE = "clustering.joblib"
+
+
+class AnalysisState:
+    def __init__(self, watermark=None, dictionary=None, lda_model=None, vectorizer=None, kmeans=None):
+        self.watermark = watermark
+        self.dictionary = dictionary
+        self.lda_model = lda_model
+        self.vectorizer = vectorizer
+        self.kmeans = kmeans
+
+
+def load_analysis_state(state_dir):
+    """读取保存的状态；目录或水位线不存在时返回 None"""
+    watermark_path = os.path.join(state_dir, WATERMARK_FILE)
+    if not os.path.exists(watermark_path):
+        return None
+    with open(watermark_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    state = AnalysisState(watermark=meta.get("watermark"))
+    if os.path.exists(os.path.join(state_dir, DICTIONARY_FILE)) and os.path.exists(os.path.join(state_dir, LDA_FILE)):
+        from gensim import corpora, models
+        state.dictionary = corpora.Dictionary.load(os.path.join(state_dir, DICTIONARY_FILE))
+        state.lda_model = models.LdaMulticore.load(os.path.join(state_dir, LDA_FILE))
+    if os.path.exists(os.path.join(state_dir, CLUSTERING_FILE)):
+        import joblib
+        clustering = joblib.load(os.path.join(state_dir, CLUSTERING_FILE))
+        state.vectorizer = clustering["vectorizer"]
+        state.kmeans = clustering["kmeans"]
+    print(f"已从 {state_dir} 载入模型状态，水位线: {state.watermark} (保存于 {meta.get('updated_at')})")
+    return state
+
+
+def save_analysis_state(state_dir, state):
+    """保存状态；水位线最后写入，中途失败时下次运行仍从旧水位线开始"""
+    os.makedirs(state_dir, exist_ok=True)
+    if state.dictionary is not None and state.lda_model is not None:
+        state.dictionary.save(os.path.join(state_dir, DICTIONARY_FILE))
+        state.lda_model.save(os.path.join(state_dir, LDA_FILE))
+    if state.vectorizer is not None and state.kmeans is not None:
+        import joblib
+        joblib.dump({"vectorizer": state.vectorizer, "kmeans": state.kmeans},
+                    os.path.join(state_dir, CLUSTERING_FILE))
+    tmp_path = os.path.join(state_dir, WATERMARK_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"watermark": state.watermark, "updated_at": datetime.now().isoformat()}, f)
+    os.replace(tmp_path, os.path.join(state_dir, WATERMARK_FILE))
+    print(f"模型状态已保存到 {state_dir}，水位线: {state.watermark}")
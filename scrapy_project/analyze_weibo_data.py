@@ -1,9 +1,21 @@
+import argparse
+import copy
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
 import pymongo
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from gensim import corpora, models
-import jieba 
+from bson import ObjectId
+import scipy.sparse as sp
 import numpy as np
+from artifact_cache import ArtifactCache, load_sparse, save_sparse
+from token_store import TokenStore
+from cluster_report import build_cluster_report, print_cluster_report, write_cluster_report
+from analysis_state import AnalysisState, load_analysis_state, save_analysis_state
+from weibo_collector.dateparse import normalize_date
+# sklearn、gensim、joblib 与 pyarrow 在用到它们的阶段才导入 (合计占启动时间的大半)；
+# 分词结果已由爬虫写入 segmented_text，分析脚本不需要 jieba
 
 MONGO_URI = 'mongodb://localhost:27017'
 MONGO_DATABASE = 'weibo_data'
@@ -26,143 +38,750 @@ except Exception as e:
     print(f"分析脚本：加载停用词文件失败: {e}。将使用内置的简单列表。")
 
 
-def load_data_from_mongo():
-    """从MongoDB加载数据"""
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client[MONGO_DATABASE]
-    collection = db[POSTS_COLLECTION]
-    data = list(collection.find({"segmented_text": {"$exists": True, "$ne": []}},
-                                 {"text": 1, "segmented_text": 1, "author":1, "post_url": 1, "_id": 0}))
-    client.close()
-    print(f"从MongoDB加载了 {len(data)} 条数据进行分析。")
-    processed_texts_list = [doc.get('segmented_text', []) for doc in data]
-    processed_texts_str = [" ".join(words) for words in processed_texts_list]
-    original_texts = [doc.get('text', '') for doc in data]
-    
-    return original_texts, processed_texts_str, processed_texts_list, data
-
-
-def perform_text_clustering(texts_for_tfidf, num_clusters=5):
-    """使用TF-IDF和KMeans进行文本聚类"""
-    if not texts_for_tfidf:
+def _in_sample(doc_id, sample_rate):
+    """按 _id 哈希做确定性抽样，保证同一个流多次迭代得到相同的子集"""
+    return zlib.crc32(str(doc_id).encode('utf-8')) < sample_rate * 0x100000000
+
+
+class PostStream:
+    """
+    可重复迭代的帖子流：每次迭代都重新打开 MongoDB 游标，按 chunk_size 分块读取，
+    只取需要的字段，因此内存占用取决于块大小而不是语料规模。
+    """
+    def __init__(self, chunk_size=5000, start_date=None, end_date=None, keyword=None, sample_rate=None,
+                 fields=("text", "segmented_text", "author", "post_url"), after_id=None, until_id=None):
+        self.chunk_size = chunk_size
+        self.after_id = after_id
+        self.until_id = until_id
+        # 爬虫存的是北京时间的 aware datetime；不带时区的边界也按北京时间解释，而不是被 pymongo 当作 UTC
+        self.start_date = normalize_date(start_date) if start_date else None
+        self.end_date = normalize_date(end_date) if end_date else None
+        self.keyword = keyword
+        self.sample_rate = sample_rate
+        self.fields = fields
+
+    def query(self):
+        query = {"segmented_text": {"$exists": True, "$ne": []}}
+        if self.start_date or self.end_date:
+            query["date"] = {}
+            if self.start_date:
+                query["date"]["$gte"] = self.start_date
+            if self.end_date:
+                query["date"]["$lt"] = self.end_date
+        if self.keyword:
+            query["keyword"] = self.keyword
+        if self.after_id or self.until_id:
+            query["_id"] = {}
+            if self.after_id:
+                query["_id"]["$gt"] = ObjectId(self.after_id)
+            if self.until_id:
+                query["_id"]["$lte"] = ObjectId(self.until_id)
+        return query
+
+    def restricted(self, after_id=None, until_id=None, fields=None):
+        """返回相同过滤条件、但限定 _id 区间 (after_id, until_id] 的新流"""
+        stream = copy.copy(self)
+        stream.after_id = after_id
+        stream.until_id = until_id
+        stream.fields = fields or self.fields
+        return stream
+
+    def find_by_ids(self, ids):
+        """按 _id 批量取回文档 (只取 fields 中的字段)，返回 {str(_id): 文档}"""
+        if not ids:
+            return {}
+        client = pymongo.MongoClient(MONGO_URI)
+        try:
+            projection = {field: 1 for field in self.fields}
+            keys = [ObjectId(doc_id) if ObjectId.is_valid(doc_id) else doc_id for doc_id in ids]
+            cursor = client[MONGO_DATABASE][POSTS_COLLECTION].find({"_id": {"$in": keys}}, projection)
+            return {str(doc["_id"]): doc for doc in cursor}
+        finally:
+            client.close()
+
+    def latest_id(self):
+        """当前符合条件的最大 _id，用来冻结本次分析的文档集合并作为下一次增量的水位线"""
+        client = pymongo.MongoClient(MONGO_URI)
+        try:
+            doc = client[MONGO_DATABASE][POSTS_COLLECTION].find_one(
+                self.query(), {"_id": 1}, sort=[("_id", pymongo.DESCENDING)])
+        finally:
+            client.close()
+        return str(doc["_id"]) if doc else None
+
+    def count(self):
+        client = pymongo.MongoClient(MONGO_URI)
+        try:
+            total = client[MONGO_DATABASE][POSTS_COLLECTION].count_documents(self.query())
+        finally:
+            client.close()
+        if self.sample_rate:
+            total = int(total * self.sample_rate)
+        return total
+
+    def iter_chunks(self):
+        """按块产出文档列表"""
+        client = pymongo.MongoClient(MONGO_URI)
+        try:
+            projection = {field: 1 for field in self.fields}
+            cursor = (client[MONGO_DATABASE][POSTS_COLLECTION]
+                      .find(self.query(), projection, batch_size=self.chunk_size)
+                      .sort("_id", pymongo.ASCENDING))
+            chunk = []
+            for doc in cursor:
+                if self.sample_rate and not _in_sample(doc["_id"], self.sample_rate):
+                    continue
+                chunk.append(doc)
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            client.close()
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def token_store(self):
+        """只读取分词字段，一次遍历编码为 TokenStore"""
+        return TokenStore.build(self.restricted(self.after_id, self.until_id, fields=("segmented_text",)))
+
+
+class ParquetPostStream(PostStream):
+    """
+    从 posts_dataset.py 导出的 Parquet 快照读取帖子，接口与 PostStream 相同。
+    文件以内存映射方式打开，过滤条件 (日期、关键词、_id 区间) 下推给 Arrow，不访问 MongoDB。
+    """
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        from posts_dataset import open_dataset
+        self.dataset = open_dataset(path)
+
+    def expression(self):
+        from posts_dataset import dataset_filter
+        return dataset_filter(start_date=self.start_date, end_date=self.end_date, keyword=self.keyword,
+                              after_id=self.after_id, until_id=self.until_id)
+
+    def _columns(self):
+        return ["_id"] + [field for field in self.fields if field != "_id"]
+
+    def _batches(self, columns):
+        """
+        按过滤条件产出 RecordBatch。有日期条件时，导出时未能识别日期的旧数据由 Arrow 一并放行，
+        这里用 posts_dataset.date_mask 成批重新解析后再按起止日期筛掉
+        """
+        from posts_dataset import date_mask
+        dated = bool(self.start_date or self.end_date)
+        scan = columns + [name for name in ("date", "date_raw", "fetched_at") if dated and name not in columns]
+        for batch in self.dataset.to_batches(columns=scan, filter=self.expression(), batch_size=self.chunk_size):
+            if dated:
+                batch = batch.filter(date_mask(batch, self.start_date, self.end_date)).select(columns)
+            yield batch
+
+    def count(self):
+        if self.start_date or self.end_date:
+            total = sum(batch.num_rows for batch in self._batches(["_id"]))
+        else:
+            total = self.dataset.count_rows(filter=self.expression())
+        if self.sample_rate:
+            total = int(total * self.sample_rate)
+        return total
+
+    def iter_chunks(self):
+        chunk = []
+        for batch in self._batches(self._columns()):
+            for doc in batch.to_pylist():
+                if self.sample_rate and not _in_sample(doc["_id"], self.sample_rate):
+                    continue
+                chunk.append(doc)
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def latest_id(self):
+        import pyarrow.compute as pc
+        ids = [pc.max(batch.column("_id")).as_py() for batch in self._batches(["_id"]) if batch.num_rows]
+        return max(ids) if ids else None
+
+    def find_by_ids(self, ids):
+        if not ids:
+            return {}
+        import pyarrow.compute as pc
+        table = self.dataset.to_table(columns=self._columns(), filter=pc.field("_id").isin(list(ids)))
+        return {doc["_id"]: doc for doc in table.to_pylist()}
+
+
+def _cached_stage(cache, stage, fingerprint, params, compute, save, load):
+    """
+    带缓存地执行一个分析阶段：命中时 load(path) 读回产物；未命中时 compute()，
+    成功后 save(result, directory) 写入缓存并重新以内存映射方式读回。没有缓存或指纹时直接计算。
+    """
+    if cache is None or fingerprint is None:
+        return compute()
+    key = cache.key(stage, fingerprint, **params)
+    path = cache.get(stage, key)
+    if path is not None:
+        return load(path)
+    result = compute()
+    if result is None:
+        return None
+    path = cache.put(stage, key, lambda directory: save(result, directory))
+    return load(path) if path is not None else result
+
+
+def _save_tfidf(result, directory):
+    import joblib
+    tfidf_matrix, vectorizer = result
+    save_sparse(directory, "tfidf", tfidf_matrix)
+    joblib.dump(vectorizer, os.path.join(directory, "vectorizer.joblib"))
+
+
+def _load_tfidf(directory):
+    import joblib
+    return load_sparse(directory, "tfidf"), joblib.load(os.path.join(directory, "vectorizer.joblib"))
+
+
+def _save_clustering(result, directory):
+    import joblib
+    labels, vectorizer, kmeans = result
+    np.save(os.path.join(directory, "labels.npy"), np.asarray(labels, dtype=np.int32))
+    joblib.dump({"vectorizer": vectorizer, "kmeans": kmeans}, os.path.join(directory, "clustering.joblib"))
+
+
+def _load_clustering(directory):
+    import joblib
+    saved = joblib.load(os.path.join(directory, "clustering.joblib"))
+    return (np.load(os.path.join(directory, "labels.npy"), mmap_mode="r"),
+            saved["vectorizer"], saved["kmeans"])
+
+
+def _stop_words_digest():
+    return zlib.crc32("\x1f".join(sorted(STOP_WORDS)).encode("utf-8"))
+
+
+class _StoreTfidf:
+    """固定 IDF 的向量化器基类：子类给出 TokenStore 词 id 到特征列的映射，即可逐块直接向量化 TokenStore"""
+    def weight(self, counts):
+        from sklearn.preprocessing import normalize
+        return normalize(counts.multiply(self.idf).tocsr())
+
+    @property
+    def num_features(self):
+        return len(self.idf)
+
+    def count_store(self, store, chunk_size=5000):
+        """逐块产出 TokenStore 在本向量化器特征空间中的词频矩阵 (未加权)"""
+        return store.iter_count_chunks(chunk_size, self.columns_for(store.vocab), self.num_features)
+
+    def transform_store(self, store, chunk_size=5000):
+        for counts in self.count_store(store, chunk_size):
+            yield self.weight(counts)
+
+
+class VocabTfidf(_StoreTfidf):
+    """
+    固定词表 + IDF 的向量化器，行为与 TfidfVectorizer(tokenizer=str.split, lowercase=True) 的 transform() 一致，
+    由 TokenStore 上的词频矩阵拟合得到，可被持久化。
+    """
+    def __init__(self, vocabulary, idf):
+        self.vocabulary = vocabulary
+        self.idf = idf
+
+    def columns_for(self, vocab):
+        return np.array([self.vocabulary.get(token.lower(), -1) for token in vocab], dtype=np.int64)
+
+    def feature_names(self, vocab=None, term_frequencies=None):
+        names = np.empty(self.num_features, dtype=object)
+        for term, column in self.vocabulary.items():
+            names[column] = term
+        return names
+
+    def transform(self, texts):
+        indices, indptr = [], [0]
+        for text in texts:
+            indices.extend(column for column in (self.vocabulary.get(token.lower()) for token in text.split())
+                           if column is not None)
+            indptr.append(len(indices))
+        counts = sp.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(indptr) - 1, len(self.idf)))
+        counts.sum_duplicates()
+        return self.weight(counts)
+
+
+def _fit_vocab_tfidf(store, max_df=0.95, min_df=2):
+    """
+    在 TokenStore 上拟合 TF-IDF：词先按小写合并并去掉停用词，再按 min_df/max_df 过滤，
+    idf 与 TfidfVectorizer(smooth_idf=True) 相同。返回 (tfidf 矩阵, VocabTfidf)，没有可用特征时返回 None。
+    """
+    terms = {}
+    columns = np.empty(len(store.vocab), dtype=np.int64)
+    for token_id, token in enumerate(store.vocab):
+        term = token.lower()
+        columns[token_id] = -1 if term in STOP_WORDS else terms.setdefault(term, len(terms))
+    counts = store.count_matrix(columns, len(terms))
+    doc_freq = np.bincount(counts.indices, minlength=len(terms))
+    keep = (doc_freq >= min_df) & (doc_freq <= max_df * store.num_docs)
+    if not keep.any():
+        return None
+    new_columns = np.cumsum(keep) - 1
+    vocabulary = {term: int(new_columns[column]) for term, column in terms.items() if keep[column]}
+    idf = np.log((1 + store.num_docs) / (1 + doc_freq[keep])) + 1
+    vectorizer = VocabTfidf(vocabulary, idf)
+    return vectorizer.weight(counts[:, keep]), vectorizer
+
+
+def perform_text_clustering(store, num_clusters=5, stats=None, cache=None, fingerprint=None):
+    """在 TokenStore 上用 TF-IDF 和 KMeans 进行文本聚类；传入 cache 与语料指纹时复用缓存的 TF-IDF 矩阵与聚类结果"""
+    if not store.num_docs:
         print("没有足够的文本数据进行聚类。")
-        return None, None
+        return None, None, None
 
     print(f"\n开始文本聚类 (K={num_clusters})...")
-    vectorizer = TfidfVectorizer(max_df=0.95, min_df=2, 
-                                 stop_words=list(STOP_WORDS), 
-                                 tokenizer=lambda x: x.split(), 
-                                 token_pattern=None) 
-    try:
-        tfidf_matrix = vectorizer.fit_transform(texts_for_tfidf)
-    except ValueError as e:
-        print(f"TF-IDF向量化失败: {e}. 可能因为所有词都是停用词或不符合min_df/max_df条件。")
-        return None, None
+    tfidf_params = {"max_df": 0.95, "min_df": 2, "stop_words": _stop_words_digest()}
+    start = time.perf_counter()
+
+    def vectorize():
+        result = _fit_vocab_tfidf(store, max_df=0.95, min_df=2)
+        if result is None:
+            print("TF-IDF向量化失败: 可能因为所有词都是停用词或不符合min_df/max_df条件。")
+        return result
+
+    result = _cached_stage(cache, "tfidf", fingerprint, tfidf_params, vectorize, _save_tfidf, _load_tfidf)
+    if result is None:
+        return None, None, None
+    tfidf_matrix, vectorizer = result
 
     if tfidf_matrix.shape[0] < num_clusters:
         print(f"警告: 文档数量 ({tfidf_matrix.shape[0]}) 少于聚类数量 ({num_clusters}). 将减少聚类数量。")
         num_clusters = max(1, tfidf_matrix.shape[0]) 
         if num_clusters == 0:
              print("没有可聚类的文档。")
-             return None, None
+             return None, None, None
+
+    def fit():
+        from sklearn.cluster import KMeans
+        kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init='auto')
+        try:
+            kmeans.fit(tfidf_matrix)
+        except Exception as e:
+            print(f"KMeans 拟合失败: {e}")
+            return None
+        return kmeans.labels_, vectorizer, kmeans
+
+    result = _cached_stage(cache, "clustering", fingerprint, dict(tfidf_params, engine="full", num_clusters=num_clusters),
+                           fit, _save_clustering, _load_clustering)
+    if result is None:
+        return None, None, None
+
+    print("文本聚类完成。")
+    _print_clustering_stats("full", time.perf_counter() - start, result[2].inertia_, stats)
+    return result
 
 
-    kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init='auto')
+def _peak_rss_mb():
+    """当前进程的峰值常驻内存 (MB)，无法获取时返回 None"""
     try:
-        kmeans.fit(tfidf_matrix)
-    except Exception as e:
-        print(f"KMeans 拟合失败: {e}")
-        return None, None
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def _print_clustering_stats(engine, fit_seconds, inertia, stats=None):
+    """打印拟合耗时、峰值内存与 inertia；传入 stats 字典时一并写入，供基准脚本读取"""
+    peak = _peak_rss_mb()
+    if stats is not None:
+        stats.update({"engine": engine, "fit_seconds": fit_seconds, "peak_rss_mb": peak, "inertia": float(inertia)})
+    peak_str = f"{peak:.1f} MB" if peak is not None else "未知"
+    print(f"聚类引擎: {engine}, 拟合耗时: {fit_seconds:.2f}s, 峰值内存: {peak_str}, inertia: {inertia:.4f}")
+
+
+def _hashed_columns(hasher, vocab):
+    """每个词单独作为一篇"文档"哈希得到列号；停用词得到空行，映射为 -1"""
+    columns = np.full(len(vocab), -1, dtype=np.int64)
+    if not vocab:
+        return columns
+    hashed = hasher.transform(vocab)
+    has_column = np.diff(hashed.indptr) > 0
+    columns[has_column] = hashed.indices[hashed.indptr[:-1][has_column]]
+    return columns
+
+
+class HashingTfidf(_StoreTfidf):
+    """哈希特征 + 固定 IDF 权重的向量化器，与 TfidfVectorizer 一样提供 transform()，可被持久化"""
+    def __init__(self, hasher, idf):
+        self.hasher = hasher
+        self.idf = idf
+
+    def transform(self, texts):
+        return self.weight(self.hasher.transform(texts))
+
+    def columns_for(self, vocab):
+        return _hashed_columns(self.hasher, vocab)
+
+    def feature_names(self, vocab, term_frequencies):
+        """哈希列没有名字，用落在该列上出现次数最多的词代表它"""
+        names = np.full(self.num_features, "", dtype=object)
+        best = np.zeros(self.num_features, dtype=np.int64)
+        for token, column, count in zip(vocab, self.columns_for(vocab), term_frequencies):
+            if column >= 0 and count > best[column]:
+                names[column] = token
+                best[column] = count
+        return names
+
+
+def perform_streaming_clustering(store, num_clusters=5, n_features=2 ** 18, min_df=2, max_df=0.95, stats=None,
+                                 cache=None, fingerprint=None, chunk_size=5000):
+    """流式聚类；传入 cache 与语料指纹时，语料与参数不变即直接读回上次的标签与模型"""
+    params = {"engine": "minibatch", "num_clusters": num_clusters, "n_features": n_features,
+              "min_df": min_df, "max_df": max_df, "stop_words": _stop_words_digest()}
+    result = _cached_stage(cache, "clustering", fingerprint, params,
+                           lambda: _fit_streaming_clustering(store, num_clusters, n_features, min_df, max_df, stats,
+                                                             chunk_size),
+                           _save_clustering, _load_clustering)
+    return result if result is not None else (None, None, None)
+
+
+def _fit_streaming_clustering(store, num_clusters, n_features, min_df, max_df, stats, chunk_size):
+    """
+    Out-of-core 聚类：HashingVectorizer + IDF 加权 + MiniBatchKMeans.partial_fit，逐块消费 TokenStore 的行区间。
+    词表中的每个词只哈希一次得到列号，之后各遍都是整数映射；第一遍统计文档频率，第二遍增量拟合，
+    第三遍分配标签并累计 inertia，额外内存只与块大小和特征维度有关。
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.feature_extraction.text import HashingVectorizer
+    hasher = HashingVectorizer(n_features=n_features,
+                               stop_words=list(STOP_WORDS),
+                               tokenizer=str.split,
+                               token_pattern=None,
+                               alternate_sign=False,
+                               norm=None)
+
+    columns = _hashed_columns(hasher, store.vocab)
+
+    def chunk_matrices():
+        return store.iter_count_chunks(chunk_size, columns, n_features)
+
+    print(f"\n开始流式文本聚类 (K={num_clusters}, 特征维度={n_features})...")
+    start = time.perf_counter()
+    doc_freq = np.zeros(n_features, dtype=np.int64)
+    num_docs = 0
+    for matrix in chunk_matrices():
+        doc_freq += np.bincount(matrix.indices, minlength=n_features)
+        num_docs += matrix.shape[0]
+    if num_docs == 0:
+        print("没有足够的文本数据进行聚类。")
+        return None
+    if num_docs < num_clusters:
+        print(f"警告: 文档数量 ({num_docs}) 少于聚类数量 ({num_clusters}). 将减少聚类数量。")
+        num_clusters = num_docs
+
+    # 与 TfidfVectorizer(smooth_idf=True) 相同的 idf，并按 min_df/max_df 屏蔽特征
+    idf = np.log((1 + num_docs) / (1 + doc_freq)) + 1
+    idf[(doc_freq < min_df) | (doc_freq > max_df * num_docs)] = 0
+    if not idf.any():
+        print("TF-IDF向量化失败: 所有特征都不符合min_df/max_df条件。")
+        return None
+
+    vectorizer = HashingTfidf(hasher, idf)
+
+    def tfidf_chunks():
+        for matrix in chunk_matrices():
+            yield vectorizer.weight(matrix)
+
+    kmeans = MiniBatchKMeans(n_clusters=num_clusters, random_state=42, n_init=3,
+                             batch_size=max(1024, num_clusters * 3))
+    pending = []
+    pending_rows = 0
+    fitted = False
+    for matrix in tfidf_chunks():
+        # partial_fit 首次调用需要至少 n_clusters 个样本，不足时先攒几块
+        if not fitted and pending_rows + matrix.shape[0] < num_clusters:
+            pending.append(matrix)
+            pending_rows += matrix.shape[0]
+            continue
+        if pending:
+            matrix = sp.vstack(pending + [matrix]).tocsr()
+            pending = []
+        kmeans.partial_fit(matrix)
+        fitted = True
+    if pending:
+        kmeans.partial_fit(sp.vstack(pending).tocsr())
+
+    labels = np.empty(num_docs, dtype=np.int32)
+    inertia = 0.0
+    offset = 0
+    for matrix in tfidf_chunks():
+        chunk_labels = kmeans.predict(matrix)
+        labels[offset:offset + matrix.shape[0]] = chunk_labels
+        inertia += -kmeans.score(matrix)
+        offset += matrix.shape[0]
 
     print("文本聚类完成。")
-    return kmeans.labels_, vectorizer 
+    _print_clustering_stats("minibatch", time.perf_counter() - start, inertia, stats)
+    return labels[:offset], vectorizer, kmeans
+
+
+def _save_bow(result, directory):
+    from gensim import corpora
+    dictionary, corpus = result
+    dictionary.save(os.path.join(directory, "dictionary.gensim"))
+    corpora.MmCorpus.serialize(os.path.join(directory, "corpus.mm"), corpus)
+
 
-def perform_topic_modeling(tokenized_texts_list, num_topics=5, num_words=10):
-    """使用Gensim进行LDA主题建模"""
-    if not tokenized_texts_list or not any(tokenized_texts_list):
+def _load_bow(directory):
+    from gensim import corpora
+    return (corpora.Dictionary.load(os.path.join(directory, "dictionary.gensim")),
+            corpora.MmCorpus(os.path.join(directory, "corpus.mm")))
+
+
+def perform_topic_modeling(store, num_topics=5, num_words=10, cache=None, fingerprint=None):
+    """
+    使用Gensim进行LDA主题建模。字典与 BoW 语料直接由 TokenStore 的频次与词 id 生成；
+    传入 cache 与语料指纹时，二者序列化为 MmCorpus 缓存，模型本身也按参数缓存。
+    """
+    if not store.num_docs:
         print("没有足够的文本数据进行主题建模。")
         return None, None
+    from gensim import models
 
     print(f"\n开始主题建模 (Topics={num_topics})...")
-    dictionary = corpora.Dictionary(tokenized_texts_list)
-    dictionary.filter_extremes(no_below=2, no_above=0.95)
-    if not dictionary:
-        print("Gensim 字典为空，无法创建语料库。可能所有词都被过滤掉了。")
-        return None, None
+    dictionary_params = {"no_below": 2, "no_above": 0.95}
+
+    def build_bow():
+        dictionary, columns = store.gensim_dictionary(**dictionary_params)
+        if not dictionary:
+            print("Gensim 字典为空，无法创建语料库。可能所有词都被过滤掉了。")
+            return None
+        return dictionary, store.bow_corpus(columns, len(dictionary))
 
-    corpus = [dictionary.doc2bow(text) for text in tokenized_texts_list]
-    corpus = [doc for doc in corpus if doc] 
-    if not corpus:
+    result = _cached_stage(cache, "bow", fingerprint, dictionary_params, build_bow, _save_bow, _load_bow)
+    if result is None:
+        return None, None
+    dictionary, corpus = result
+    if next(iter(corpus), None) is None:
         print("Gensim 语料库为空，无法进行主题建模。")
         return None, None
 
-    try:
-        lda_model = models.LdaMulticore(corpus=corpus,
-                                        id2word=dictionary,
-                                        num_topics=num_topics,
-                                        random_state=42,
-                                        chunksize=100,
-                                        passes=10,
-                                        alpha='asymmetric', 
-                                        eta='auto',
-                                        per_word_topics=True) 
-    except Exception as e:
-        print(f"LDA 模型训练失败: {e}")
+    lda_params = dict(num_topics=num_topics,
+                      random_state=42,
+                      chunksize=100,
+                      passes=10,
+                      alpha='asymmetric',
+                      eta='auto',
+                      per_word_topics=True)
+
+    def train():
+        try:
+            return models.LdaMulticore(corpus=corpus, id2word=dictionary, **lda_params)
+        except Exception as e:
+            print(f"LDA 模型训练失败: {e}")
+            return None
+
+    lda_model = _cached_stage(cache, "lda", fingerprint, dict(lda_params, **dictionary_params), train,
+                              lambda model, directory: model.save(os.path.join(directory, "lda.model")),
+                              lambda directory: models.LdaMulticore.load(os.path.join(directory, "lda.model"), mmap='r'))
+    if lda_model is None:
         return None, None
 
     print("主题建模完成。")
     return lda_model, dictionary
 
-def main():
-    original_texts, processed_texts_str, processed_texts_list, all_data_docs = load_data_from_mongo()
 
-    if not original_texts:
+def update_topic_model(lda_model, dictionary, new_store):
+    """
+    增量更新 LDA：新文档先 add_documents 进字典 (累计词频，新词留待下次全量重建时纳入)，
+    再只用模型已知的词 id 组成 BoW 调用 update()。这里不能 filter_extremes，否则会重排已有词 id；
+    add_documents 默认在词表超过 prune_at 时也会剪枝并重排 id，所以关掉。
+    """
+    dictionary.add_documents(new_store.documents(), prune_at=None)
+    num_terms = lda_model.num_terms
+    columns = np.array([dictionary.token2id.get(token, -1) for token in new_store.vocab], dtype=np.int64)
+    columns[columns >= num_terms] = -1
+    corpus = new_store.bow_corpus(columns, num_terms)
+    if next(iter(corpus), None) is None:
+        print("新增文档中没有模型已知的词，跳过 LDA 增量更新。")
+        return lda_model
+    lda_model.update(corpus)
+    print("LDA 模型增量更新完成。")
+    return lda_model
+
+
+def assign_clusters(vectorizer, kmeans, store, chunk_size=5000):
+    """用已保存的向量化器与质心为新文档分配簇，MiniBatchKMeans 同时用新文档 partial_fit 更新质心"""
+    from sklearn.cluster import MiniBatchKMeans
+    labels = []
+    for matrix in vectorizer.transform_store(store, chunk_size):
+        if isinstance(kmeans, MiniBatchKMeans) and matrix.shape[0] >= kmeans.n_clusters:
+            kmeans.partial_fit(matrix)
+        labels.append(kmeans.predict(matrix))
+    return np.concatenate(labels) if labels else np.empty(0, dtype=np.int32)
+
+
+def _date_arg(value):
+    """命令行日期：与爬虫共用 dateparse 的写法 (2026-10-01、2026-10-01 08:00、3天前 等)，不带时区的按北京时间"""
+    parsed = normalize_date(value)
+    if parsed is None:
+        try:
+            parsed = normalize_date(datetime.fromisoformat(value))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"无法识别的日期: {value}")
+    return parsed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="微博数据分析：文本聚类、LDA 主题建模与高频词统计")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="从 MongoDB 分块读取的文档数")
+    parser.add_argument("--start-date", type=_date_arg,
+                        help="只分析该时间 (北京时间) 之后发布的帖子，如 2026-10-01、\"2026-10-01 08:00\"、7天前")
+    parser.add_argument("--end-date", type=_date_arg, help="只分析该时间 (北京时间) 之前发布的帖子")
+    parser.add_argument("--keyword", help="只分析该搜索关键词抓到的帖子")
+    parser.add_argument("--dataset", help="从 posts_dataset.py 导出的 Parquet 快照读取，而不是查询 MongoDB")
+    parser.add_argument("--sample-rate", type=float, help="按比例 (0-1] 确定性抽样")
+    parser.add_argument("--cluster-engine", choices=("full", "minibatch"), default="full",
+                        help="full: TF-IDF + KMeans 全量拟合; minibatch: 哈希特征 + MiniBatchKMeans 流式拟合")
+    parser.add_argument("--hash-features", type=int, default=2 ** 18, help="minibatch 引擎的哈希特征维度")
+    parser.add_argument("--incremental", action="store_true",
+                        help="使用并更新持久化的模型状态，只处理水位线之后的新文档 (首次运行时全量构建)")
+    parser.add_argument("--full-rebuild", action="store_true", help="与 --incremental 同用时忽略已有状态，全量重建")
+    parser.add_argument("--state-dir", default="analysis_models", help="模型状态与水位线的保存目录")
+    parser.add_argument("--cache-dir", default="analysis_cache", help="分析阶段产物缓存目录")
+    parser.add_argument("--cache-max-mb", type=int, default=2048, help="产物缓存的总大小上限 (MB)，超出后按 LRU 淘汰")
+    parser.add_argument("--no-cache", action="store_true", help="不读写产物缓存")
+    parser.add_argument("--num-words", type=int, default=10, help="每个主题打印的词数")
+    parser.add_argument("--samples-per-cluster", type=int, default=5, help="每个簇打印的代表帖子数 (离质心最近)")
+    parser.add_argument("--top-terms", type=int, default=10, help="每个簇展示的质心高权重词数")
+    parser.add_argument("--report-path", default="cluster_report.json", help="聚类报告 JSON 的输出路径")
+    return parser.parse_args(argv)
+
+
+def report_clusters(labels, vectorizer, kmeans, store, stream, engine, args):
+    """生成聚类报告：控制台打印并写出 JSON"""
+    start = time.perf_counter()
+    report = build_cluster_report(labels, vectorizer, kmeans, store, stream.find_by_ids, engine,
+                                  top_terms=args.top_terms, samples=args.samples_per_cluster,
+                                  chunk_size=args.chunk_size)
+    print_cluster_report(report)
+    print(f"\n聚类报告生成耗时: {time.perf_counter() - start:.2f}s")
+    write_cluster_report(report, args.report_path)
+    return report
+
+
+def print_topics(lda_model, num_words=10):
+    print("\n--- LDA 主题模型结果 ---")
+    topics = lda_model.print_topics(num_words=num_words)
+    for topic_num, topic_words in topics:
+        print(f"Topic #{topic_num}: {topic_words}")
+
+
+def print_top_words(store, top=20):
+    top_words = store.top_terms(top)
+    if top_words:
+        print(f"\n--- 高频词 Top {top} ---")
+        for word, count in top_words:
+            print(f"{word}: {count}")
+
+
+def run_incremental(stream, state, until_id, args):
+    """只处理水位线之后的新文档：分配到已有簇、增量更新 LDA，然后推进水位线"""
+    new_stream = stream.restricted(after_id=state.watermark, until_id=until_id)
+    new_docs = new_stream.count()
+    print(f"增量模式: 水位线 {state.watermark} 之后新增约 {new_docs} 条数据。")
+    if not new_docs:
+        print("没有新数据，模型保持不变。")
+        return
+    new_store = new_stream.token_store()
+    if state.kmeans is not None:
+        cluster_labels = assign_clusters(state.vectorizer, state.kmeans, new_store, args.chunk_size)
+        report_clusters(cluster_labels, state.vectorizer, state.kmeans, new_store, new_stream, "incremental", args)
+    if state.lda_model is not None:
+        update_topic_model(state.lda_model, state.dictionary, new_store)
+        print_topics(state.lda_model, args.num_words)
+    print_top_words(new_store)
+    state.watermark = until_id
+    save_analysis_state(args.state_dir, state)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stream_kwargs = dict(chunk_size=args.chunk_size, start_date=args.start_date, end_date=args.end_date,
+                         keyword=args.keyword, sample_rate=args.sample_rate)
+    if args.dataset:
+        stream = ParquetPostStream(args.dataset, **stream_kwargs)
+        print(f"数据来源: Parquet 快照 {args.dataset}")
+    else:
+        stream = PostStream(**stream_kwargs)
+    # 冻结本次分析的文档集合，避免爬虫并发写入导致多遍迭代看到的数据不一致
+    until_id = stream.latest_id()
+    if until_id is None:
+        print("未能从MongoDB加载到任何有效数据。请检查爬虫是否成功运行并存储了数据。")
+        return
+    stream = stream.restricted(until_id=until_id)
+
+    if args.incremental and not args.full_rebuild:
+        state = load_analysis_state(args.state_dir)
+        if state is not None:
+            run_incremental(stream, state, until_id, args)
+            return
+        print(f"未在 {args.state_dir} 找到已保存的模型状态，执行全量构建。")
+
+    total_docs = stream.count()
+    print(f"符合条件的数据约 {total_docs} 条，将按每块 {args.chunk_size} 条流式读取。")
+
+    if not total_docs:
         print("未能从MongoDB加载到任何有效数据。请检查爬虫是否成功运行并存储了数据。")
         return
     num_clusters = 5 
-    if len(original_texts) < num_clusters: 
-        num_clusters = max(1, len(original_texts))
+    if total_docs < num_clusters:
+        num_clusters = max(1, total_docs)
 
-    cluster_labels, vectorizer = perform_text_clustering(processed_texts_str, num_clusters=num_clusters)
+    # 只读一遍分词，编码为各阶段共用的 TokenStore，同时得到语料指纹
+    store = stream.token_store()
+    print(f"分词存储: {store.num_docs} 篇文档, {len(store.token_ids)} 个词, 词表 {len(store.vocab)}")
+    cache = fingerprint = None
+    if not args.no_cache:
+        cache = ArtifactCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 ** 2)
+        fingerprint = store.fingerprint
+        print(f"语料指纹: {fingerprint}")
+        # 持久化为 .npy 后改用内存映射的版本，释放构建时的堆内存
+        store = _cached_stage(cache, "tokens", fingerprint, {}, lambda: store,
+                              lambda result, directory: result.save(directory), TokenStore.load)
+
+    if args.cluster_engine == "minibatch":
+        cluster_labels, vectorizer, kmeans = perform_streaming_clustering(store, num_clusters=num_clusters,
+                                                                          n_features=args.hash_features,
+                                                                          cache=cache, fingerprint=fingerprint,
+                                                                          chunk_size=args.chunk_size)
+    else:
+        cluster_labels, vectorizer, kmeans = perform_text_clustering(store, num_clusters=num_clusters,
+                                                                     cache=cache, fingerprint=fingerprint)
 
     if cluster_labels is not None and vectorizer is not None:
-        print("\n--- 文本聚类结果 ---")
-        for i, doc in enumerate(all_data_docs):
-            if i < len(cluster_labels):
-                doc['cluster_label'] = int(cluster_labels[i])
-        terms = vectorizer.get_feature_names_out()
-        order_centroids = None
-        if hasattr(vectorizer, 'cluster_centers_'):
-             pass
-
-        for i in range(num_clusters):
-            print(f"\nCluster {i}:")
-            cluster_docs = [(doc.get('author', '未知'), doc.get('text', '')[:100]+"...", doc.get('post_url', ''))
-                            for doc_idx, doc in enumerate(all_data_docs)
-                            if doc_idx < len(cluster_labels) and cluster_labels[doc_idx] == i]
-            for author, text_preview, url in cluster_docs[:5]:
-                print(f"  - 作者: {author}, 内容: {text_preview}, 链接: {url}")
+        report_clusters(cluster_labels, vectorizer, kmeans, store, stream, args.cluster_engine, args)
     num_topics = 5
-    lda_model, dictionary = perform_topic_modeling(processed_texts_list, num_topics=num_topics)
+    lda_model, dictionary = perform_topic_modeling(store, num_topics=num_topics,
+                                                   cache=cache, fingerprint=fingerprint)
 
     if lda_model and dictionary:
-        print("\n--- LDA 主题模型结果 ---")
-        topics = lda_model.print_topics(num_words=10)
-        for topic_num, topic_words in topics:
-            print(f"Topic #{topic_num}: {topic_words}")
-    from collections import Counter
-    all_words = [word for sublist in processed_texts_list for word in sublist]
-    if all_words:
-        word_counts = Counter(all_words)
-        print("\n--- 高频词 Top 20 ---")
-        for word, count in word_counts.most_common(20):
-            print(f"{word}: {count}")
+        print_topics(lda_model, args.num_words)
+    print_top_words(store)
+    if cache is not None:
+        print(cache.summary())
 
-if __name__ == "__main__":
-    try:
-        jieba.initialize()
-        print("Jieba 初始化完成。")
-    except Exception as e:
-        print(f"Jieba 初始化或加载用户词典失败: {e}")
+    if args.incremental:
+        save_analysis_state(args.state_dir, AnalysisState(
+            watermark=until_id, dictionary=dictionary, lda_model=lda_model, vectorizer=vectorizer, kmeans=kmeans))
 
+if __name__ == "__main__":
     main()
\ No newline at end of file
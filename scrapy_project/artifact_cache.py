@@ -0,0 +1,134 @@
+"""
+分析阶段的内容寻址产物缓存。
+
+每个阶段的产物 (TF-IDF 矩阵、gensim 字典与 BoW 语料、模型、标签) 存放在 cache_dir/<stage>-<key>/ 下，
+key 由语料指纹 (各文档 _id + 分词内容的哈希) 与阶段参数共同算出：语料或参数不变即命中，直接内存映射读回。
+目录总大小超过上限时按最近访问时间 (LRU) 淘汰。
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+META_FILE = "meta.json"
+
+
+class CorpusFingerprint:
+    """逐文档累加 _id 与分词内容的哈希，得到整个语料的指纹"""
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+        self.num_docs = 0
+
+    def update(self, doc_id, tokens):
+        self._hash.update(str(doc_id).encode("utf-8"))
+        self._hash.update(b"\x1e")
+        self._hash.update("\x1f".join(tokens).encode("utf-8"))
+        self._hash.update(b"\x1d")
+        self.num_docs += 1
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(stage, fingerprint, **params):
+        """语料指纹 + 阶段名 + 参数 (按名称排序) 的哈希"""
+        payload = json.dumps({"stage": stage, "corpus": fingerprint, "params": params},
+                             sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+    def _path(self, stage, key):
+        return os.path.join(self.cache_dir, f"{stage}-{key}")
+
+    def get(self, stage, key):
+        """命中时返回产物目录并刷新访问时间，否则返回 None"""
+        path = self._path(stage, key)
+        if os.path.exists(os.path.join(path, META_FILE)):
+            os.utime(path)
+            self.hits += 1
+            print(f"[缓存] 命中 {stage} ({key})")
+            return path
+        self.misses += 1
+        print(f"[缓存] 未命中 {stage} ({key})，重新计算。")
+        return None
+
+    def put(self, stage, key, writer):
+        """
+        writer(tmp_dir) 把产物写进临时目录，完成后原子地重命名为正式目录并触发淘汰。
+        写入失败时丢弃临时目录，不影响已有缓存。
+        """
+        path = self._path(stage, key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            writer(tmp_path)
+            with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"stage": stage, "key": key, "created_at": time.time()}, f)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            print(f"[缓存] 写入 {stage} ({key}) 失败: {e}")
+            return None
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """总大小超过 max_bytes 时，按访问时间从旧到新删除产物目录；keep (刚写入的产物) 不会被淘汰"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE)):
+                entries.append((os.stat(path).st_mtime, _dir_size(path), path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            print(f"[缓存] 淘汰 {os.path.basename(path)} ({size / 1024 ** 2:.1f} MB)")
+
+    def summary(self):
+        return f"[缓存] 命中 {self.hits} 次，未命中 {self.misses} 次。"
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def save_sparse(directory, name, matrix):
+    """CSR 矩阵按 data/indices/indptr 分别存为 .npy，读取时可以逐个内存映射 (npz 归档无法 mmap)"""
+    matrix = matrix.tocsr()
+    np.save(os.path.join(directory, f"{name}.data.npy"), matrix.data)
+    np.save(os.path.join(directory, f"{name}.indices.npy"), matrix.indices)
+    np.save(os.path.join(directory, f"{name}.indptr.npy"), matrix.indptr)
+    with open(os.path.join(directory, f"{name}.shape.json"), "w", encoding="utf-8") as f:
+        json.dump(list(matrix.shape), f)
+
+
+def load_sparse(directory, name):
+    with open(os.path.join(directory, f"{name}.shape.json"), "r", encoding="utf-8") as f:
+        shape = tuple(json.load(f))
+    arrays = [np.load(os.path.join(directory, f"{name}.{part}.npy"), mmap_mode="r")
+              for part in ("data", "indices", "indptr")]
+    return sp.csr_matrix(tuple(arrays), shape=shape, copy=False)
@@ -0,0 +1,84 @@
+"""
+聚类与主题建模基准：python -m benchmarks.bench_clustering [--docs 10000 100000 1000000] [--engines full minibatch lda]
+每个 (引擎, 规模) 在独立子进程中运行，以便分别统计峰值内存。在 scrapy_project 目录下运行；
+--json PATH 写出结果，可用 python -m benchmarks.results 与其他提交的结果对比。
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.results import write_results
+
+
+def _children_peak_rss_mb():
+    """已结束子进程 (LdaMulticore 的 worker) 中最大的峰值常驻内存 (MB)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(engine, docs, chunk_size):
+    from analyze_weibo_data import (_peak_rss_mb, perform_streaming_clustering, perform_text_clustering,
+                                    perform_topic_modeling)
+    from benchmarks.synthetic import SyntheticPostStream
+
+    stream = SyntheticPostStream(docs, chunk_size=chunk_size)
+    start = time.perf_counter()
+    store = stream.token_store()
+    store_seconds = time.perf_counter() - start
+    stats = {}
+    if engine == "lda":
+        start = time.perf_counter()
+        lda_model, dictionary = perform_topic_modeling(store, num_topics=5)
+        stats.update({"engine": engine, "fit_seconds": time.perf_counter() - start, "peak_rss_mb": _peak_rss_mb(),
+                      "vocabulary": len(dictionary) if dictionary else 0})
+    elif engine == "minibatch":
+        perform_streaming_clustering(store, num_clusters=5, stats=stats, chunk_size=chunk_size)
+    else:
+        perform_text_clustering(store, num_clusters=5, stats=stats)
+    stats["children_peak_rss_mb"] = _children_peak_rss_mb()
+    stats["docs"] = docs
+    stats["store_seconds"] = store_seconds
+    stats["store_mb"] = (store.token_ids.nbytes + store.offsets.nbytes) / 1024 ** 2
+    print("RESULT " + json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--engines", nargs="+", default=["full", "minibatch", "lda"],
+                        choices=["full", "minibatch", "lda"])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--json", help="把结果写成 JSON 文件")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.docs[0], args.chunk_size)
+        return
+
+    results = []
+    for docs in args.docs:
+        for engine in args.engines:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_clustering", "--child", engine,
+                 "--docs", str(docs), "--chunk-size", str(args.chunk_size)],
+                capture_output=True, text=True, check=True).stdout
+            line = next(l for l in output.splitlines() if l.startswith("RESULT "))
+            results.append(json.loads(line[len("RESULT "):]))
+            r = results[-1]
+            detail = f"inertia={r['inertia']:.2f}" if "inertia" in r else f"vocabulary={r['vocabulary']}"
+            print(f"{r['engine']:>9} docs={docs:>9} store={r['store_seconds']:.2f}s/{r['store_mb']:.1f}MB "
+                  f"fit={r['fit_seconds']:.2f}s peak_rss={r['peak_rss_mb']:.1f}MB {detail}")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.json:
+        write_results(args.json, "clustering", results)
+
+
+if __name__ == "__main__":
+    main()
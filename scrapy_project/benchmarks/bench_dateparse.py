@@ -0,0 +1,37 @@
+"""
+日期归一化基准：python -m benchmarks.bench_dateparse [条数]，在 scrapy_project 目录下运行。
+"""
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic_weibo import synthetic_dates
+from weibo_collector.dateparse import CST, normalize_date, to_datetime64
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    values = synthetic_dates(count)
+    now = datetime.now(CST)
+
+    start = time.perf_counter()
+    parsed = [normalize_date(value, now) for value in values]
+    single = time.perf_counter() - start
+    failures = sum(1 for value in parsed if value is None)
+
+    start = time.perf_counter()
+    batch = to_datetime64(values, now)
+    vectorized = time.perf_counter() - start
+    expected = np.array([int(value.timestamp() * 1000) if value else np.iinfo(np.int64).min for value in parsed],
+                        dtype=np.int64).astype('datetime64[ms]')
+    mismatches = int(np.count_nonzero((batch != expected) & ~(np.isnat(batch) & np.isnat(expected))))
+
+    print(f"条数: {count}, 不同写法: {len(set(values))}, 无法解析: {failures}, 批量结果不一致: {mismatches}")
+    print(f"normalize_date 逐条: {single:.2f}s ({count / single:,.0f} 条/秒)")
+    print(f"to_datetime64 批量: {vectorized:.2f}s ({count / vectorized:,.0f} 条/秒, {single / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
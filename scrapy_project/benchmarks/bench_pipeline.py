@@ -0,0 +1,268 @@
+"""
+爬虫处理链基准：解析 getIndex 响应 -> 去重 -> 清洗/分词 -> MongoDB 批量写入，逐阶段统计吞吐与单条延迟。
+在 scrapy_project 目录下运行：
+    python -m benchmarks.bench_pipeline [--posts 20000] [--workers 0 3] [--json results/pipeline.json]
+输入是 benchmarks.synthetic_weibo 生成的合成分页，或用 --archive 指定的响应存档 (WEIBO_ARCHIVE_DIR) 中的 getIndex 记录，完全离线。写入阶段默认使用 mongomock (pip install mongomock)，
+传 --mongo-uri 时写入本地 mongod 的 --mongo-db 库 (运行前后会清空该库，不要指向正式库)。
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import time
+from concurrent.futures import wait
+
+from scrapy.exceptions import DropItem
+from scrapy.http import Request, TextResponse
+from scrapy.utils.test import get_crawler
+
+from benchmarks.results import write_results
+from benchmarks.synthetic_weibo import synthetic_pages
+from weibo_collector.archive import GET_INDEX, iter_records, list_segments
+from weibo_collector.pipelines import DataCleaningPipeline, DuplicatesPipeline, MongoPipeline
+from weibo_collector.spiders.weibo_spider import WeiboSpider
+
+API_URL = "https://m.weibo.cn/api/container/getIndex?containerid=100103type%3D61%26q%3D%23bench%23"
+
+
+def latency_stats(samples):
+    """单条延迟 (秒) 的均值与分位数，单位毫秒"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "latency_mean_ms": sum(ordered) / len(ordered) * 1000,
+        "latency_p50_ms": percentile(0.50),
+        "latency_p95_ms": percentile(0.95),
+        "latency_p99_ms": percentile(0.99),
+        "latency_max_ms": ordered[-1] * 1000,
+    }
+
+
+def _record(stage, posts, items, seconds, samples, **extra):
+    record = {"stage": stage, "posts": posts, **extra, "items": items, "seconds": seconds,
+              "items_per_sec": items / seconds if seconds else None}
+    record.update(latency_stats(samples))
+    return record
+
+
+def build_spider():
+    """HTTP 下载模式的爬虫实例；不建立游标，解析时不会调度翻页请求"""
+    crawler = get_crawler(WeiboSpider, {"WEIBO_DOWNLOAD_MODE": "http"})
+    spider = WeiboSpider.from_crawler(crawler)
+    crawler.spider = spider
+    spider.download_mode = "http"
+    spider.storage_state = None
+    spider.cursors = {}
+    return spider
+
+
+def bench_parse(spider, bodies, posts):
+    """逐页调用 parse_http_api_response (含 JSON 解码)；长微博请求里携带的 Item 也计入产出"""
+    items, requests, samples = [], 0, []
+    start = time.perf_counter()
+    for page, body in enumerate(bodies, start=1):
+        meta = {"keyword": "#bench#", "api_url": API_URL, "page": page}
+        response = TextResponse(API_URL, body=body, encoding="utf-8", request=Request(API_URL, meta=meta))
+        page_start = time.perf_counter()
+        results = list(spider.parse_http_api_response(response))
+        elapsed = time.perf_counter() - page_start
+        for result in results:
+            if isinstance(result, Request):
+                requests += 1
+                result = result.cb_kwargs.get("item")
+            if result is not None:
+                items.append(result)
+        if results:
+            samples.extend([elapsed / len(results)] * len(results))
+    seconds = time.perf_counter() - start
+    return items, _record("parse", posts, len(items), seconds, samples, pages=len(bodies), requests=requests)
+
+
+def bench_dedup(spider, items, posts):
+    pipeline = DuplicatesPipeline(None, None, seed_from_mongo=False)
+    kept, samples = [], []
+    start = time.perf_counter()
+    for item in items:
+        item_start = time.perf_counter()
+        try:
+            kept.append(pipeline.process_item(item, spider))
+        except DropItem:
+            pass
+        samples.append(time.perf_counter() - item_start)
+    seconds = time.perf_counter() - start
+    return kept, _record("dedup", posts, len(items), seconds, samples, dropped=len(items) - len(kept))
+
+
+async def _run_cleaning(pipeline, spider, items, concurrency):
+    """与 Scrapy 的 CONCURRENT_ITEMS 类似，最多 concurrency 个 Item 同时在管道中等待分词"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def process(item):
+        async with semaphore:
+            item_start = time.perf_counter()
+            result = await pipeline.process_item(item, spider)
+            samples.append(time.perf_counter() - item_start)
+            return result
+
+    return await asyncio.gather(*(process(item) for item in items)), samples
+
+
+def bench_clean(spider, items, posts, workers, concurrency, batch_size):
+    pipeline = DataCleaningPipeline(workers=workers, batch_size=batch_size)
+    pipeline.open_spider(spider)
+    try:
+        # 预热：jieba 词典已在 open_spider 中载入；进程池时再拉起全部 worker，均不计入耗时
+        if pipeline.executor is not None:
+            wait([pipeline.executor.submit(time.sleep, 0.2) for _ in range(workers)])
+        items = [item.copy() for item in items]
+        start = time.perf_counter()
+        cleaned, samples = asyncio.run(_run_cleaning(pipeline, spider, items, concurrency))
+        seconds = time.perf_counter() - start
+    finally:
+        pipeline.close_spider(spider)
+    return cleaned, _record("clean", posts, len(items), seconds, samples, workers=workers)
+
+
+def _mongo_client(mongo_uri):
+    if mongo_uri:
+        import pymongo
+        return pymongo.MongoClient(mongo_uri)
+    try:
+        import mongomock
+        from mongomock import collection
+    except ImportError:
+        return None
+    add_update = collection.BulkOperationBuilder.add_update
+    if "sort" not in inspect.signature(add_update).parameters:
+        # pymongo >= 4.9 的 UpdateOne 会多传一个 sort 参数，mongomock 4.x 尚不接受
+        def add_update_compat(self, *args, sort=None, **kwargs):
+            return add_update(self, *args, **kwargs)
+        collection.BulkOperationBuilder.add_update = add_update_compat
+    return mongomock.MongoClient()
+
+
+def bench_mongo(spider, items, posts, mongo_uri, mongo_db, bulk_size):
+    """
+    按 MongoPipeline 的方式组装 upsert 操作并同步执行 _write_batch，单条延迟按批次耗时均摊。
+    build_seconds 是组装操作 (_to_operation) 的耗时，其余为数据库写入耗时。
+    """
+    client = _mongo_client(mongo_uri)
+    if client is None:
+        print("未安装 mongomock 且未指定 --mongo-uri，跳过写入阶段。")
+        return None
+    client.drop_database(mongo_db)
+    pipeline = MongoPipeline(mongo_uri, mongo_db, bulk_size=bulk_size)
+    pipeline.client = client
+    pipeline.db = client[mongo_db]
+    try:
+        pipeline.db.posts.create_index('post_id', unique=True, name='post_id_unique',
+                                       partialFilterExpression={'post_id': {'$type': 'string'}})
+        pipeline.db.posts.create_index('date', name='date')
+    except Exception as e:
+        spider.logger.warning(f"创建索引失败: {e}")
+
+    samples, errors, batch_latencies, build_seconds = [], 0, [], 0.0
+    start = time.perf_counter()
+    for offset in range(0, len(items), bulk_size):
+        batch_start = time.perf_counter()
+        operations = [pipeline._to_operation(item) for item in items[offset:offset + bulk_size]]
+        build_seconds += time.perf_counter() - batch_start
+        _, batch_errors, message, _, _ = pipeline._write_batch(operations)
+        elapsed = time.perf_counter() - batch_start
+        if batch_errors:
+            errors += batch_errors
+            spider.logger.warning(f"批量写入失败 {batch_errors} 条: {message}")
+        batch_latencies.append(elapsed)
+        samples.extend([elapsed / len(operations)] * len(operations))
+    seconds = time.perf_counter() - start
+    stored = pipeline.db.posts.count_documents({})
+    client.drop_database(mongo_db)
+    client.close()
+    batch = latency_stats(batch_latencies)
+    return _record("mongo", posts, len(items), seconds, samples, backend="mongod" if mongo_uri else "mongomock",
+                   errors=errors, stored=stored, build_seconds=build_seconds,
+                   batch_p50_ms=batch.get("latency_p50_ms"), batch_p95_ms=batch.get("latency_p95_ms"))
+
+
+def _print_record(record):
+    extra = f" workers={record['workers']}" if "workers" in record else ""
+    print(f"{record['stage']:>6}{extra:<11} items={record['items']:>8} {record['seconds']:8.2f}s "
+          f"{record['items_per_sec']:>12,.0f} 条/秒  p50={record.get('latency_p50_ms', 0):.3f}ms "
+          f"p95={record.get('latency_p95_ms', 0):.3f}ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="解析/去重/清洗/写库各阶段的吞吐与延迟基准")
+    parser.add_argument("--posts", type=int, default=20000, help="合成卡片总数 (含重复)")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="重复出现的帖子比例 (同一 id)")
+    parser.add_argument("--copy-rate", type=float, default=0.1, help="文本与之前某帖相同的新帖比例")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--archive", nargs="+", help="用响应存档 (目录/分段文件) 代替合成分页，真实数据的可复现输入")
+    parser.add_argument("--stages", nargs="+", default=["parse", "dedup", "clean", "mongo"],
+                        choices=["parse", "dedup", "clean", "mongo"])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[0, max(1, (os.cpu_count() or 2) - 1)], help="分词进程数，可给多个逐一测量")
+    parser.add_argument("--concurrency", type=int, default=100, help="同时处理的 Item 数 (CONCURRENT_ITEMS)")
+    parser.add_argument("--batch-size", type=int, default=64, help="SEGMENTATION_BATCH_SIZE")
+    parser.add_argument("--bulk-size", type=int, default=500, help="MONGO_BULK_SIZE")
+    parser.add_argument("--mongo-uri", help="写入本地 mongod；不传时使用 mongomock")
+    parser.add_argument("--mongo-db", default="weibo_bench")
+    parser.add_argument("--mongo-items", type=int,
+                        help="写入阶段只取前 N 条；mongomock 的 upsert 逐条线性扫描，默认只写 2000 条，mongod 默认全部写入")
+    parser.add_argument("--json", help="把结果写成 JSON 文件，供 benchmarks.results 对比")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    spider = build_spider()
+    if args.archive:
+        bodies = [json.dumps(record["body"], ensure_ascii=False).encode("utf-8")
+                  for segment in list_segments(args.archive) for record in iter_records(segment)
+                  if record.get("kind") == GET_INDEX]
+        args.posts = sum(len((json.loads(body).get("data") or {}).get("cards") or []) for body in bodies)
+        print(f"存档中 {len(bodies)} 页，{args.posts} 张卡片，共 {sum(map(len, bodies)) / 1024 ** 2:.1f} MB JSON")
+    else:
+        bodies = [json.dumps(page, ensure_ascii=False).encode("utf-8")
+                  for page in synthetic_pages(args.posts, args.page_size, args.duplicate_rate, args.copy_rate, args.seed)]
+        print(f"合成 {args.posts} 张卡片，{len(bodies)} 页，共 {sum(map(len, bodies)) / 1024 ** 2:.1f} MB JSON")
+
+    results = []
+    items, parse_record = bench_parse(spider, bodies, args.posts)
+    if "parse" in args.stages:
+        results.append(parse_record)
+    items, dedup_record = bench_dedup(spider, items, args.posts)
+    if "dedup" in args.stages:
+        results.append(dedup_record)
+    cleaned = None
+    if "clean" in args.stages or "mongo" in args.stages:
+        for workers in (args.workers if "clean" in args.stages else [0]):
+            output, record = bench_clean(spider, items, args.posts, workers, args.concurrency, args.batch_size)
+            cleaned = cleaned or output
+            if "clean" in args.stages:
+                results.append(record)
+    if "mongo" in args.stages:
+        limit = args.mongo_items if args.mongo_items is not None else (None if args.mongo_uri else 2000)
+        record = bench_mongo(spider, cleaned[:limit], args.posts, args.mongo_uri, args.mongo_db, args.bulk_size)
+        if record:
+            results.append(record)
+
+    for record in results:
+        _print_record(record)
+    if args.json:
+        write_results(args.json, "pipeline", results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+代理选择策略基准：在虚拟时钟上模拟一组延迟、失败率、封禁率各不相同的代理，比较 ProxyPool 的健康加权选取
+(失败换代理重试) 与原先的均匀随机选取 (不重试) 在固定时长内的有效响应吞吐。完全离线，运行：
+    python -m benchmarks.bench_proxy_pool [--duration 600] [--concurrency 16] [--json results/proxy.json]
+"""
+import argparse
+import heapq
+import random
+
+from benchmarks.results import write_results
+from weibo_collector.proxy_pool import ProxyPool
+
+# (名称, 平均延迟秒, 失败率 (5xx), 封禁率 (403/验证码/登录重定向), 从第几秒起全部封禁)
+PROFILES = (
+    ("fast-a", 0.3, 0.01, 0.0, None),
+    ("fast-b", 0.4, 0.02, 0.0, None),
+    ("slow", 3.0, 0.02, 0.0, None),
+    ("flaky", 0.5, 0.5, 0.0, None),
+    ("banned", 0.2, 0.0, 0.9, None),
+    ("dead", 0.01, 1.0, 0.0, None),
+    ("burned", 0.3, 0.01, 0.0, 0.5),
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _outcome(rng, profile, now, duration):
+    """返回 (延迟, 结果)，结果为 'ok'、'failure' 或 'ban'"""
+    _, latency, failure_rate, ban_rate, burned_at = profile
+    elapsed = rng.expovariate(1 / latency)
+    if burned_at is not None and now >= burned_at * duration:
+        return elapsed, "ban"
+    draw = rng.random()
+    if draw < failure_rate:
+        return elapsed, "failure"
+    if draw < failure_rate + ban_rate:
+        return elapsed, "ban"
+    return elapsed, "ok"
+
+
+def simulate(strategy, duration, concurrency, max_retries, seed):
+    """concurrency 个并发槽位持续发请求；health 策略失败时换代理重试，random 策略失败即丢弃"""
+    rng = random.Random(seed)
+    clock = Clock()
+    profiles = {f"http://proxy-{index}:8080": profile for index, profile in enumerate(PROFILES)}
+    pool = ProxyPool(profiles, cooldown=30.0, rng=random.Random(seed + 1), clock=clock)
+    urls = list(profiles)
+    events = []
+    counts = {"requests": 0, "ok": 0, "failure": 0, "ban": 0, "retried": 0, "lost": 0}
+
+    def send(tried):
+        if strategy == "health":
+            proxy, _ = pool.choose(exclude=tried)
+            pool.acquire(proxy)
+            url = proxy.url
+        else:
+            proxy, url = None, rng.choice(urls)
+        latency, result = _outcome(rng, profiles[url], clock.now, duration)
+        counts["requests"] += 1
+        heapq.heappush(events, (clock.now + latency, counts["requests"], url, proxy, latency, result, tried + [url]))
+
+    for _ in range(concurrency):
+        send([])
+    while events:
+        clock.now, _, url, proxy, latency, result, tried = heapq.heappop(events)
+        if clock.now >= duration:
+            break
+        counts[result] += 1
+        if proxy is not None:
+            pool.release(proxy)
+            if result == "ok":
+                pool.record_success(proxy, latency)
+            else:
+                pool.record_failure(proxy, latency, ban=result == "ban")
+        if result != "ok" and strategy == "health" and len(tried) <= max_retries:
+            counts["retried"] += 1
+            send(tried)
+            continue
+        if result != "ok":
+            counts["lost"] += 1
+        send([])
+    return {"engine": strategy, "proxies": len(PROFILES), "concurrency": concurrency, **counts,
+            "good_per_sec": counts["ok"] / duration, "good_ratio": counts["ok"] / max(1, counts["requests"])}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="健康加权代理池与均匀随机选取的有效吞吐对比 (离线模拟)")
+    parser.add_argument("--duration", type=float, default=600.0, help="模拟时长 (虚拟秒)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-retries", type=int, default=2, help="PROXY_MAX_RETRIES")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="把结果写成 JSON 文件，供 benchmarks.results 对比")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = [simulate(strategy, args.duration, args.concurrency, args.max_retries, args.seed)
+               for strategy in ("random", "health")]
+    for record in results:
+        print(f"{record['engine']:>7} 请求 {record['requests']:>7} 有效 {record['ok']:>7} "
+              f"({record['good_ratio']:.1%})  {record['good_per_sec']:8.1f} 条/秒  丢弃 {record['lost']}")
+    if args.json:
+        write_results(args.json, "proxy_pool", results)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+启动耗时基准：python -m benchmarks.bench_startup [--runs 5] [--workers 2] [--json PATH]，在 scrapy_project 目录下运行。
+
+每一项都在新的子进程中计时，取多次运行的最小值：
+  - 分析脚本的导入与 --help、爬虫各模块的导入；
+  - 一次不发请求的 scrapy crawl weibo (回放一个不存在的存档，走完引擎启动、打开 Pipeline 与关闭；
+    不含 MongoPipeline，结果不受 MongoDB 是否可达影响)；
+  - jieba 词典：原生 jieba.initialize (读 jieba 自带的 marshal 缓存) 对比预编译缓存的冷启动 (编译并写缓存) 与热启动；
+  - 分词进程池 (与 DataCleaningPipeline 一样由 forkserver 启动)：N 个 worker 各自 jieba.initialize，
+    对比各自从预编译缓存载入。
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.results import write_results
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CRAWL_PIPELINES = {"weibo_collector.pipelines.DuplicatesPipeline": 0,
+                   "weibo_collector.pipelines.DataCleaningPipeline": 300}
+
+DICT_CACHE_SNIPPET = "from weibo_collector.segmentation import load_dictionary; load_dictionary({cache_dir!r})"
+POOL_SNIPPET = """
+from concurrent.futures import ProcessPoolExecutor, wait
+import multiprocessing
+import time
+{prepare}
+with ProcessPoolExecutor(max_workers={workers}, initializer={initializer}, initargs={initargs},
+                         mp_context=multiprocessing.get_context('forkserver')) as pool:
+    wait([pool.submit(time.sleep, 0.05) for _ in range({workers})])
+"""
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+def _time_command(command, runs, before_each=None):
+    samples = []
+    for _ in range(runs):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        samples.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(command)} 退出码 {result.returncode}: {result.stderr.decode()[-500:]}")
+    return min(samples), statistics.median(samples)
+
+
+def stages(workdir, workers):
+    """(阶段名, 命令, 每次运行前的准备) 列表"""
+    warm_dir = os.path.join(workdir, "warm")
+    cold_dir = os.path.join(workdir, "cold")
+
+    def clear_cold():
+        shutil.rmtree(cold_dir, ignore_errors=True)
+
+    crawl = [sys.executable, "-m", "scrapy", "crawl", "weibo", "-a", f"replay={os.path.join(workdir, 'none')}",
+             "-s", "LOG_LEVEL=WARNING", "-s", "DEDUP_SEED_FROM_MONGO=False", "-s", "WEIBO_METRICS_ENABLED=False",
+             "-s", f"SEGMENTATION_DICT_CACHE_DIR={warm_dir}", "-s", f"ITEM_PIPELINES={json.dumps(CRAWL_PIPELINES)}"]
+    return [
+        ("import_analysis", _python("import analyze_weibo_data"), None),
+        ("analysis_help", [sys.executable, "analyze_weibo_data.py", "--help"], None),
+        ("import_middlewares", _python("import weibo_collector.middlewares"), None),
+        ("import_pipelines", _python("import weibo_collector.pipelines"), None),
+        ("import_spider", _python("import weibo_collector.spiders.weibo_spider"), None),
+        ("crawl_noop", crawl, None),
+        ("jieba_initialize", _python("import jieba; jieba.initialize()"), None),
+        ("dict_cache_cold", _python(DICT_CACHE_SNIPPET.format(cache_dir=cold_dir)), clear_cold),
+        ("dict_cache_warm", _python(DICT_CACHE_SNIPPET.format(cache_dir=warm_dir)), None),
+        ("pool_jieba_initialize", _python(POOL_SNIPPET.format(
+            # forkserver 需要可 pickle 的 initializer，jieba.initialize 是绑定方法，改由 exec 执行
+            prepare="", workers=workers, initializer="exec", initargs=("import jieba; jieba.initialize()",))), None),
+        ("pool_dict_cache", _python(POOL_SNIPPET.format(
+            prepare="from weibo_collector.segmentation import init_worker",
+            workers=workers, initializer="init_worker", initargs=(warm_dir,))), None),
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="爬虫与分析脚本的启动耗时 (每项在新子进程中计时)")
+    parser.add_argument("--runs", type=int, default=5, help="每项运行次数，取最小值")
+    parser.add_argument("--workers", type=int, default=2, help="分词进程池阶段的 worker 数")
+    parser.add_argument("--json", help="把结果写成 JSON 文件，供 benchmarks.results 对比")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    results = []
+    try:
+        # 先生成一次热缓存，热启动各项只计载入
+        subprocess.run(_python(DICT_CACHE_SNIPPET.format(cache_dir=os.path.join(workdir, "warm"))),
+                       cwd=PROJECT_DIR, check=True, stderr=subprocess.DEVNULL)
+        for stage, command, before_each in stages(workdir, args.workers):
+            best, median = _time_command(command, args.runs, before_each)
+            record = {"stage": stage, "seconds": best, "median_seconds": median, "runs": args.runs}
+            if stage.startswith("pool_"):
+                record["workers"] = args.workers
+            results.append(record)
+            print(f"{stage:>22}: 最小 {best:.2f}s, 中位数 {median:.2f}s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        write_results(args.json, "startup", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+基准结果的 JSON 输出与跨提交对比。
+
+各基准脚本用 --json PATH 写出 {"benchmark", "environment", "results"}，environment 记录提交号与运行环境。
+对比两次结果：python -m benchmarks.results old.json new.json [--threshold 0.1]
+按 (stage/engine, 规模) 对齐每条记录，列出数值指标的变化，超过阈值的退化以 "!" 标出。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+# 越小越好的指标；其余数值指标 (吞吐) 越大越好
+LOWER_IS_BETTER = ("seconds", "latency", "_ms", "_mb")
+KEY_FIELDS = ("stage", "engine", "backend", "workers", "docs", "posts")
+# 描述性的计数与模型指标，不参与快慢比较
+INFO_FIELDS = ("items", "pages", "requests", "dropped", "stored", "errors", "inertia", "vocabulary",
+               "ok", "failure", "ban", "retried", "lost", "proxies", "concurrency", "runs")
+
+
+def environment():
+    """提交号、Python 与机器信息，写进结果文件便于回溯"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def write_results(path, benchmark, results):
+    payload = {"benchmark": benchmark, "environment": environment(), "results": results}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {path}")
+
+
+def _record_key(record):
+    return tuple((field, record[field]) for field in KEY_FIELDS if field in record)
+
+
+def _lower_is_better(metric):
+    return any(marker in metric for marker in LOWER_IS_BETTER)
+
+
+def compare(old, new, threshold=0.1):
+    """返回 (记录键, 指标, 旧值, 新值, 变化比例, 是否退化) 列表"""
+    old_records = {_record_key(record): record for record in old["results"]}
+    rows = []
+    for record in new["results"]:
+        key = _record_key(record)
+        before = old_records.get(key)
+        if before is None:
+            continue
+        for metric, value in record.items():
+            if metric in KEY_FIELDS or metric in INFO_FIELDS:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            previous = before.get(metric)
+            if not isinstance(previous, (int, float)) or not previous:
+                continue
+            change = (value - previous) / abs(previous)
+            regressed = change > threshold if _lower_is_better(metric) else change < -threshold
+            rows.append((key, metric, previous, value, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比两次基准结果")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1, help="超过该比例的退化标记为 '!'")
+    args = parser.parse_args(argv)
+    with open(args.old, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old['environment'].get('commit')} -> {new['environment'].get('commit')} ({new['benchmark']})")
+    rows = compare(old, new, args.threshold)
+    for key, metric, previous, value, change, regressed in rows:
+        label = " ".join(f"{field}={value_}" for field, value_ in key)
+        print(f"{'!' if regressed else ' '} {label:<40} {metric:<24} "
+              f"{previous:>14.4f} -> {value:>14.4f} ({change:+.1%})")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"共 {len(rows)} 项指标，退化 {regressions} 项。")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+合成微博语料，供基准脚本离线使用。
+"""
+import random
+
+from analyze_weibo_data import PostStream
+from benchmarks.synthetic_weibo import synthetic_tokens
+from token_store import TokenStore
+
+
+class SyntheticPostStream(PostStream):
+    """按块即时生成的合成帖子流，不在内存中保存整个语料；同一 seed 多次迭代结果一致"""
+    def __init__(self, num_docs, chunk_size=5000, seed=42):
+        super().__init__(chunk_size=chunk_size)
+        self.num_docs = num_docs
+        self.seed = seed
+
+    def count(self):
+        return self.num_docs
+
+    def token_store(self):
+        return TokenStore.build(self)
+
+    def iter_chunks(self):
+        for start in range(0, self.num_docs, self.chunk_size):
+            rng = random.Random(self.seed * 1_000_003 + start)
+            chunk = []
+            for index in range(start, min(start + self.chunk_size, self.num_docs)):
+                words = synthetic_tokens(rng)
+                chunk.append({
+                    "_id": index,
+                    "text": "".join(words),
+                    "segmented_text": words,
+                    "author": f"user{index % 997}",
+                    "post_url": f"https://m.weibo.cn/detail/{4_000_000_000_000_000 + index}",
+                })
+            yield chunk
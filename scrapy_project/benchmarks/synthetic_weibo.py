@@ -0,0 +1,145 @@
+"""
+合成微博数据：中文帖子文本、混合写法的发布时间，以及 getIndex 接口形状的 JSON 分页。
+只依赖标准库，爬虫侧基准 (解析、清洗、写入) 不必导入分析脚本的依赖。
+"""
+import random
+
+TOPICS = [
+    ["经济", "增长", "市场", "投资", "股票", "银行", "消费", "政策"],
+    ["足球", "比赛", "球队", "进球", "冠军", "球迷", "教练", "联赛"],
+    ["电影", "演员", "票房", "导演", "上映", "预告", "影评", "角色"],
+    ["天气", "下雨", "降温", "台风", "气象", "高温", "预警", "出行"],
+    ["手机", "发布", "芯片", "屏幕", "电池", "系统", "续航", "拍照"],
+    ["学校", "考试", "学生", "老师", "高考", "成绩", "作业", "校园"],
+]
+FILLER = ["今天", "大家", "真的", "觉得", "一起", "看看", "支持", "希望", "正能量", "加油"]
+CONNECTORS = ["的", "了", "和", "也", "就", "还是", "已经", "非常", "，", "。", "！", "？", "……"]
+EMOTICONS = ["[哈哈]", "[赞]", "[心]", "[泪]", "[doge]", "[允悲]"]
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def synthetic_tokens(rng, length=12):
+    """按主题混合生成一条分词后的帖子"""
+    topic = rng.choice(TOPICS)
+    words = [rng.choice(topic) for _ in range(length - 3)]
+    words += [rng.choice(FILLER) for _ in range(3)]
+    rng.shuffle(words)
+    return words
+
+
+def synthetic_text(rng, min_words=8, max_words=40):
+    """
+    生成一条接口原样返回的帖子 HTML：主题词与虚词、标点交替，夹杂话题、@用户、表情图片与换行，
+    供 clean_text + jieba 处理。
+    """
+    topic = rng.choice(TOPICS)
+    parts = []
+    if rng.random() < 0.5:
+        tag = rng.choice(topic) + rng.choice(FILLER)
+        parts.append(f'<a href="https://m.weibo.cn/search?containerid=231522type%3D1%26q%3D%23{tag}%23">'
+                     f'<span class="surl-text">#{tag}#</span></a>')
+    for _ in range(rng.randint(min_words, max_words)):
+        parts.append(rng.choice(topic) if rng.random() < 0.6 else rng.choice(FILLER))
+        parts.append(rng.choice(CONNECTORS))
+    if rng.random() < 0.3:
+        name = f"用户{rng.randint(1, 9999)}"
+        parts.append(f"<a href='/n/{name}'>@{name}</a> ")
+    if rng.random() < 0.3:
+        emoticon = rng.choice(EMOTICONS)
+        parts.append(f'<span class="url-icon"><img alt={emoticon} src="//h5.sinaimg.cn/m/emoticon/icon/default.png" '
+                     f'style="width:1em; height:1em;" /></span>')
+    if rng.random() < 0.2:
+        parts.insert(rng.randint(0, len(parts)), "<br />")
+    return "".join(parts)
+
+
+def synthetic_date(rng):
+    """随机一种微博时间写法"""
+    kind = rng.randrange(9)
+    if kind == 0:
+        return '刚刚'
+    if kind == 1:
+        return f"{rng.randint(1, 59)}分钟前"
+    if kind == 2:
+        return f"{rng.randint(1, 23)}小时前"
+    if kind == 3:
+        return f"今天 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    if kind == 4:
+        return f"昨天 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    if kind == 5:
+        return f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if kind == 6:
+        return f"{rng.randint(1, 12)}月{rng.randint(1, 28)}日 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+    if kind == 7:
+        return (f"20{rng.randint(18, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}")
+    return (f"{rng.choice(WEEKDAYS)} {rng.choice(MONTHS)} {rng.randint(1, 28):02d} "
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} +0800 20{rng.randint(18, 26)}")
+
+
+def synthetic_dates(count, seed=42):
+    """生成混合各种微博时间写法的字符串"""
+    rng = random.Random(seed)
+    return [synthetic_date(rng) for _ in range(count)]
+
+
+def synthetic_count(rng):
+    """互动数：小数值为整数，大数值为 '1.5万'、'100万+' 这类字符串"""
+    value = int(rng.paretovariate(1.2)) - 1
+    if value < 10000:
+        return value
+    if rng.random() < 0.2:
+        return f"{value // 10000}万+"
+    return f"{value / 10000:.1f}万"
+
+
+def synthetic_mblog(rng, post_id, text=None):
+    """一条 getIndex 卡片中的 mblog：约 5% 为需要另取全文的长微博，约 30% 带图片"""
+    mblog = {
+        "id": str(post_id),
+        "mid": str(post_id),
+        "text": text if text is not None else synthetic_text(rng),
+        "created_at": synthetic_date(rng),
+        "user": {"id": rng.randint(1_000_000_000, 7_999_999_999), "screen_name": f"用户{rng.randint(1, 50000)}"},
+        "reposts_count": synthetic_count(rng),
+        "comments_count": synthetic_count(rng),
+        "attitudes_count": synthetic_count(rng),
+        "isLongText": rng.random() < 0.05,
+    }
+    if rng.random() < 0.3:
+        mblog["pics"] = [{
+            "pid": f"{post_id:x}{i}",
+            "url": f"https://wx1.sinaimg.cn/orj360/{post_id:x}{i}.jpg",
+            "large": {"url": f"https://wx1.sinaimg.cn/large/{post_id:x}{i}.jpg"},
+        } for i in range(rng.randint(1, 9))]
+    return mblog
+
+
+def synthetic_pages(num_posts, page_size=10, duplicate_rate=0.1, copy_rate=0.1, seed=42):
+    """
+    逐页产出 getIndex 响应 dict，共约 num_posts 张卡片 (card_type 9，偶尔包在 card_group 里)。
+    duplicate_rate: 卡片重复之前出现过的帖子 (同一 id，翻页重叠)；
+    copy_rate: 新 id 但文本与之前某帖完全相同 (转发、搬运)。
+    """
+    rng = random.Random(seed)
+    next_id = 4_900_000_000_000_000
+    seen = []
+    page = 1
+    produced = 0
+    while produced < num_posts:
+        cards = []
+        for _ in range(min(page_size, num_posts - produced)):
+            roll = rng.random()
+            if seen and roll < duplicate_rate:
+                mblog = rng.choice(seen)
+            else:
+                text = rng.choice(seen)["text"] if seen and roll < duplicate_rate + copy_rate else None
+                mblog = synthetic_mblog(rng, next_id, text)
+                next_id += rng.randint(1, 5000)
+                seen.append(mblog)
+            card = {"card_type": 9, "itemid": f"seqid:{rng.randint(0, 10 ** 9)}", "mblog": mblog}
+            cards.append({"card_type": 11, "card_group": [card]} if rng.random() < 0.1 else card)
+            produced += 1
+        yield {"ok": 1, "data": {"cardlistInfo": {"page": page + 1, "total": num_posts}, "cards": cards}}
+        page += 1
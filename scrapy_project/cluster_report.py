@@ -0,0 +1,118 @@
+"""
+聚类报告：按簇统计规模、质心权重最高的词，以及离质心最近的代表帖子。
+
+全部基于 NumPy 数组运算：一次 lexsort (簇标签, 到质心距离) 完成分组与簇内排序，
+质心高权重词用 argpartition 一次取出；只有最终选中的少量代表帖子才回 MongoDB 查询详情。
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+
+def centroid_top_terms(centers, feature_names, top_n=10):
+    """每个质心权重最高的 top_n 个特征，返回 [[(词, 权重), ...], ...]"""
+    top_n = min(top_n, centers.shape[1])
+    if top_n <= 0:
+        return [[] for _ in range(centers.shape[0])]
+    top = np.argpartition(-centers, top_n - 1, axis=1)[:, :top_n]
+    weights = np.take_along_axis(centers, top, axis=1)
+    order = np.argsort(-weights, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    weights = np.take_along_axis(weights, order, axis=1)
+    return [[(feature_names[column], float(weight)) for column, weight in zip(row_columns, row_weights) if weight > 0]
+            for row_columns, row_weights in zip(top, weights)]
+
+
+def centroid_distances(centers, labels, count_matrices, idf):
+    """
+    逐块计算每篇 (L2 归一化 TF-IDF) 文档到其所属质心的欧氏距离：|x - c|^2 = |x|^2 - 2 x·c + |c|^2。
+    直接在词频矩阵的非零项上乘 idf、按行范数缩放，只取所属质心的分量累加，不构造加权矩阵，也不计算到其他质心的距离。
+    """
+    center_sq = np.einsum("ij,ij->i", centers, centers)
+    distances = np.empty(len(labels), dtype=np.float64)
+    offset = 0
+    for counts in count_matrices:
+        rows = counts.shape[0]
+        chunk_labels = labels[offset:offset + rows]
+        row_of = np.repeat(np.arange(rows), np.diff(counts.indptr))
+        weights = counts.data * idf[counts.indices]
+        norms = np.sqrt(np.bincount(row_of, weights=weights ** 2, minlength=rows))
+        dots = np.bincount(row_of, weights=weights * centers[chunk_labels[row_of], counts.indices], minlength=rows)
+        nonempty = norms > 0
+        dots[nonempty] /= norms[nonempty]
+        squared = nonempty - 2 * dots + center_sq[chunk_labels]
+        distances[offset:offset + rows] = np.sqrt(np.maximum(squared, 0))
+        offset += rows
+    return distances
+
+
+def representatives(labels, distances, num_clusters, samples=5):
+    """一次 lexsort 按 (簇, 距离) 排序，取每簇距离最小的 samples 篇文档的下标"""
+    order = np.lexsort((distances, labels))
+    sizes = np.bincount(labels, minlength=num_clusters)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return [order[start:start + min(samples, size)] for start, size in zip(starts, sizes)]
+
+
+def build_cluster_report(labels, vectorizer, kmeans, store, fetch_docs, engine, top_terms=10, samples=5,
+                         chunk_size=5000):
+    """
+    生成结构化的聚类报告。vectorizer 需提供 idf、feature_names() 与 count_store()，
+    fetch_docs(ids) 按 _id 批量返回 {_id: 文档}。
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    num_clusters = kmeans.n_clusters
+    sizes = np.bincount(labels, minlength=num_clusters)
+    names = vectorizer.feature_names(store.vocab, store.term_frequencies())
+    terms = centroid_top_terms(kmeans.cluster_centers_, names, top_terms)
+    distances = centroid_distances(kmeans.cluster_centers_, labels, vectorizer.count_store(store, chunk_size),
+                                   vectorizer.idf)
+    chosen = representatives(labels, distances, num_clusters, samples)
+
+    docs = fetch_docs([store.doc_ids[index].decode() for rows in chosen for index in rows])
+    clusters = []
+    for cluster, rows in enumerate(chosen):
+        posts = []
+        for index in rows:
+            doc_id = store.doc_ids[index].decode()
+            doc = docs.get(doc_id, {})
+            posts.append({
+                "_id": doc_id,
+                "author": doc.get("author", "未知"),
+                "text": doc.get("text", ""),
+                "post_url": doc.get("post_url", ""),
+                "distance": float(distances[index]),
+            })
+        clusters.append({
+            "cluster": cluster,
+            "size": int(sizes[cluster]),
+            "top_terms": [{"term": term, "weight": weight} for term, weight in terms[cluster]],
+            "representatives": posts,
+        })
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "engine": engine,
+        "num_docs": int(len(labels)),
+        "num_clusters": int(num_clusters),
+        "clusters": clusters,
+    }
+
+
+def print_cluster_report(report):
+    print("\n--- 文本聚类结果 ---")
+    for cluster in report["clusters"]:
+        terms = ", ".join(term["term"] for term in cluster["top_terms"])
+        print(f"\nCluster {cluster['cluster']} ({cluster['size']} 篇): {terms}")
+        for post in cluster["representatives"]:
+            print(f"  - 作者: {post['author']}, 内容: {post['text'][:100]}..., 链接: {post['post_url']}")
+
+
+def write_cluster_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"聚类报告已写入 {path}")
@@ -0,0 +1,132 @@
+"""
+多进程抓取启动器：把关键词写入共享的 SQLite 关键词前沿，再启动 N 个 weibo 爬虫进程从中领取关键词。
+
+每个进程按页保存检查点，中断后重新运行本脚本即从检查点继续；--new-run 开始新一轮增量抓取，
+每个关键词从第 1 页翻到上一轮见过的最新帖子为止。异常退出的进程交还租约后重启。运行：
+    python launch_crawl.py --workers 4 [--keywords-file kw.txt] [--new-run] [-s NAME=VALUE ...]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from scrapy.utils.project import get_project_settings
+
+from weibo_collector.frontier import LEASED, PENDING, KeywordFrontier
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_keywords(args, settings):
+    if args.keywords:
+        return [keyword.strip() for keyword in args.keywords.split(',') if keyword.strip()]
+    keywords_file = args.keywords_file or settings.get('WEIBO_KEYWORDS_FILE')
+    if keywords_file:
+        with open(keywords_file, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    return settings.getlist('WEIBO_KEYWORDS')
+
+
+def parse_overrides(values):
+    overrides = {}
+    for value in values:
+        name, sep, setting = value.partition('=')
+        if not sep:
+            raise SystemExit(f"-s 参数格式应为 NAME=VALUE: {value}")
+        overrides[name] = setting
+    return overrides
+
+
+def worker_overrides(settings, overrides, index, log_dir):
+    """每个进程各自的日志文件；指标端口依次加一、textfile 加后缀，避免多个进程冲突"""
+    worker = dict(overrides)
+    worker.setdefault('LOG_FILE', os.path.join(log_dir, f"worker-{index}.log"))
+    port = int(worker.get('WEIBO_METRICS_PORT') or settings.getint('WEIBO_METRICS_PORT', 0) or 0)
+    if port:
+        worker['WEIBO_METRICS_PORT'] = str(port + index)
+    textfile = worker.get('WEIBO_METRICS_TEXTFILE') or settings.get('WEIBO_METRICS_TEXTFILE')
+    if textfile:
+        root, ext = os.path.splitext(textfile)
+        worker['WEIBO_METRICS_TEXTFILE'] = f"{root}-{index}{ext}"
+    return worker
+
+
+def spawn_worker(name, frontier_path, overrides):
+    command = [sys.executable, '-m', 'scrapy', 'crawl', 'weibo',
+               '-a', f"frontier={frontier_path}", '-a', f"worker={name}"]
+    for setting, value in overrides.items():
+        command += ['-s', f"{setting}={value}"]
+    return subprocess.Popen(command, cwd=PROJECT_DIR)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="多进程微博抓取：共享持久化关键词前沿，可中断续抓与增量抓取")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="爬虫进程数，默认 CPU 核数")
+    parser.add_argument("--frontier", help="前沿数据库路径，默认 WEIBO_FRONTIER_PATH 或 crawl_state/frontier.sqlite3")
+    parser.add_argument("--keywords", help="逗号分隔的关键词，加入前沿 (已有的保留进度)")
+    parser.add_argument("--keywords-file", help="每行一个关键词，默认 WEIBO_KEYWORDS_FILE / WEIBO_KEYWORDS")
+    parser.add_argument("--new-run", action="store_true", help="开始新一轮增量抓取，翻到上一轮见过的最新帖子为止")
+    parser.add_argument("--max-restarts", type=int, default=3, help="异常退出的进程最多重启的总次数")
+    parser.add_argument("--log-dir", help="各进程日志目录，默认前沿数据库所在目录下的 logs")
+    parser.add_argument("-s", dest="settings", action="append", default=[], metavar="NAME=VALUE",
+                        help="传给每个 scrapy crawl 进程的设置，可重复")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.chdir(PROJECT_DIR)
+    settings = get_project_settings()
+    overrides = parse_overrides(args.settings)
+    frontier_path = os.path.abspath(args.frontier or overrides.get('WEIBO_FRONTIER_PATH')
+                                    or settings.get('WEIBO_FRONTIER_PATH') or 'crawl_state/frontier.sqlite3')
+    log_dir = os.path.abspath(args.log_dir or os.path.join(os.path.dirname(frontier_path), 'logs'))
+    os.makedirs(log_dir, exist_ok=True)
+
+    frontier = KeywordFrontier(frontier_path).open()
+    added = frontier.add_keywords(load_keywords(args, settings))
+    if args.new_run:
+        print(f"开始新一轮增量抓取，重置 {frontier.new_run()} 个关键词。")
+    print(f"关键词前沿 {frontier_path}: 新加入 {added} 个，当前 {frontier.counts()}")
+
+    names = [f"{socket.gethostname()}-w{index}" for index in range(max(1, args.workers))]
+    worker_settings = [worker_overrides(settings, overrides, index, log_dir) for index in range(len(names))]
+    processes = {index: spawn_worker(name, frontier_path, worker_settings[index]) for index, name in enumerate(names)}
+    print(f"已启动 {len(processes)} 个爬虫进程，日志目录 {log_dir}")
+    restarts = 0
+    try:
+        while processes:
+            time.sleep(1)
+            for index, process in list(processes.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                del processes[index]
+                if code == 0:
+                    print(f"进程 {names[index]} 已完成。")
+                    continue
+                # 异常退出：立即交还租约，重启后 (或由其他进程) 从检查点继续
+                released = frontier.release_owner(names[index])
+                counts = frontier.counts()
+                print(f"进程 {names[index]} 异常退出 (code {code})，交还 {released} 个关键词，当前 {counts}")
+                if counts[PENDING] + counts[LEASED] and restarts < args.max_restarts:
+                    restarts += 1
+                    processes[index] = spawn_worker(names[index], frontier_path, worker_settings[index])
+    except KeyboardInterrupt:
+        print("收到中断，等待各进程保存检查点后退出 (再按一次强制结束)...")
+        try:
+            for process in processes.values():
+                process.wait()
+        except KeyboardInterrupt:
+            for process in processes.values():
+                process.kill()
+        for name in names:
+            frontier.release_owner(name)
+    print(f"关键词前沿最终状态: {frontier.counts()}")
+    frontier.close()
+
+
+if __name__ == "__main__":
+    main()
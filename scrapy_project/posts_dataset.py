@@ -0,0 +1,245 @@
+"""
+posts 集合的列式快照：导出为按抓取日期、关键词分区的 Parquet 数据集，供分析脚本离线读取。
+
+用法 (在 scrapy_project 目录下)：
+    python posts_dataset.py --out posts_dataset            # 增量追加上次导出之后的新文档
+    python posts_dataset.py --out posts_dataset --full     # 清空后全量重新导出
+
+增量导出以 _id 为水位线，只追加新插入的文档；已导出文档之后在 MongoDB 中的更新 (如互动数刷新)
+需要 --full 重新导出才会反映到快照中。
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pymongo
+from bson import ObjectId
+from pyarrow import fs
+
+from weibo_collector.dateparse import CST, normalize_date, to_datetime64
+
+MONGO_URI = 'mongodb://localhost:27017'
+MONGO_DATABASE = 'weibo_data'
+POSTS_COLLECTION = 'posts'
+STATE_FILE = "_export_state.json"  # 以 "_" 开头，数据集扫描时会被忽略
+
+SCHEMA = pa.schema([
+    ("_id", pa.string()),
+    ("post_id", pa.string()),
+    ("text", pa.string()),
+    ("author", pa.string()),
+    ("date", pa.timestamp("ms", tz="UTC")),
+    ("date_raw", pa.string()),       # 库中以字符串存放的日期 (旧数据) 的原文
+    ("fetched_at", pa.timestamp("ms", tz="UTC")),
+    ("segmented_text", pa.list_(pa.string())),
+    ("reposts", pa.int64()),
+    ("comments", pa.int64()),
+    ("likes", pa.int64()),
+    ("image_urls", pa.list_(pa.string())),
+    ("images", pa.list_(pa.string())),
+    ("post_url", pa.string()),
+    ("crawl_date", pa.string()),
+    ("keyword", pa.string()),
+])
+TIMESTAMP = pa.timestamp("ms", tz="UTC")
+PARTITIONING = ds.partitioning(pa.schema([("crawl_date", pa.string()), ("keyword", pa.string())]), flavor="hive")
+
+
+def open_dataset(path):
+    """以内存映射方式打开 Parquet 快照"""
+    return ds.dataset(path, schema=SCHEMA, format="parquet", partitioning=PARTITIONING,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def _as_utc(value):
+    """pymongo 读回的是 naive UTC datetime"""
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _as_int(value):
+    return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _fetched_at(doc):
+    """抓取时间：优先 fetched_at，旧数据没有该字段时用 ObjectId 的生成时间"""
+    fetched_at = _as_utc(doc.get("fetched_at"))
+    if fetched_at is None and isinstance(doc.get("_id"), ObjectId):
+        fetched_at = doc["_id"].generation_time
+    return fetched_at
+
+
+def post_dates(dates, dates_raw, fetched_at):
+    """
+    发布时间列：date 为空而 date_raw 有值 (旧数据存的是原始字符串) 时，
+    用 to_datetime64 以各自的抓取时间为锚点成批解析，仍无法识别的保持为空
+    """
+    dates = pa.array(dates, TIMESTAMP)
+    anchors = pa.array(fetched_at, TIMESTAMP).to_numpy(zero_copy_only=False)
+    parsed = pa.array(to_datetime64(pa.array(dates_raw, pa.string()), anchors), TIMESTAMP, from_pandas=True)
+    return pc.coalesce(dates, parsed)
+
+
+def _crawl_date(fetched_at):
+    """抓取日期 (北京时间)，作为分区键"""
+    return fetched_at.astimezone(CST).strftime("%Y-%m-%d") if fetched_at else None
+
+
+def docs_to_table(docs):
+    """把一批 MongoDB 文档转换为 Arrow 表：metrics 展平为数值列，分词结果为 list 列"""
+    columns = {field.name: [] for field in SCHEMA}
+    anchors = []
+    for doc in docs:
+        metrics = doc.get("metrics") or {}
+        date = doc.get("date")
+        fetched_at = _fetched_at(doc)
+        columns["_id"].append(str(doc["_id"]))
+        columns["post_id"].append(str(doc["post_id"]) if doc.get("post_id") else None)
+        columns["text"].append(doc.get("text"))
+        columns["author"].append(doc.get("author"))
+        columns["date"].append(None if isinstance(date, str) else _as_utc(date))
+        columns["date_raw"].append(date if isinstance(date, str) else None)
+        columns["fetched_at"].append(_as_utc(doc.get("fetched_at")))
+        columns["segmented_text"].append(doc.get("segmented_text") or [])
+        columns["reposts"].append(_as_int(metrics.get("reposts")))
+        columns["comments"].append(_as_int(metrics.get("comments")))
+        columns["likes"].append(_as_int(metrics.get("likes")))
+        columns["image_urls"].append(doc.get("image_urls") or [])
+        columns["images"].append([image for image in doc.get("images") or [] if isinstance(image, str)])
+        columns["post_url"].append(doc.get("post_url"))
+        columns["crawl_date"].append(_crawl_date(fetched_at))
+        columns["keyword"].append(doc.get("keyword"))
+        anchors.append(fetched_at)
+    # 字符串日期在整块上一次解析
+    columns["date"] = post_dates(columns["date"], columns["date_raw"], anchors)
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+def load_export_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_export_state(out_dir, state):
+    tmp_path = os.path.join(out_dir, STATE_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, os.path.join(out_dir, STATE_FILE))
+
+
+def export_posts(out_dir, full=False, chunk_size=50000, mongo_uri=MONGO_URI, mongo_db=MONGO_DATABASE):
+    """
+    按 _id 顺序分块读取 posts 并写入分区数据集。每块写完后推进水位线；
+    文件名由块内第一个 _id 决定，中途失败后重跑会覆盖同名文件而不是重复追加。
+    """
+    if full and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_export_state(out_dir)
+    query = {"_id": {"$gt": ObjectId(state["last_id"])}} if state.get("last_id") else {}
+
+    start = time.perf_counter()
+    exported = 0
+    client = pymongo.MongoClient(mongo_uri)
+    try:
+        cursor = (client[mongo_db][POSTS_COLLECTION]
+                  .find(query, batch_size=chunk_size)
+                  .sort("_id", pymongo.ASCENDING))
+        chunk = []
+        for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) >= chunk_size:
+                exported += _write_chunk(out_dir, chunk, state)
+                chunk = []
+        if chunk:
+            exported += _write_chunk(out_dir, chunk, state)
+    finally:
+        client.close()
+    print(f"导出完成: 新增 {exported} 条，累计 {state.get('rows', 0)} 条，"
+          f"水位线 {state.get('last_id')}，耗时 {time.perf_counter() - start:.2f}s")
+    return exported
+
+
+def _write_chunk(out_dir, chunk, state):
+    table = docs_to_table(chunk)
+    ds.write_dataset(table, out_dir, format="parquet", partitioning=PARTITIONING,
+                     basename_template=f"part-{chunk[0]['_id']}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore")
+    state["last_id"] = str(chunk[-1]["_id"])
+    state["rows"] = state.get("rows", 0) + len(chunk)
+    state["updated_at"] = datetime.now().isoformat()
+    _save_export_state(out_dir, state)
+    print(f"已写入 {len(chunk)} 条 (至 {state['last_id']})")
+    return len(chunk)
+
+
+def dataset_filter(start_date=None, end_date=None, keyword=None, after_id=None, until_id=None):
+    """
+    与 PostStream.query() 等价的 Arrow 过滤表达式。有日期条件时，date 为空但有 date_raw 的行
+    (导出时未能识别的旧数据) 也会保留下来，由 date_mask 在读取时重新解析后判断。
+    """
+    expression = pc.list_value_length(pc.field("segmented_text")) > 0
+    if start_date or end_date:
+        in_range = pc.scalar(True)
+        if start_date:
+            in_range &= pc.field("date") >= _timestamp(start_date)
+        if end_date:
+            in_range &= pc.field("date") < _timestamp(end_date)
+        expression &= in_range | (pc.field("date").is_null() & pc.field("date_raw").is_valid())
+    if keyword:
+        expression &= pc.field("keyword") == keyword
+    # ObjectId 的十六进制字符串定长，字典序与 _id 顺序一致
+    if after_id:
+        expression &= pc.field("_id") > str(after_id)
+    if until_id:
+        expression &= pc.field("_id") <= str(until_id)
+    return expression
+
+
+def date_mask(batch, start_date=None, end_date=None):
+    """
+    一批行 (需含 date、date_raw、fetched_at 列) 中发布时间落在 [start_date, end_date) 内的布尔掩码；
+    date 为空的行用当前的 dateparse 重新解析 date_raw，旧快照不必重新导出
+    """
+    dates = post_dates(batch.column("date"), batch.column("date_raw"), batch.column("fetched_at"))
+    mask = pc.is_valid(dates)
+    if start_date:
+        mask = pc.and_(mask, pc.greater_equal(dates, _timestamp(start_date)))
+    if end_date:
+        mask = pc.and_(mask, pc.less(dates, _timestamp(end_date)))
+    return pc.fill_null(mask, False)
+
+
+def _timestamp(value):
+    # 与 PostStream 一致：不带时区的时间按北京时间解释
+    return pa.scalar(normalize_date(value), TIMESTAMP)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把 MongoDB 中的 posts 导出为分区 Parquet 快照")
+    parser.add_argument("--out", default="posts_dataset", help="数据集目录")
+    parser.add_argument("--full", action="store_true", help="清空数据集后全量导出")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="每块读取并写出的文档数")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--mongo-db", default=MONGO_DATABASE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    export_posts(args.out, full=args.full, chunk_size=args.chunk_size,
+                 mongo_uri=args.mongo_uri, mongo_db=args.mongo_db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+离线回放：把响应存档 (WEIBO_ARCHIVE_DIR) 重新送入 weibo 爬虫的解析回调与 Item Pipeline，不访问网络、不启动浏览器。
+
+分段按轮转分给 N 个 scrapy crawl 进程并行处理；默认关闭图片下载与用 MongoDB 预热去重集合 (回放通常是为了重写已有数据)，
+也不会再次写存档。运行：
+    python replay_archive.py archive/ [--workers 2] [-s NAME=VALUE ...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from scrapy.utils.project import get_project_settings
+
+from launch_crawl import PROJECT_DIR, parse_overrides, worker_overrides
+from weibo_collector.archive import list_segments
+
+OFFLINE_PIPELINES = ('weibo_collector.pipelines.WeiboImagesPipeline', 'scrapy.pipelines.images.ImagesPipeline')
+
+
+def replay_overrides(settings, overrides):
+    """回放进程的默认设置，-s 显式给出的优先"""
+    segmentation_workers = settings.get('SEGMENTATION_WORKERS')
+    if segmentation_workers is None:
+        segmentation_workers = max(1, (os.cpu_count() or 2) - 1)
+    # 在途 Item 足够让每个分词进程都有一整批在处理、一批在攒
+    concurrent_items = max(100, 2 * settings.getint('SEGMENTATION_BATCH_SIZE', 64) * int(segmentation_workers))
+    replay = {
+        'ITEM_PIPELINES': json.dumps({name: order for name, order in settings.getdict('ITEM_PIPELINES').items()
+                                      if name not in OFFLINE_PIPELINES}),
+        'DEDUP_SEED_FROM_MONGO': 'False',
+        'WEIBO_ARCHIVE_DIR': '',
+        'PROXY_ENABLED': 'False',
+        'WEIBO_METRICS_ENABLED': 'False',
+        'LOG_LEVEL': 'WARNING',
+        'LOG_FORMATTER': 'weibo_collector.archive.ReplayLogFormatter',
+        'CONCURRENT_ITEMS': str(concurrent_items),
+    }
+    replay.update(overrides)
+    return replay
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="把响应存档离线回放到解析回调与 Item Pipeline")
+    parser.add_argument("paths", nargs="+", help="存档目录、分段文件或通配符")
+    parser.add_argument("--workers", type=int, default=1, help="并行回放的进程数 (每个进程有自己的分词进程池)")
+    parser.add_argument("--log-dir", help="多进程时各进程日志目录，默认 replay_logs")
+    parser.add_argument("-s", dest="settings", action="append", default=[], metavar="NAME=VALUE",
+                        help="传给每个 scrapy crawl 进程的设置，可重复")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    segments = [os.path.abspath(path) for path in list_segments(args.paths)]
+    if not segments:
+        raise SystemExit(f"没有找到存档分段: {' '.join(args.paths)}")
+    os.chdir(PROJECT_DIR)
+    settings = get_project_settings()
+    overrides = replay_overrides(settings, parse_overrides(args.settings))
+    workers = max(1, min(args.workers, len(segments)))
+    log_dir = os.path.abspath(args.log_dir or 'replay_logs')
+    if workers > 1:
+        os.makedirs(log_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    processes = []
+    for index in range(workers):
+        worker = worker_overrides(settings, overrides, index, log_dir) if workers > 1 else overrides
+        command = [sys.executable, '-m', 'scrapy', 'crawl', 'weibo', '-a', f"replay={','.join(segments[index::workers])}"]
+        for setting, value in worker.items():
+            command += ['-s', f"{setting}={value}"]
+        processes.append(subprocess.Popen(command, cwd=PROJECT_DIR))
+    print(f"回放 {len(segments)} 个分段，{workers} 个进程" + (f"，日志目录 {log_dir}" if workers > 1 else ""))
+    codes = [process.wait() for process in processes]
+    print(f"回放完成，用时 {time.perf_counter() - start:.1f} 秒" + (f"，退出码 {codes}" if any(codes) else ""))
+    return max(codes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
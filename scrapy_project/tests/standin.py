@@ -0,0 +1,319 @@
+"""
+本地替身服务与抓取运行器，供 test_standin_*.py 复现各提交说明里的吞吐对比。
+
+替身服务在测试进程的后台线程里运行 (端口随机)，按 handler 模拟 getIndex 接口、全局限速/封禁、按 Cookie 限速、代理与图床；
+抓取在子进程里运行 (reactor 每个进程只能启动一次)：
+    python tests/standin.py '{"spider": "flood", "url": ..., "duration": 10, "settings": {...}}'
+    python tests/standin.py '{"spider": "items", "items": [{"image_urls": [...]}, ...], "settings": {...}}'
+最后一行输出 RESULT <json>，含有效响应数、每秒有效响应数与数值型统计。
+"""
+import collections
+import http.server
+import itertools
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_PATH = '/api/container/getIndex'
+LOGIN_URL = 'https://passport.weibo.com/visitor/visitor'
+
+# 测试用抓取的公共设置：不连 Mongo、不开指标与 telnet
+BASE_SETTINGS = {
+    'LOG_LEVEL': 'WARNING',
+    'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
+    'WEIBO_METRICS_ENABLED': False,
+    'TELNETCONSOLE_ENABLED': False,
+    'RETRY_ENABLED': False,
+    'COOKIES_ENABLED': False,
+    'REQUEST_FINGERPRINTER_IMPLEMENTATION': '2.7',
+}
+
+
+class StandinServer:
+    """在后台线程运行的 ThreadingHTTPServer；handler 通过 self.server.standin 访问共享状态"""
+
+    def __init__(self, handler, **options):
+        self.handler = handler
+        self.options = options
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.state = {}
+        self.httpd = None
+
+    def __enter__(self):
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+
+class StandinHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.0'
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def send_body(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data):
+        self.send_body(200, json.dumps(data).encode('utf-8'))
+
+    def send_login_redirect(self):
+        self.send_response(302)
+        self.send_header('Location', LOGIN_URL)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiHandler(StandinHandler):
+    """录制格式的 getIndex 分页 (每页 3 条、共 pages 页)；关键词含 expired 时重定向到登录页，含 blocked 时返回 HTML"""
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.unquote(url.query)
+        if 'expired' in query:
+            self.standin.count('login_redirect')
+            return self.send_login_redirect()
+        if 'blocked' in query:
+            self.standin.count('html')
+            return self.send_body(200, '<html>请先登录</html>'.encode('utf-8'), 'text/html; charset=utf-8')
+        params = urllib.parse.parse_qs(url.query)
+        page = int(params.get('page', ['1'])[0])
+        keyword = re.sub(r'\W', '', params.get('q', params.get('containerid', ['']))[0]) or 'k'
+        cards = [] if page > self.standin.options.get('pages', 2) else [
+            {'card_type': 9, 'mblog': {'id': f"{keyword}{page}{index}", 'text': f"帖子 {page}-{index}",
+                                       'created_at': 'Sat Oct 18 10:00:00 +0800 2026', 'user': {'screen_name': 'u'},
+                                       'reposts_count': 0, 'comments_count': 0, 'attitudes_count': 0}}
+            for index in range(3)]
+        self.standin.count('ok')
+        self.send_json({'ok': 1, 'data': {'cardlistInfo': {'page': page + 1}, 'cards': cards}})
+
+
+class RateLimitedHandler(StandinHandler):
+    """
+    全站限速：最近 2 秒的请求速率超过 limit 次/秒返回 ok:0，超过两倍时封禁 ban 秒 (期间返回 418)。
+    """
+
+    def do_GET(self):
+        limit = self.standin.options.get('limit', 3.0)
+        now = time.monotonic()
+        with self.standin.lock:
+            state = self.standin.state.setdefault('state', {'hits': collections.deque(), 'banned_until': 0.0})
+            hits = state['hits']
+            while hits and hits[0] < now - 2:
+                hits.popleft()
+            hits.append(now)
+            rate = len(hits) / 2
+            if now < state['banned_until']:
+                kind = 'ban'
+            elif rate > 2 * limit:
+                state['banned_until'] = now + self.standin.options.get('ban', 10.0)
+                kind = 'ban'
+            elif rate > limit:
+                kind = 'throttle'
+            else:
+                kind = 'ok'
+            self.standin.counts[kind] += 1
+        time.sleep(0.05)
+        if kind == 'ban':
+            return self.send_body(418, b'')
+        if kind == 'throttle':
+            return self.send_json({'ok': 0, 'msg': '请求过于频繁，请稍后再试'})
+        self.send_json({'ok': 1, 'data': {'cards': [1]}})
+
+
+class PerCookieHandler(StandinHandler):
+    """
+    按 Cookie (SUB) 限速：每个账号最近 2 秒超过 limit 次/秒返回 ok:0；没有 Cookie 或名为 expiring 的账号
+    第 expire_after 次之后重定向到登录页。
+    """
+
+    def do_GET(self):
+        limit = self.standin.options.get('limit', 1.0)
+        expire_after = self.standin.options.get('expire_after', 15)
+        match = re.search(r'SUB=([\w-]+)', self.headers.get('Cookie', ''))
+        account = match.group(1) if match else None
+        now = time.monotonic()
+        with self.standin.lock:
+            hits = self.standin.state.setdefault('hits', collections.defaultdict(collections.deque))
+            served = self.standin.state.setdefault('served', collections.Counter())
+            if account is None:
+                kind = 'login'
+            else:
+                served[account] += 1
+                window = hits[account]
+                while window and window[0] < now - 2:
+                    window.popleft()
+                window.append(now)
+                if account == 'expiring' and served[account] > expire_after:
+                    kind = 'login'
+                elif len(window) / 2 > limit:
+                    kind = 'throttle'
+                else:
+                    kind = 'ok'
+            self.standin.counts[f"{account}:{kind}"] += 1
+        time.sleep(0.05)
+        if kind == 'login':
+            return self.send_login_redirect()
+        if kind == 'throttle':
+            return self.send_json({'ok': 0, 'msg': '请求过于频繁'})
+        self.send_json({'ok': 1, 'data': {'cards': [1]}})
+
+
+class ImageHandler(StandinHandler):
+    """图床：options['images'] 为 {路径: 图片字节}，按路径计数，未知路径返回 404"""
+
+    def do_GET(self):
+        path = urllib.parse.urlparse(self.path).path
+        body = self.standin.options.get('images', {}).get(path)
+        self.standin.count(path)
+        if body is None:
+            return self.send_body(404, b'', 'text/plain')
+        self.send_body(200, body, 'image/jpeg')
+
+
+def proxy_handler(upstream, latency=0.02, status=None, body=b'', content_type='text/plain'):
+    """
+    转发到 upstream 的 HTTP 代理；给定 status 时不转发，直接返回该状态 (模拟封禁或故障的代理)。
+    """
+
+    class ProxyHandler(StandinHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            if status is not None:
+                self.standin.count(f"status_{status}")
+                return self.send_body(status, body, content_type)
+            target = urllib.parse.urlparse(self.path)
+            with urllib.request.urlopen(f"{upstream}{target.path}?{target.query}") as response:
+                self.standin.count('forwarded')
+                self.send_body(response.status, response.read(), response.headers.get('Content-Type'))
+
+    return ProxyHandler
+
+
+class RandomProxyMiddleware:
+    """原先的代理选取方式：每个请求均匀随机选一个代理，失败不换代理重试 (对照组)"""
+
+    def __init__(self, proxies):
+        self.proxies = proxies
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.getlist('PROXY_LIST'))
+
+    def process_request(self, request, spider):
+        request.meta['proxy'] = random.choice(self.proxies)
+
+
+def write_accounts(directory, names, domain='127.0.0.1'):
+    """每个账号一个 storage_state 文件，SUB 的值即账号名"""
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        state = {'cookies': [{'name': 'SUB', 'value': name, 'domain': domain, 'expires': -1},
+                             {'name': 'XSRF-TOKEN', 'value': f"t{name}", 'domain': domain, 'expires': -1}],
+                 'origins': []}
+        with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+    return directory
+
+
+def run_crawl(config, timeout=180):
+    """在子进程里运行一次抓取，返回 RESULT 一行解析出的 dict"""
+    paths = [PROJECT_DIR, os.path.dirname(os.path.abspath(__file__)), os.environ.get('PYTHONPATH')]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, paths)))
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), json.dumps(config)], cwd=PROJECT_DIR,
+                               env=env, capture_output=True, text=True, timeout=timeout)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith('RESULT '):
+            return json.loads(line[len('RESULT '):])
+    raise AssertionError(f"抓取子进程没有输出结果 (exit {completed.returncode}):\n{completed.stderr[-3000:]}")
+
+
+def _main(config):
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    class FloodSpider(scrapy.Spider):
+        """不断请求同一接口，统计 ok:1 的响应数"""
+        name = 'flood'
+        good = 0
+
+        def start_requests(self):
+            for index in itertools.count():
+                yield scrapy.Request(f"{config['url']}?n={index}", callback=self.parse, errback=self.errback,
+                                     meta={'dont_redirect': True, 'handle_httpstatus_list': [302]})
+
+        def parse(self, response):
+            if response.status == 200 and b'"ok": 1' in response.body:
+                self.good += 1
+
+        def errback(self, failure):
+            pass
+
+    class ItemsSpider(scrapy.Spider):
+        """一个 data: 请求的回调里按顺序产出 config['items'] (配合 CONCURRENT_ITEMS=1 逐条经过 Pipeline)"""
+        name = 'items'
+
+        def start_requests(self):
+            yield scrapy.Request('data:,', callback=self.parse)
+
+        def parse(self, response):
+            for item in config['items']:
+                yield dict(item)
+
+    if config['spider'] in ('flood', 'items'):
+        settings = dict(BASE_SETTINGS)
+        if config['spider'] == 'flood':
+            settings['CLOSESPIDER_TIMEOUT'] = config['duration']
+        settings.update(config.get('settings', {}))
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(FloodSpider if config['spider'] == 'flood' else ItemsSpider)
+    else:
+        settings = get_project_settings()
+        settings.setdict(BASE_SETTINGS, priority='cmdline')
+        settings.setdict(config.get('settings', {}), priority='cmdline')
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(config['spider'])
+    process.crawl(crawler, **config.get('spider_kwargs', {}))
+    process.start()
+    stats = {key: value for key, value in crawler.stats.get_stats().items()
+             if isinstance(value, (int, float)) and not isinstance(value, bool)}
+    good = getattr(crawler.spider, 'good', 0)
+    result = {'good': good, 'good_per_sec': good / stats['elapsed_time_seconds'], 'stats': stats}
+    print('RESULT ' + json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    _main(json.loads(sys.argv[1]))
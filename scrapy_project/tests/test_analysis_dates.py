@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+from bson import ObjectId
+
+from analyze_weibo_data import ParquetPostStream, PostStream, parse_args
+from posts_dataset import PARTITIONING, TIMESTAMP, docs_to_table
+from weibo_collector.dateparse import CST
+
+
+def test_cli_dates_are_beijing_time():
+    args = parse_args(['--start-date', '2026-10-01', '--end-date', '2026-10-02 08:00'])
+    query = PostStream(start_date=args.start_date, end_date=args.end_date).query()
+    assert query['date']['$gte'] == datetime(2026, 9, 30, 16, tzinfo=timezone.utc)
+    assert query['date']['$lt'] == datetime(2026, 10, 2, 0, tzinfo=timezone.utc)
+
+
+def test_naive_bounds_are_beijing_time():
+    query = PostStream(start_date=datetime(2026, 10, 1)).query()
+    assert query['date']['$gte'] == datetime(2026, 10, 1, tzinfo=CST)
+
+
+def test_parquet_filter_uses_beijing_day(tmp_path):
+    # 北京时间 10-01 07:00 (UTC 前一天 23:00) 属于 10-01，10-02 00:30 不属于
+    dates = [datetime(2026, 9, 30, 23, 30, tzinfo=CST), datetime(2026, 10, 1, 7, tzinfo=CST),
+             datetime(2026, 10, 1, 23, 59, tzinfo=CST), datetime(2026, 10, 2, 0, 30, tzinfo=CST)]
+    docs = [{'_id': ObjectId(), 'post_id': str(i), 'date': date, 'segmented_text': ['词'], 'keyword': 'k',
+             'fetched_at': date} for i, date in enumerate(dates)]
+    ds.write_dataset(docs_to_table(docs), str(tmp_path), format='parquet', partitioning=PARTITIONING)
+
+    args = parse_args(['--start-date', '2026-10-01', '--end-date', '2026-10-02'])
+    stream = ParquetPostStream(str(tmp_path), start_date=args.start_date, end_date=args.end_date,
+                               fields=('post_id',))
+    assert sorted(doc['post_id'] for doc in stream) == ['1', '2']
+
+
+def test_export_parses_legacy_string_dates_at_fetch_time():
+    fetched_at = datetime(2026, 10, 1, 2, tzinfo=timezone.utc)  # 北京时间 10:00
+    docs = [{'_id': ObjectId(), 'date': '3小时前', 'fetched_at': fetched_at, 'segmented_text': ['词']},
+            {'_id': ObjectId(), 'date': '昨天 23:10', 'fetched_at': fetched_at, 'segmented_text': ['词']},
+            {'_id': ObjectId(), 'date': '未知时间', 'fetched_at': fetched_at, 'segmented_text': ['词']}]
+    table = docs_to_table(docs).to_pydict()
+    assert table['date'][:2] == [datetime(2026, 9, 30, 23, tzinfo=timezone.utc),
+                                 datetime(2026, 9, 30, 15, 10, tzinfo=timezone.utc)]
+    assert table['date'][2] is None
+    assert table['date_raw'] == ['3小时前', '昨天 23:10', '未知时间']
+    assert table['crawl_date'] == ['2026-10-01'] * 3
+
+
+def test_parquet_filter_reparses_legacy_rows(tmp_path):
+    # 旧快照中 date 为空、只有 date_raw 的行在读取时以抓取时间为锚点重新解析
+    fetched_at = datetime(2026, 10, 1, 2, tzinfo=timezone.utc)  # 北京时间 10:00
+    docs = [{'_id': ObjectId(), 'post_id': str(i), 'date': raw, 'segmented_text': ['词'], 'keyword': 'k',
+             'fetched_at': fetched_at} for i, raw in enumerate(['3小时前', '昨天 23:10', '未知时间'])]
+    table = docs_to_table(docs)
+    table = table.set_column(table.schema.get_field_index('date'), 'date', pa.nulls(len(docs), TIMESTAMP))
+    ds.write_dataset(table, str(tmp_path), format='parquet', partitioning=PARTITIONING)
+
+    stream = ParquetPostStream(str(tmp_path), start_date='2026-10-01', fields=('post_id',))
+    assert [doc['post_id'] for doc in stream] == ['0']
+    assert stream.count() == 1
+    assert stream.latest_id() == str(docs[0]['_id'])
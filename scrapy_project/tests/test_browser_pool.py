@@ -0,0 +1,145 @@
+import asyncio
+
+from scrapy import Request, Spider
+
+from weibo_collector.browser_pool import BrowserContextPool
+from weibo_collector.middlewares import ContextPoolMiddleware
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    def __init__(self, context=None):
+        self.context = context or FakeContext()
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class PoolSpider(Spider):
+    name = 'weibo'
+
+    def __init__(self, pool):
+        super().__init__()
+        self.context_pool = pool
+
+
+def pool_request():
+    return Request('https://m.weibo.cn/api/container/getIndex', meta={'playwright': True, 'weibo_context_pool': True})
+
+
+def in_use(pool):
+    return sum(slot.load() for slot in pool.slots)
+
+
+def test_slot_is_taken_at_download_not_when_built():
+    pool = BrowserContextPool(size=2)
+    spider = PoolSpider(pool)
+    middleware = ContextPoolMiddleware()
+    queued = [pool_request() for _ in range(10)]
+    assert in_use(pool) == 0
+
+    middleware.process_request(queued[0], spider)
+    assert in_use(pool) == 1
+    assert queued[0].meta['playwright_context'].startswith('weibo-auth-')
+    # 同一请求 (如重试) 不重复领取
+    middleware.process_request(queued[0], spider)
+    assert in_use(pool) == 1
+    # 不走上下文池的请求不受影响
+    plain = Request('https://m.weibo.cn/api/container/getIndex')
+    middleware.process_request(plain, spider)
+    assert 'playwright_context' not in plain.meta and in_use(pool) == 1
+
+
+def test_download_error_releases_slot_and_retry_reacquires():
+    pool = BrowserContextPool(size=1)
+    spider = PoolSpider(pool)
+    middleware = ContextPoolMiddleware()
+    request = pool_request()
+    middleware.process_request(request, spider)
+    page = request.meta['playwright_page'] = FakePage()
+
+    asyncio.run(middleware.process_exception(request, TimeoutError(), spider))
+    assert in_use(pool) == 0 and page.closed
+    assert 'weibo_pool_slot' not in request.meta and 'playwright_page' not in request.meta
+
+    retry = request.replace(dont_filter=True)
+    middleware.process_request(retry, spider)
+    assert in_use(pool) == 1
+
+
+def test_release_is_idempotent_and_warm_page_is_reused():
+    pool = BrowserContextPool(size=1, warm_pages=1)
+    spider = PoolSpider(pool)
+    middleware = ContextPoolMiddleware()
+    request = pool_request()
+    middleware.process_request(request, spider)
+    assert 'playwright_page_event_handlers' in request.meta
+    page = FakePage()
+
+    async def release_twice():
+        await pool.release(page, request.meta)
+        await pool.release(page, request.meta)  # 如回调与 errback 都调用
+
+    asyncio.run(release_twice())
+    assert in_use(pool) == 0 and not page.closed and pool.slots[0].idle_pages == [page]
+
+    second = pool_request()
+    middleware.process_request(second, spider)
+    assert second.meta['playwright_page'] is page
+    # 复用的页面已挂过捕获监听器
+    assert 'playwright_page_event_handlers' not in second.meta
+
+
+def test_stale_context_is_closed_when_last_request_returns_without_page():
+    pool = BrowserContextPool(size=1)
+    spider = PoolSpider(pool)
+    middleware = ContextPoolMiddleware()
+    first, second = pool_request(), pool_request()
+    middleware.process_request(first, spider)
+    middleware.process_request(second, spider)
+    context = FakeContext()
+    page = FakePage(context)
+
+    async def release():
+        await pool.release(page, first.meta, login_redirect=True)
+        # 同代另一个请求仍在途：只关闭页面
+        assert page.closed and not context.closed
+        # 该请求没有拿到页面 (如回调中页面已丢失)，最后一个归还时仍关闭旧代上下文
+        await pool.release(None, second.meta)
+
+    asyncio.run(release())
+    assert context.closed and pool.slots[0].generation == 1 and pool.slots[0].contexts == {}
+
+
+def test_spider_closed_closes_pool():
+    pool = BrowserContextPool(size=1, warm_pages=1)
+    spider = PoolSpider(pool)
+    middleware = ContextPoolMiddleware()
+    recycled, lost = pool_request(), pool_request()
+    middleware.process_request(recycled, spider)
+    middleware.process_request(lost, spider)
+    stale_context = FakeContext()
+    warm_page = FakePage()
+
+    async def run():
+        await pool.release(FakePage(stale_context), recycled.meta, login_redirect=True)
+        # lost 一直没有归还，旧代上下文保持打开；新一代留下一个热页面
+        request = pool_request()
+        middleware.process_request(request, spider)
+        await pool.release(warm_page, request.meta)
+        assert not stale_context.closed and not warm_page.closed
+        await middleware.spider_closed(spider).asFuture(asyncio.get_running_loop())
+
+    asyncio.run(run())
+    assert stale_context.closed and warm_page.closed
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from weibo_collector.dateparse import CST, normalize_date, to_datetime64
+
+NOW = datetime(2026, 1, 2, 10, 30, tzinfo=CST)
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('刚刚', NOW),
+    ('5分钟前', NOW - timedelta(minutes=5)),
+    ('2小时前', NOW - timedelta(hours=2)),
+    ('昨天 23:10', datetime(2026, 1, 1, 23, 10, tzinfo=CST)),
+    ('01-02', datetime(2026, 1, 2, tzinfo=CST)),
+    ('12月31日 08:00', datetime(2025, 12, 31, 8, tzinfo=CST)),  # 不带年份且落在锚点之后，归到上一年
+    ('2025-06-01 12:00:05', datetime(2025, 6, 1, 12, 0, 5, tzinfo=CST)),
+    ('Sat Oct 18 10:00:00 +0800 2025', datetime(2025, 10, 18, 10, tzinfo=CST)),
+    ('Sat Oct 18 02:00:00 +0000 2025', datetime(2025, 10, 18, 10, tzinfo=CST)),
+])
+def test_formats(raw, expected):
+    assert normalize_date(raw, NOW) == expected
+
+
+def test_anchor_and_naive_values_are_beijing_time():
+    assert normalize_date('刚刚', datetime(2026, 1, 2, 2, 30, tzinfo=timezone.utc)) == NOW
+    assert normalize_date('刚刚', datetime(2026, 1, 2, 10, 30)) == NOW
+    assert normalize_date(datetime(2026, 1, 2)) == datetime(2026, 1, 2, tzinfo=CST)
+
+
+@pytest.mark.parametrize('raw', ['', None, '未知时间', '13-45', 42])
+def test_unparseable(raw):
+    assert normalize_date(raw, NOW) is None
+
+
+def ms(value):
+    return np.datetime64(int(value.timestamp() * 1000), 'ms') if value else np.datetime64('NaT', 'ms')
+
+
+def test_batch_matches_normalize_date():
+    raws = ['刚刚', '5分钟前', '3天前', '昨天 23:10', '今天 08:00', '01-02', '12月31日 08:00', '2024-02-29',
+            '2025-06-01 12:00:05', 'Sat Oct 18 02:00:00 -0530 2025', '昨天\u300023:10', '', None, '未知时间',
+            '13-45', '02-30', '02-29', '昨天 25:00', '01-02']
+    expected = np.array([ms(normalize_date(raw, NOW)) for raw in raws])
+    np.testing.assert_array_equal(to_datetime64(raws, NOW), expected)
+
+
+def test_batch_with_per_element_anchors():
+    anchors = np.array([ms(NOW), ms(NOW - timedelta(days=1)), np.datetime64('NaT'), np.datetime64('NaT')])
+    parsed = to_datetime64(['刚刚', '刚刚', '刚刚', '2025-06-01 12:00'], anchors)
+    np.testing.assert_array_equal(parsed, [ms(NOW), ms(NOW - timedelta(days=1)), np.datetime64('NaT'),
+                                           ms(datetime(2025, 6, 1, 12, tzinfo=CST))])
@@ -0,0 +1,131 @@
+import pytest
+from pymongo.errors import BulkWriteError
+from scrapy import Spider, signals
+from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
+
+from weibo_collector.pipelines import DuplicatesPipeline, MongoPipeline, SeenPostIds
+
+MONGO_PIPELINES = {'weibo_collector.pipelines.DuplicatesPipeline': 0, 'weibo_collector.pipelines.MongoPipeline': 800}
+SETTINGS = {'DEDUP_SEED_FROM_MONGO': False, 'ITEM_PIPELINES': MONGO_PIPELINES}
+
+
+class FakePosts:
+    """bulk_write 时让指定下标的操作失败"""
+
+    def __init__(self, fail=(), code=121):
+        self.fail = fail
+        self.code = code
+        self.batches = []
+
+    def bulk_write(self, operations, ordered=False):
+        self.batches.append(operations)
+        if self.fail:
+            raise BulkWriteError({'writeErrors': [{'index': index, 'code': self.code, 'errmsg': 'rejected'}
+                                                  for index in self.fail]})
+
+
+class FakeDb:
+    def __init__(self, posts):
+        self.posts = posts
+
+
+def is_duplicate(pipeline, item, spider):
+    try:
+        pipeline.process_item(item, spider)
+    except DropItem:
+        return True
+    return False
+
+
+def write_buffer(mongo, spider):
+    """同步执行一次 flush (不经过线程池)"""
+    operations, mongo._buffer = mongo._buffer, []
+    post_ids, mongo._buffer_ids = mongo._buffer_ids, []
+    mongo._on_batch_written(mongo._write_batch(operations), post_ids, spider)
+
+
+@pytest.fixture
+def crawler():
+    crawler = get_crawler(Spider, SETTINGS)
+    crawler.spider = Spider('weibo')
+    return crawler
+
+
+def test_seen_post_ids_membership():
+    seen = SeenPostIds(['3', '1', 'abc'])
+    assert '1' in seen and 'abc' in seen and '2' not in seen
+    assert seen.add(2) and 2 in seen and not seen.add('2')
+
+
+def test_failed_write_is_not_remembered(crawler):
+    spider = crawler.spider
+    dedup = DuplicatesPipeline.from_crawler(crawler)
+    mongo = MongoPipeline.from_crawler(crawler)
+    mongo.db = FakeDb(FakePosts(fail=[1]))
+    items = [{'post_id': post_id, 'text': post_id} for post_id in ('1', '2', '3')]
+    for item in items:
+        dedup.process_item(item, spider)
+        mongo.process_item(item, spider)
+    # 写入确认之前，同一帖子的其他副本仍被丢弃
+    assert is_duplicate(dedup, {'post_id': '2'}, spider)
+
+    write_buffer(mongo, spider)
+    assert is_duplicate(dedup, {'post_id': '1'}, spider)
+    assert is_duplicate(dedup, {'post_id': '3'}, spider)
+    assert not is_duplicate(dedup, {'post_id': '2'}, spider)
+
+
+def test_duplicate_key_on_upsert_counts_as_stored(crawler):
+    spider = crawler.spider
+    dedup = DuplicatesPipeline.from_crawler(crawler)
+    mongo = MongoPipeline.from_crawler(crawler)
+    mongo.db = FakeDb(FakePosts(fail=[0], code=11000))
+    item = {'post_id': '7'}
+    mongo.process_item(dedup.process_item(item, spider), spider)
+    write_buffer(mongo, spider)
+    assert is_duplicate(dedup, {'post_id': '7'}, spider)
+
+
+def test_connection_error_releases_whole_batch(crawler):
+    spider = crawler.spider
+    dedup = DuplicatesPipeline.from_crawler(crawler)
+    mongo = MongoPipeline.from_crawler(crawler)
+
+    class Unreachable:
+        def bulk_write(self, operations, ordered=False):
+            from pymongo.errors import ServerSelectionTimeoutError
+            raise ServerSelectionTimeoutError('no server')
+
+    mongo.db = FakeDb(Unreachable())
+    for post_id in ('1', '2'):
+        mongo.process_item(dedup.process_item({'post_id': post_id}, spider), spider)
+    write_buffer(mongo, spider)
+    assert not is_duplicate(dedup, {'post_id': '1'}, spider)
+    assert crawler.stats.get_value('dedup/released') == 2
+
+
+def test_item_dropped_downstream_is_released(crawler):
+    spider = crawler.spider
+    dedup = DuplicatesPipeline.from_crawler(crawler)
+    original = {'post_id': '5'}
+    dedup.process_item(original, spider)
+    copy = {'post_id': '5'}
+    assert is_duplicate(dedup, copy, spider)
+    # 本管道丢弃的副本不影响原件
+    crawler.signals.send_catch_log(signals.item_dropped, item=copy, response=None, spider=spider,
+                                   exception=DropItem('dup'))
+    assert is_duplicate(dedup, {'post_id': '5'}, spider)
+    crawler.signals.send_catch_log(signals.item_dropped, item=original, response=None, spider=spider,
+                                   exception=DropItem('later pipeline'))
+    assert not is_duplicate(dedup, {'post_id': '5'}, spider)
+
+
+def test_without_mongo_pipeline_scraped_items_are_remembered():
+    crawler = get_crawler(Spider, {'DEDUP_SEED_FROM_MONGO': False,
+                                   'ITEM_PIPELINES': {'weibo_collector.pipelines.DuplicatesPipeline': 0}})
+    spider = Spider('weibo')
+    dedup = DuplicatesPipeline.from_crawler(crawler)
+    item = dedup.process_item({'post_id': '9'}, spider)
+    crawler.signals.send_catch_log(signals.item_scraped, item=item, response=None, spider=spider)
+    assert dedup.pending == {} and '9' in dedup.seen
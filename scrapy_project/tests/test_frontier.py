@@ -0,0 +1,58 @@
+from weibo_collector.frontier import DONE, LEASED, PENDING, KeywordFrontier
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def open_frontier(tmp_path, clock):
+    return KeywordFrontier(str(tmp_path / 'frontier.sqlite3'), lease_ttl=60, clock=clock).open()
+
+
+def test_lease_is_exclusive_until_it_expires(tmp_path):
+    clock = FakeClock()
+    frontier = open_frontier(tmp_path, clock)
+    frontier.add_keywords(['a', 'b'])
+    assert [lease.keyword for lease in frontier.lease('w1', 2)] == ['a', 'b']
+    assert frontier.lease('w2', 2) == []
+    clock.now += 61
+    assert [lease.keyword for lease in frontier.lease('w2', 1)] == ['a']
+
+
+def test_checkpoint_resumes_after_crash(tmp_path):
+    clock = FakeClock()
+    frontier = open_frontier(tmp_path, clock)
+    frontier.add_keywords(['a'])
+    frontier.lease('w1')
+    assert frontier.checkpoint('a', 'w1', 3, since_id='s3', newest_id=900)
+    clock.now += 61
+    lease, = frontier.lease('w2')
+    assert (lease.page, lease.since_id, lease.newest_id) == (3, 's3', 900)
+    # 旧持有者的租约已被接管
+    assert not frontier.checkpoint('a', 'w1', 4)
+
+
+def test_new_run_restarts_done_pending_and_expired_keywords(tmp_path):
+    clock = FakeClock()
+    frontier = open_frontier(tmp_path, clock)
+    frontier.add_keywords(['done', 'crashed', 'live'])
+    frontier.lease('w1', 2)
+    frontier.checkpoint('done', 'w1', 5, newest_id=500)
+    frontier.complete('done', 'w1', 500)
+    frontier.checkpoint('crashed', 'w1', 4, since_id='s4', newest_id=400)
+    clock.now += 61  # w1 崩溃，crashed 的租约过期
+    frontier.lease('w2', 1, exclude=['crashed'])
+    frontier.checkpoint('live', 'w2', 2, since_id='s2')
+
+    assert frontier.new_run() == 2
+    assert frontier.counts() == {PENDING: 2, LEASED: 1, DONE: 0}
+    leases = {lease.keyword: lease for lease in frontier.lease('w3', 3)}
+    assert set(leases) == {'done', 'crashed'}
+    assert (leases['crashed'].page, leases['crashed'].since_id, leases['crashed'].newest_id) == (0, None, None)
+    assert leases['done'].last_seen_id == 500
+    # 仍在有效租约中的关键词不受影响
+    assert frontier.checkpoint('live', 'w2', 3)
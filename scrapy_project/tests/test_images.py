@@ -0,0 +1,25 @@
+import pytest
+
+from weibo_collector.images import canonical_image_url
+
+
+@pytest.mark.parametrize('url', [
+    'https://wx1.sinaimg.cn/orj360/006abc.jpg',
+    'https://wx1.sinaimg.cn/thumbnail/006abc.jpg',
+    'https://wx1.sinaimg.cn/large/006abc.jpg',
+    'http://wx3.sinaimg.cn/orj360/006abc.jpg',
+    'https://ww2.sinaimg.cn/thumbnail/006abc.jpg',
+])
+def test_size_variants_and_mirrors_share_one_url(url):
+    assert canonical_image_url(url) == 'https://wx1.sinaimg.cn/large/006abc.jpg'
+
+
+def test_other_urls_are_kept():
+    # 非镜像域名只换尺寸，不换域名与协议；不认识的路径与域名原样返回
+    assert canonical_image_url('http://tvax1.sinaimg.cn/orj360/006abc.jpg') == \
+        'http://tvax1.sinaimg.cn/large/006abc.jpg'
+    assert canonical_image_url('https://wx1.sinaimg.cn/crop.0.0.180.180/006abc.jpg') == \
+        'https://wx1.sinaimg.cn/crop.0.0.180.180/006abc.jpg'
+    assert canonical_image_url('https://example.com/orj360/006abc.jpg') == 'https://example.com/orj360/006abc.jpg'
+    assert canonical_image_url('https://wx1.sinaimg.cn/orj360/006abc.jpg', size='mw690') == \
+        'https://wx1.sinaimg.cn/mw690/006abc.jpg'
@@ -0,0 +1,56 @@
+import pytest
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from weibo_collector.metrics import CrawlMetrics, LatencyHistogram, MetricsExtension
+
+
+def histogram(*values):
+    result = LatencyHistogram()
+    for value in values:
+        result.observe(value)
+    return result
+
+
+def test_quantile_interpolates_within_bucket():
+    # 两个落在 (0, 0.0005]，两个落在 (0.1, 0.25]
+    latencies = histogram(0.0003, 0.0003, 0.2, 0.2)
+    assert latencies.quantile(0.25) == pytest.approx(0.00025)
+    assert latencies.quantile(0.75) == pytest.approx(0.175)
+    # 插值结果不超过观测到的最大值
+    assert latencies.quantile(1.0) == pytest.approx(0.2)
+    assert histogram().quantile(0.5) == 0.0
+
+
+def test_quantile_in_inf_bucket_is_max():
+    latencies = histogram(0.02, 100.0, 250.0)
+    assert latencies.counts[-1] == 2
+    assert latencies.quantile(0.9) == 250.0
+    assert latencies.quantile(0.3) == pytest.approx(0.01 + 0.015 * 0.9)
+
+
+def test_render_prometheus():
+    crawler = get_crawler(Spider)
+    metrics = CrawlMetrics()
+    metrics.observe('download', 0.2)
+    metrics.observe('download', 90.0)
+    metrics.register_gauge('queue_depth', lambda: 7)
+    metrics.register_gauge('broken', lambda: 1 / 0)
+    crawler.stats.set_value('weibo/http_fallback/redirect', 3)
+    crawler.stats.set_value('item_scraped_count', 12)
+    lines = MetricsExtension(crawler, metrics).render_prometheus().splitlines()
+
+    assert '# TYPE weibo_stage_latency_seconds histogram' in lines
+    # 桶计数是累计值，+Inf 桶等于总数
+    assert 'weibo_stage_latency_seconds_bucket{stage="download",le="0.1"} 0' in lines
+    assert 'weibo_stage_latency_seconds_bucket{stage="download",le="0.25"} 1' in lines
+    assert 'weibo_stage_latency_seconds_bucket{stage="download",le="60.0"} 1' in lines
+    assert 'weibo_stage_latency_seconds_bucket{stage="download",le="+Inf"} 2' in lines
+    assert 'weibo_stage_latency_seconds_sum{stage="download"} 90.2' in lines
+    assert 'weibo_stage_latency_seconds_count{stage="download"} 2' in lines
+    # 读取失败的 gauge 跳过
+    assert 'weibo_queue_depth 7' in lines and not any('broken' in line for line in lines)
+    assert 'weibo_login_redirects_total{path="http"} 3' in lines
+    assert 'weibo_login_redirects_total{path="browser"} 0' in lines
+    assert 'weibo_items_scraped_total 12' in lines
+    assert 'weibo_items_dropped_total 0' in lines
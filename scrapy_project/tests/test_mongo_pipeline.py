@@ -0,0 +1,98 @@
+import pytest
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+from test_dedup import FakeDb, FakePosts
+from weibo_collector.pipelines import MongoPipeline
+
+
+class ManualThreads:
+    """代替线程池：deferToThread 只登记写入，由测试决定何时 (按顺序) 执行完成，模拟慢速的 MongoDB"""
+
+    def __init__(self):
+        self.calls = []
+
+    def deferToThread(self, function, *args):
+        d = defer.Deferred()
+        self.calls.append((d, function, args))
+        return d
+
+    def finish(self):
+        d, function, args = self.calls.pop(0)
+        d.callback(function(*args))
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    threads = ManualThreads()
+    monkeypatch.setattr('weibo_collector.pipelines.threads', threads)
+    return threads
+
+
+def make_pipeline(posts, **settings):
+    crawler = get_crawler(Spider, dict({'DEDUP_SEED_FROM_MONGO': False}, **settings))
+    mongo = MongoPipeline.from_crawler(crawler)
+    mongo.db = FakeDb(posts)
+    return mongo, Spider('weibo')
+
+
+def test_process_item_does_not_wait_for_the_write(threads):
+    posts = FakePosts()
+    mongo, spider = make_pipeline(posts, MONGO_BULK_SIZE=2)
+    items = [{'post_id': str(index)} for index in range(3)]
+    assert [mongo.process_item(item, spider) for item in items] == items
+    # 第一批已交给线程池但还没写，第三条留在缓冲中
+    assert len(threads.calls) == 1 and posts.batches == []
+    threads.finish()
+    assert len(posts.batches[0]) == 2 and len(mongo._buffer) == 1
+
+
+def test_backpressure_stops_new_writes_at_the_limit(threads):
+    posts = FakePosts()
+    mongo, spider = make_pipeline(posts, MONGO_BULK_SIZE=10, MONGO_MAX_PENDING_BATCHES=2)
+    results = [mongo.process_item({'post_id': str(index)}, spider) for index in range(200)]
+    # 两批在途后不再发起写入；缓冲攒满一批之后的 Item 都在等待
+    assert len(threads.calls) == 2
+    waiters = [result for result in results if isinstance(result, defer.Deferred)]
+    assert len(waiters) == 171 and len(mongo._waiters) == 171
+    assert mongo.stats.get_value('mongo/bulk/backpressure_waits') == 171
+
+    threads.finish()
+    # 空出的位置写出缓冲中的下一批，缓冲仍超过一批，继续等待
+    assert len(threads.calls) == 2 and len(mongo._buffer) == 170 and len(mongo._waiters) == 171
+    while threads.calls:
+        threads.finish()
+    assert mongo._waiters == [] and all(waiter.called for waiter in waiters)
+    assert [len(batch) for batch in posts.batches] == [10] * 20
+    assert mongo.stats.get_value('mongo/bulk/items') == 200
+
+
+def test_partial_buffer_is_flushed_on_age_and_at_close(threads):
+    posts = FakePosts()
+    mongo, spider = make_pipeline(posts, MONGO_BULK_SIZE=10, MONGO_FLUSH_INTERVAL=2.0)
+    for index in range(3):
+        mongo.process_item({'post_id': str(index)}, spider)
+    mongo._flush_if_stale(spider)
+    assert threads.calls == []
+    mongo._buffer_started -= 5
+    mongo._flush_if_stale(spider)
+    threads.finish()
+    assert [len(batch) for batch in posts.batches] == [3]
+
+    for index in range(3, 5):
+        mongo.process_item({'post_id': str(index)}, spider)
+    closed = mongo.close_spider(spider)
+    assert not closed.called
+    threads.finish()
+    assert closed.called and [len(batch) for batch in posts.batches] == [3, 2]
+
+
+def test_duplicate_keys_are_not_errors(threads):
+    mongo, spider = make_pipeline(FakePosts(fail=[0], code=11000))
+    mongo.process_item({'post_id': '1'}, spider)
+    mongo.close_spider(spider)
+    threads.finish()
+    assert mongo.stats.get_value('mongo/bulk/errors') is None
+    assert mongo.stats.get_value('mongo/bulk/duplicate_keys') == 1
+    assert mongo.stats.get_value('mongo/bulk/items') == 1
@@ -0,0 +1,103 @@
+from weibo_collector.pagination import KeywordCursor
+
+BASE = 'https://m.weibo.cn/api/container/getIndex?containerid=100103type%3D1%26q%3Dk'
+
+
+def cursor(**kwargs):
+    kwargs.setdefault('max_pages', 10)
+    kwargs.setdefault('fanout', 3)
+    keyword = KeywordCursor('k', BASE, **kwargs)
+    keyword.scheduled_page = 1  # 与爬虫一致：发出第 1 页时记录
+    return keyword
+
+
+def test_pages_finishing_out_of_order_advance_checkpoint_together():
+    keyword = cursor()
+    assert keyword.mark_done(1, 'since-1')
+    assert keyword.next_pages(1) == [2, 3, 4]
+    # 第 3 页先于第 2 页完成：检查点停在第 1 页
+    assert not keyword.mark_done(3, 'since-3')
+    assert keyword.checkpoint_page == 1 and keyword.checkpoint_since_id == 'since-1'
+    assert keyword.mark_done(2, 'since-2')
+    assert keyword.checkpoint_page == 3 and keyword.checkpoint_since_id == 'since-3'
+    # 已调度过的页不重复调度
+    assert keyword.next_pages(3) == [5, 6]
+
+
+def test_end_page_waits_for_earlier_pages_in_flight():
+    keyword = cursor()
+    keyword.mark_done(1)
+    keyword.next_pages(1)
+    keyword.mark_done(3, end=True)
+    assert keyword.exhausted and keyword.exhausted_page == 3
+    assert keyword.next_pages(3) == []
+    assert not keyword.finished
+    # 更靠后的结束页不改变结束位置
+    keyword.mark_done(4, end=True)
+    assert keyword.exhausted_page == 3 and not keyword.finished
+    keyword.mark_done(2)
+    assert keyword.checkpoint_page == 4 and keyword.finished
+
+
+def test_resume_from_checkpoint():
+    keyword = cursor()
+    keyword.resume(5, 'since-5')
+    assert keyword.scheduled_page == keyword.pages_done == keyword.checkpoint_page == 5
+    assert keyword.page_url(6, keyword.since_id) == f"{BASE}&since_id=since-5"
+    assert keyword.page_url(6) == f"{BASE}&page_type=searchall&page=6"
+    keyword.scheduled_page = 6
+    assert keyword.mark_done(6, 'since-6') and keyword.checkpoint_page == 6
+    assert keyword.next_pages(6) == [7, 8, 9]
+
+
+def test_max_pages_caps_scheduling():
+    keyword = cursor(max_pages=4)
+    keyword.mark_done(1)
+    assert keyword.next_pages(1) == [2, 3, 4]
+    keyword.mark_done(2)
+    assert keyword.next_pages(2) == []
+    keyword.mark_done(4)
+    keyword.mark_done(3)
+    assert keyword.finished and not keyword.exhausted
+
+
+def test_error_stops_paging_without_finishing():
+    keyword = cursor()
+    keyword.mark_done(1)
+    keyword.next_pages(1)
+    assert keyword.stop_on_error(3)
+    assert not keyword.stop_on_error(2)
+    assert keyword.error_page == 2 and keyword.stopped and not keyword.exhausted
+    keyword.mark_done(4)
+    assert keyword.next_pages(4) == []
+    # 出错的页没有处理完，检查点停在它之前，关键词不算抓完
+    assert keyword.checkpoint_page == 1 and not keyword.finished
+
+
+def test_observe_marks_page_of_old_posts_as_end():
+    keyword = cursor(stop_at=100)
+    assert keyword.observe(['101', '102']) == 2 and not keyword.exhausted
+    assert keyword.observe(['102', '99']) == 0 and keyword.exhausted
+    assert keyword.newest_id == 102
+
+
+def test_spider_counts_error_page_as_stopped_on_error(caplog):
+    from scrapy.utils.test import get_crawler
+
+    from weibo_collector.spiders.weibo_spider import WeiboSpider
+
+    crawler = get_crawler(WeiboSpider, {'WEIBO_MAX_PAGES': 10, 'WEIBO_PAGE_FANOUT': 3})
+    spider = WeiboSpider.from_crawler(crawler, keywords='k')
+    crawler.spider = spider
+    [first] = spider.start_requests()
+    meta = dict(first.meta, page=2)
+    assert list(spider._parse_cards({'ok': 0, 'msg': '请求过于频繁'}, meta)) == []
+    keyword = spider.cursors['k']
+    assert keyword.error_page == 2 and not keyword.exhausted
+    assert crawler.stats.get_value('weibo/keywords/stopped_on_error') == 1
+    # 之后完成的页照常产出帖子，但不再调度后续页，也不记为没有新帖子
+    page = {'ok': 1, 'data': {'cards': [{'card_type': 9, 'mblog': {'id': '5', 'text': '正文', 'created_at': '刚刚'}}],
+                              'cardlistInfo': {'page': 4}}}
+    outputs = list(spider._parse_cards(page, dict(first.meta, page=3)))
+    assert [output['post_id'] for output in outputs] == ['5']
+    assert '因出错停止翻页' in caplog.text and '没有新帖子' not in caplog.text
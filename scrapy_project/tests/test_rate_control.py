@@ -0,0 +1,175 @@
+import asyncio
+import json
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import Response, TextResponse
+from scrapy.utils.test import get_crawler
+
+from weibo_collector import scheduler as scheduler_module
+from weibo_collector.accounts import AccountPool
+from weibo_collector.middlewares import AccountMiddleware, RateControlMiddleware
+from weibo_collector.rate_control import HARD_BAN, RateController
+from weibo_collector.scheduler import SCHEDULE_DELAY_KEY, DelayedRequestScheduler
+
+API = 'https://m.weibo.cn/api/container/getIndex'
+PROXY = 'http://10.0.0.1:8080'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_accounts(directory, names):
+    for name in names:
+        state = {'cookies': [{'name': 'SUB', 'value': name, 'domain': '.weibo.cn', 'expires': -1}], 'origins': []}
+        (directory / f'{name}.json').write_text(json.dumps(state))
+    return AccountPool.from_directory(str(directory))
+
+
+def json_response(request, body):
+    return TextResponse(request.url, body=json.dumps(body).encode(), encoding='utf-8', request=request,
+                        headers={'Content-Type': 'application/json'})
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def rate_control(clock):
+    # 每个会话 1 次/秒，超过 0.5 秒的等待交还调度器
+    controller = RateController(start_rate=1.0, max_rate=1.0, ban_pause=60.0, clock=clock)
+    return RateControlMiddleware(controller, hosts=['weibo.cn'], max_wait=0.5)
+
+
+@pytest.fixture
+def accounts(tmp_path):
+    return AccountMiddleware(write_accounts(tmp_path, ['alice', 'bob']))
+
+
+def dispatch(request, accounts, rate_control, spider):
+    """按 settings 中的顺序经过代理 (固定)、账号与限速中间件"""
+    request.meta['proxy'] = PROXY
+    accounts.process_request(request, spider)
+    return asyncio.run(rate_control.process_request(request, spider))
+
+
+def test_accounts_on_same_proxy_get_separate_buckets(accounts, rate_control):
+    spider = Spider('weibo')
+    first, second = Request(API), Request(API)
+    assert dispatch(first, accounts, rate_control, spider) is None
+    assert dispatch(second, accounts, rate_control, spider) is None
+    # 同一代理、同一时刻，两个账号各自取到令牌
+    assert {first.meta['weibo_session'], second.meta['weibo_session']} == {'alice', 'bob'}
+    assert first.meta['weibo_rate_session'] != second.meta['weibo_rate_session']
+    assert set(rate_control.controller.buckets) == {'alice@10.0.0.1:8080', 'bob@10.0.0.1:8080'}
+
+
+def test_without_accounts_sessions_are_per_proxy(rate_control):
+    request = Request(API, meta={'proxy': PROXY})
+    asyncio.run(rate_control.process_request(request, Spider('weibo')))
+    assert request.meta['weibo_rate_session'] == '10.0.0.1:8080'
+
+
+def test_banned_session_is_deferred_while_other_keeps_going(accounts, rate_control, clock):
+    spider = Spider('weibo')
+    banned = Request(API)
+    dispatch(banned, accounts, rate_control, spider)
+    other = Request(API)
+    dispatch(other, accounts, rate_control, spider)
+    accounts.process_response(other, json_response(other, {'ok': 1}), spider)
+    rate_control.process_response(other, json_response(other, {'ok': 1}), spider)
+    banned_session = banned.meta['weibo_session']
+    assert rate_control.process_response(banned, Response(API, status=418, request=banned), spider).meta[
+        'weibo_rate_outcome'] == HARD_BAN
+
+    sent = {banned_session: 0, other.meta['weibo_session']: 0}
+    for _ in range(20):
+        clock.now += 1.0
+        for session in sent:
+            request = Request(API, meta={'weibo_session': session, 'proxy': PROXY})
+            result = asyncio.run(rate_control.process_request(request, spider))
+            if result is None:
+                sent[session] += 1
+            else:
+                assert session == banned_session
+                # 交还调度器的请求不带代理，下次重新选择
+                assert result.meta[SCHEDULE_DELAY_KEY] == 0.5 and 'proxy' not in result.meta
+                assert result.dont_filter
+    # 被封禁的会话在暂停期内一个请求也不发，另一会话每秒仍能发出一个
+    assert sent == {banned_session: 0, other.meta['weibo_session']: 20}
+
+
+def test_account_level_ok_0_is_retried_on_another_account(accounts, rate_control):
+    spider = Spider('weibo')
+    request = Request(API)
+    dispatch(request, accounts, rate_control, spider)
+    response = json_response(request, {'ok': 0, 'msg': '请求过于频繁'})
+    # process_response 按优先级倒序：先限速中间件，再账号中间件
+    assert rate_control.process_response(request, response, spider) is response
+    retry = accounts.process_response(request, response, spider)
+    assert isinstance(retry, Request) and retry.meta['weibo_account_retries'] == 1
+    assert 'weibo_rate_outcome' not in retry.meta
+    bucket = rate_control.controller.buckets[f"{request.meta['weibo_session']}@10.0.0.1:8080"]
+    assert bucket.throttles == 1
+
+    # 重新调度时先释放上一个账号，再按在途数选账号
+    dispatch(retry, accounts, rate_control, spider)
+    assert retry.meta['weibo_session'] != request.meta['weibo_session']
+    assert sum(account.in_flight for account in accounts.pool.accounts) == 1
+
+
+class FakeEngine:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def crawl(self, request):
+        self.scheduler.enqueue_request(request)
+
+
+def test_delayed_requests_wait_in_scheduler(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, 'monotonic', clock)
+    crawler = get_crawler(Spider, {'SCHEDULER': 'weibo_collector.scheduler.DelayedRequestScheduler'})
+    spider = Spider('weibo')
+    scheduler = DelayedRequestScheduler.from_crawler(crawler)
+    crawler.engine = FakeEngine(scheduler)
+    scheduler.open(spider)
+    try:
+        later = Request(API + '?page=2', meta={SCHEDULE_DELAY_KEY: 5.0}, dont_filter=True)
+        now = Request(API + '?page=1')
+        assert scheduler.enqueue_request(later) and scheduler.enqueue_request(now)
+        # 延后的请求计入 len()，爬虫不会被判定为空闲
+        assert len(scheduler) == 2 and scheduler.has_pending_requests()
+        assert scheduler.next_request() is now
+        assert scheduler.next_request() is None and len(scheduler) == 1
+
+        clock.now += 5.0
+        scheduler._release_due()
+        assert scheduler.next_request() is later
+        assert SCHEDULE_DELAY_KEY not in later.meta and len(scheduler) == 0
+        assert crawler.stats.get_value('scheduler/delayed') == 1
+    finally:
+        scheduler.close('finished')
+
+
+def test_expired_account_session_is_paused(accounts, rate_control, clock):
+    spider = Spider('weibo')
+    request = Request(API)
+    dispatch(request, accounts, rate_control, spider)
+    session = request.meta['weibo_session']
+    redirect = Response(API, status=302, headers={'Location': 'https://passport.weibo.com/visitor/visitor'},
+                        request=request)
+    assert rate_control.process_response(request, redirect, spider) is redirect
+    # 已分到该账号、还在等令牌的请求交还调度器，换账号重发
+    clock.now += 1.0
+    waiting = Request(API, meta={'weibo_session': session, 'proxy': PROXY})
+    assert asyncio.run(rate_control.process_request(waiting, spider)).meta[SCHEDULE_DELAY_KEY] == 0.5
+    other = Request(API, meta={'weibo_session': 'bob' if session == 'alice' else 'alice', 'proxy': PROXY})
+    assert asyncio.run(rate_control.process_request(other, spider)) is None
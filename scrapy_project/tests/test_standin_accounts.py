@@ -0,0 +1,42 @@
+from standin import API_PATH, PerCookieHandler, StandinServer, run_crawl, write_accounts
+
+DURATION = 12
+
+
+def crawl(accounts_dir):
+    """替身服务按 Cookie 每秒放行 1 个请求；名为 expiring 的账号第 15 次之后被重定向到登录页"""
+    with StandinServer(PerCookieHandler, limit=1.0, expire_after=15) as server:
+        result = run_crawl({'spider': 'flood', 'url': server.url + API_PATH, 'duration': DURATION, 'settings': {
+            'DOWNLOADER_MIDDLEWARES': {'weibo_collector.middlewares.AccountMiddleware': 710,
+                                       'weibo_collector.middlewares.RateControlMiddleware': 720},
+            'SCHEDULER': 'weibo_collector.scheduler.DelayedRequestScheduler',
+            'CONCURRENT_REQUESTS': 16,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': 16,
+            'RATE_CONTROL_HOSTS': ['127.0.0.1'],
+            'RATE_CONTROL_START_RATE': 0.5,
+            'RATE_CONTROL_INCREASE': 0.1,
+            'RATE_CONTROL_MAX_RATE': 50,
+            'WEIBO_ACCOUNTS_DIR': accounts_dir,
+            'WEIBO_ACCOUNT_QUARANTINE': 20,
+        }})
+        return result, dict(server.counts)
+
+
+def test_throughput_scales_with_accounts(tmp_path):
+    # 提交说明中的结果：1/2/4 个账号分别为 0.67/1.29/2.24 条有效响应/秒
+    rates = []
+    for count in (1, 2, 4):
+        directory = write_accounts(str(tmp_path / str(count)), [f"a{index}" for index in range(count)])
+        result, _ = crawl(directory)
+        rates.append(result['good_per_sec'])
+    assert rates[0] < 1.0
+    assert rates[1] > 1.4 * rates[0]
+    assert rates[2] > 1.4 * rates[1]
+
+
+def test_expiring_account_costs_one_login_redirect(tmp_path):
+    result, counts = crawl(write_accounts(str(tmp_path), ['a0', 'expiring']))
+    assert counts['expiring:login'] == 1
+    assert result['stats']['weibo/accounts/expired'] == 1
+    # 失效之后不再分给该账号，请求由另一个账号完成
+    assert counts['expiring:ok'] <= 15 and counts['a0:ok'] > 0
@@ -0,0 +1,23 @@
+from standin import API_PATH, ApiHandler, StandinServer, run_crawl
+
+# 不连 Mongo；127.0.0.1 不在 RATE_CONTROL_HOSTS 中，不受限速影响
+SETTINGS = {
+    'ITEM_PIPELINES': {'weibo_collector.pipelines.DuplicatesPipeline': 0},
+    'DEDUP_SEED_FROM_MONGO': False,
+    'PROXY_ENABLED': False,
+    'WEIBO_DOWNLOAD_MODE': 'http',
+}
+
+
+def test_json_pages_use_http_and_others_fall_back_to_browser():
+    with StandinServer(ApiHandler, pages=2) as server:
+        result = run_crawl({'spider': 'weibo', 'spider_kwargs': {'keywords': 'alpha,expired,blocked'},
+                            'settings': dict(SETTINGS, WEIBO_API_BASE_URL=server.url + API_PATH)})
+    stats = result['stats']
+    # alpha 的两页 (各 3 条) 与翻到底的空页都走普通 HTTP 下载器
+    assert stats['weibo/http_fast_path/ok'] >= 3
+    assert stats['item_scraped_count'] == 6
+    # 登录重定向与非 JSON 响应各回退一次浏览器请求
+    assert stats['weibo/http_fallback/redirect'] == 1
+    assert stats['weibo/http_fallback/non_json'] == 1
+    assert server.counts['login_redirect'] >= 1 and server.counts['html'] >= 1
@@ -0,0 +1,50 @@
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from standin import ImageHandler, StandinServer, run_crawl
+
+
+def jpeg(color):
+    buf = BytesIO()
+    Image.new('RGB', (40, 30), color).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+# b 与 a 内容相同、URL 不同
+IMAGES = {'/large/a.jpg': jpeg('red'), '/large/b.jpg': jpeg('red'), '/large/c.jpg': jpeg('blue'),
+          '/large/d.jpg': jpeg('green')}
+
+
+def crawl(server, store, items, **settings):
+    """替身图床的 /<尺寸>/<图片> 按新浪图床的方式规范化；CONCURRENT_ITEMS=1 使 Item 逐条完成下载"""
+    items = [{'image_urls': [server.url + path for path in paths]} for paths in items]
+    return run_crawl({'spider': 'items', 'items': items, 'settings': dict({
+        'ITEM_PIPELINES': {'weibo_collector.pipelines.WeiboImagesPipeline': 1},
+        'IMAGES_STORE': store,
+        'IMAGES_SIZE_VARIANT_HOSTS': ['127.0.0.1'],
+        'CONCURRENT_ITEMS': 1,
+    }, **settings)})['stats']
+
+
+def test_content_dedup_index_and_byte_budget(tmp_path):
+    store = str(tmp_path / 'store')
+    with StandinServer(ImageHandler, images=IMAGES) as server:
+        stats = crawl(server, store, [['/orj360/a.jpg', '/thumbnail/a.jpg'], ['/large/b.jpg'], ['/large/c.jpg']])
+        # 同一张图的尺寸变体只下载规范尺寸一次；b 与 a 内容相同，只存一份
+        assert dict(server.counts) == {'/large/a.jpg': 1, '/large/b.jpg': 1, '/large/c.jpg': 1}
+        assert stats['images/content_dedup'] == 1
+        assert len(os.listdir(os.path.join(store, 'full'))) == 2
+
+        # 第二次抓取：索引命中，不再请求图床
+        server.counts.clear()
+        stats = crawl(server, store, [['/thumbnail/a.jpg'], ['/large/b.jpg', '/orj360/c.jpg']])
+        assert dict(server.counts) == {}
+        assert stats['images/index_hits'] == 3
+
+        # 字节预算用尽后，未入库的图片跳过，已入库的照常引用
+        stats = crawl(server, store, [['/large/d.jpg'], ['/large/e.jpg', '/large/a.jpg']], IMAGES_MAX_BYTES=1)
+        assert dict(server.counts) == {'/large/d.jpg': 1}
+        assert stats['images/budget_skipped'] == 1
+        assert stats['images/index_hits'] == 1
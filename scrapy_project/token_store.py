@@ -0,0 +1,150 @@
+"""
+整数编码的分词存储：所有分析阶段共用的一份紧凑语料。
+
+一次遍历 MongoDB 完成编码：一个词表 (id -> 词)，所有文档的词 id 依次存入连续的 int32 数组，
+offsets[i]:offsets[i+1] 是第 i 篇文档的区间，doc_ids[i] 是它的 _id。在此之上提供适配器：
+  - count_matrix / iter_count_chunks: 按列映射生成 scikit-learn 可用的 CSR 词频矩阵；
+  - gensim_dictionary / bow_corpus: 生成 gensim 字典与 BoW 语料，不再重新分词；
+  - top_terms: np.bincount 统计高频词。
+save/load 以 .npy 持久化，读取时内存映射。
+"""
+import json
+import os
+from array import array
+
+import numpy as np
+import scipy.sparse as sp
+
+from artifact_cache import CorpusFingerprint
+
+VOCAB_FILE = "vocab.json"
+
+
+class TokenStore:
+    def __init__(self, vocab, token_ids, offsets, doc_ids=None, fingerprint=None):
+        self.vocab = vocab
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, stream):
+        """
+        遍历一次 PostStream 完成编码，同时累加语料指纹。
+        每篇文档中的新词按字符串排序后再分配 id，与 gensim Dictionary(documents) 的 id 顺序一致。
+        """
+        token2id = {}
+        vocab = []
+        token_ids = array('i')
+        offsets = array('q', [0])
+        doc_ids = []
+        fingerprint = CorpusFingerprint()
+        for doc in stream:
+            tokens = doc.get('segmented_text', [])
+            doc_ids.append(str(doc["_id"]))
+            fingerprint.update(doc["_id"], tokens)
+            missing = {token for token in tokens if token not in token2id}
+            for token in sorted(missing):
+                token2id[token] = len(vocab)
+                vocab.append(token)
+            token_ids.extend(token2id[token] for token in tokens)
+            offsets.append(len(token_ids))
+        return cls(vocab,
+                   np.frombuffer(token_ids, dtype=np.int32) if token_ids else np.empty(0, dtype=np.int32),
+                   np.frombuffer(offsets, dtype=np.int64),
+                   np.array(doc_ids, dtype="S24"),
+                   fingerprint.hexdigest())
+
+    @property
+    def num_docs(self):
+        return len(self.offsets) - 1
+
+    def __len__(self):
+        return self.num_docs
+
+    def save(self, directory):
+        np.save(os.path.join(directory, "token_ids.npy"), self.token_ids)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "doc_ids.npy"), self.doc_ids)
+        with open(os.path.join(directory, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"vocab": self.vocab, "fingerprint": self.fingerprint}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, VOCAB_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(meta["vocab"],
+                   np.load(os.path.join(directory, "token_ids.npy"), mmap_mode="r"),
+                   np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r"),
+                   np.load(os.path.join(directory, "doc_ids.npy"), mmap_mode="r"),
+                   meta["fingerprint"])
+
+    def documents(self, start=0, stop=None):
+        """逐篇产出分词列表 (字符串)，供需要原始词的接口使用"""
+        stop = self.num_docs if stop is None else stop
+        vocab = self.vocab
+        for i in range(start, stop):
+            yield [vocab[token_id] for token_id in self.token_ids[self.offsets[i]:self.offsets[i + 1]]]
+
+    def count_matrix(self, columns=None, num_columns=None, start=0, stop=None):
+        """
+        文档 [start, stop) 的词频 CSR 矩阵。columns 把词 id 映射到列号 (-1 表示丢弃)，
+        不同的词可以映射到同一列 (大小写合并、特征哈希)；不传时每个词一列。
+        """
+        stop = self.num_docs if stop is None else stop
+        lo, hi = int(self.offsets[start]), int(self.offsets[stop])
+        # 复制一份：sum_duplicates() 会原地排序 indices，不能直接用 token_ids 的视图
+        indices = np.array(self.token_ids[lo:hi], dtype=np.int32)
+        indptr = np.asarray(self.offsets[start:stop + 1]) - lo
+        if columns is None:
+            num_columns = len(self.vocab)
+        else:
+            indices = columns[indices]
+            keep = indices >= 0
+            if not keep.all():
+                # 丢弃的词不计入各行长度
+                indptr = np.concatenate(([0], np.cumsum(keep)))[indptr]
+                indices = indices[keep]
+        matrix = sp.csr_matrix((np.ones(len(indices), dtype=np.float64), indices, indptr),
+                               shape=(stop - start, num_columns))
+        matrix.sum_duplicates()
+        return matrix
+
+    def iter_count_chunks(self, chunk_size, columns=None, num_columns=None):
+        for start in range(0, self.num_docs, chunk_size):
+            yield self.count_matrix(columns, num_columns, start, min(start + chunk_size, self.num_docs))
+
+    def term_frequencies(self):
+        return np.bincount(self.token_ids, minlength=len(self.vocab))
+
+    def top_terms(self, n=20):
+        """出现次数最多的 n 个词；次数相同时按词 id (首次出现顺序) 排序"""
+        counts = self.term_frequencies()
+        order = np.argsort(-counts, kind="stable")[:n]
+        return [(self.vocab[i], int(counts[i])) for i in order if counts[i] > 0]
+
+    def gensim_dictionary(self, no_below=2, no_above=0.95):
+        """
+        直接用已统计好的频次构造 gensim 字典并 filter_extremes，
+        返回 (字典, 词 id -> 字典 id 的映射数组，被过滤的为 -1)
+        """
+        from gensim import corpora
+        counts = self.count_matrix()
+        dictionary = corpora.Dictionary()
+        dictionary.token2id = {token: i for i, token in enumerate(self.vocab)}
+        dictionary.dfs = dict(enumerate(np.bincount(counts.indices, minlength=len(self.vocab)).tolist()))
+        dictionary.cfs = dict(enumerate(self.term_frequencies().tolist()))
+        dictionary.num_docs = self.num_docs
+        dictionary.num_pos = len(self.token_ids)
+        dictionary.num_nnz = counts.nnz
+        dictionary.filter_extremes(no_below=no_below, no_above=no_above)
+        columns = np.array([dictionary.token2id.get(token, -1) for token in self.vocab], dtype=np.int64)
+        return dictionary, columns
+
+    def bow_corpus(self, columns, num_columns):
+        """按字典映射生成 gensim BoW 语料 (跳过映射后为空的文档)"""
+        from gensim import matutils
+        matrix = self.count_matrix(columns, num_columns)
+        matrix = matrix[matrix.getnnz(axis=1) > 0]
+        return matutils.Sparse2Corpus(matrix, documents_columns=False)
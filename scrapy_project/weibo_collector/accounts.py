@@ -0,0 +1,155 @@
+"""
+多账号会话池。
+
+WEIBO_ACCOUNTS_DIR 下每个 <名称>.json 是一个账号的 Playwright storage_state (由 generate_weibo_state.py --name 生成)。
+请求优先分给在途请求最少的健康账号；账号被重定向到登录页即视为过期，隔离到其状态文件被重新生成为止；
+连续多次 ok:0 视为该账号被限流，隔离 quarantine 秒后自动恢复。
+"""
+import os
+import time
+
+from .auth import cookies_for_host, load_storage_state
+
+HEALTHY, THROTTLED, EXPIRED = 'healthy', 'throttled', 'expired'
+DEFAULT_HOST = 'm.weibo.cn'
+
+
+def _has_live_cookies(storage_state, now=None):
+    now = time.time() if now is None else now
+    return any(not (0 < cookie.get('expires', -1) < now) for cookie in (storage_state or {}).get('cookies', []))
+
+
+class Account:
+    __slots__ = ('name', 'path', 'state', 'mtime', 'status', 'quarantined_until', 'next_check', 'in_flight',
+                 'requests', 'successes', 'throttles', 'consecutive_throttles', 'expirations', '_cookies')
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.state = None
+        self.mtime = None
+        self.status = HEALTHY
+        self.quarantined_until = 0.0
+        self.next_check = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.throttles = 0
+        self.consecutive_throttles = 0
+        self.expirations = 0
+        self._cookies = {}
+
+    def load(self):
+        """读取状态文件；cookie 全部过期或文件无效时返回 False"""
+        try:
+            self.mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.mtime = None
+        self.state = load_storage_state(self.path)
+        self._cookies = {}
+        return _has_live_cookies(self.state)
+
+    def cookies(self, host):
+        cookies = self._cookies.get(host)
+        if cookies is None:
+            cookies = self._cookies[host] = cookies_for_host(self.state, host)
+        return cookies
+
+
+class AccountPool:
+    def __init__(self, accounts, quarantine=600.0, max_throttles=3, reload_interval=30.0, clock=time.monotonic):
+        self.accounts = list(accounts)
+        self.quarantine = quarantine
+        self.max_throttles = max(1, max_throttles)
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self._next = 0
+        for account in self.accounts:
+            if not account.load():
+                account.status = EXPIRED
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+        return cls([Account(name[:-len('.json')], os.path.join(directory, name)) for name in names], **kwargs)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def _refresh(self, account, now):
+        """隔离到期的账号恢复；过期账号在状态文件被重新生成后恢复"""
+        if account.status == THROTTLED and now >= account.quarantined_until:
+            account.status = HEALTHY
+            account.consecutive_throttles = 0
+        elif account.status == EXPIRED and now >= account.next_check:
+            account.next_check = now + self.reload_interval
+            try:
+                changed = os.path.getmtime(account.path) != account.mtime
+            except OSError:
+                changed = False
+            if changed and account.load():
+                account.status = HEALTHY
+        return account.status == HEALTHY
+
+    def is_healthy(self, account):
+        return self._refresh(account, self.clock())
+
+    def choose(self, host=DEFAULT_HOST):
+        """在途请求最少的健康账号 (并列时轮转)；没有可用账号时返回 None"""
+        now = self.clock()
+        count = len(self.accounts)
+        best = None
+        for offset in range(count):
+            account = self.accounts[(self._next + offset) % count]
+            if not self._refresh(account, now) or not account.cookies(host):
+                continue
+            if best is None or account.in_flight < best.in_flight:
+                best = account
+        if best is not None:
+            self._next = (self.accounts.index(best) + 1) % count
+        return best
+
+    def acquire(self, account):
+        account.in_flight += 1
+        account.requests += 1
+
+    def release(self, account):
+        account.in_flight = max(0, account.in_flight - 1)
+
+    def record_success(self, account):
+        account.successes += 1
+        account.consecutive_throttles = 0
+
+    def record_throttle(self, account):
+        """记录一次 ok:0；连续达到 max_throttles 次时隔离，返回是否本次被隔离"""
+        account.throttles += 1
+        account.consecutive_throttles += 1
+        if account.status == HEALTHY and account.consecutive_throttles >= self.max_throttles:
+            account.status = THROTTLED
+            account.quarantined_until = self.clock() + self.quarantine
+            return True
+        return False
+
+    def record_expired(self, account):
+        """登录重定向：隔离到状态文件被重新生成为止，返回是否本次被隔离"""
+        if account.status == EXPIRED:
+            return False
+        account.status = EXPIRED
+        account.expirations += 1
+        account.next_check = self.clock() + self.reload_interval
+        return True
+
+    def counts(self):
+        now = self.clock()
+        counts = {HEALTHY: 0, THROTTLED: 0, EXPIRED: 0}
+        for account in self.accounts:
+            self._refresh(account, now)
+            counts[account.status] += 1
+        return counts
+
+    def snapshot(self):
+        return {
+            account.name: {'status': account.status, 'requests': account.requests, 'successes': account.successes,
+                           'throttles': account.throttles, 'expirations': account.expirations}
+            for account in self.accounts
+        }
@@ -0,0 +1,129 @@
+"""
+原始响应存档：把 getIndex 与长微博 extend 接口返回的 JSON 追加写入压缩的 JSONL 分段 (gzip，安装 zstandard 时可选 zstd)。
+
+每行一条记录: {"kind", "fetched_at", "keyword", "page", "url", "post_id", "body"}，分段写满 segment_records 条后换新文件，
+已写完的分段不再改动。存档可以离线回放 (replay_archive.py) 重新走解析与 Item Pipeline，也可作为基准测试的固定输入。
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from scrapy.logformatter import LogFormatter
+
+from .dateparse import CST
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GET_INDEX, EXTEND = 'getIndex', 'extend'
+EXTENSIONS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+# 读到崩溃时未写完的压缩流末尾会抛出的异常
+TRUNCATED_ERRORS = (EOFError, OSError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def _open_segment(path, mode):
+    """按扩展名打开分段，mode 为 'wt' 或 'rt'"""
+    if path.endswith(EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise RuntimeError(f"读写 {path} 需要 zstandard: pip install zstandard")
+        return zstandard.open(path, mode, encoding='utf-8')
+    return gzip.open(path, mode, encoding='utf-8')
+
+
+class ResponseArchive:
+    def __init__(self, directory, codec='gzip', segment_records=5000, flush_every=100, clock=time.time):
+        if codec == 'zstd' and zstandard is None:
+            logger.warning("未安装 zstandard，响应存档改用 gzip。")
+            codec = 'gzip'
+        if codec not in EXTENSIONS:
+            raise ValueError(f"不支持的存档压缩格式: {codec}")
+        self.directory = directory
+        self.codec = codec
+        self.segment_records = max(1, segment_records)
+        self.flush_every = max(1, flush_every)
+        self.clock = clock
+        self.records = 0
+        self.segments = 0
+        self._file = None
+        self._segment_count = 0
+        # 同一进程里的多个爬虫 (以及同一秒启动的多个进程) 各写各的分段
+        self._token = f"{os.getpid()}-{os.urandom(3).hex()}"
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """WEIBO_ARCHIVE_DIR 未设置时返回 None"""
+        directory = crawler.settings.get('WEIBO_ARCHIVE_DIR')
+        if not directory:
+            return None
+        return cls(directory,
+                   codec=crawler.settings.get('WEIBO_ARCHIVE_CODEC', 'gzip'),
+                   segment_records=crawler.settings.getint('WEIBO_ARCHIVE_SEGMENT_RECORDS', 5000))
+
+    def _roll(self):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.clock(), CST).strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"weibo-{stamp}-{self._token}-{self.segments:04d}{EXTENSIONS[self.codec]}")
+        self._file = _open_segment(path, 'wt')
+        self._segment_count = 0
+        self.segments += 1
+
+    def write(self, kind, body, keyword=None, page=None, url=None, post_id=None, fetched_at=None):
+        if self._file is None or self._segment_count >= self.segment_records:
+            self._roll()
+        fetched_at = fetched_at or datetime.fromtimestamp(self.clock(), CST)
+        record = {'kind': kind, 'fetched_at': fetched_at.isoformat(), 'keyword': keyword, 'page': page, 'url': url,
+                  'post_id': post_id, 'body': body}
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._segment_count += 1
+        self.records += 1
+        if self._segment_count % self.flush_every == 0:
+            # 定期把压缩缓冲写到磁盘，进程崩溃时最多丢失 flush_every 条
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_segments(paths):
+    """把目录、通配符或文件路径展开为按名称排序的分段列表"""
+    segments = []
+    for path in paths:
+        if os.path.isdir(path):
+            segments.extend(os.path.join(path, name) for name in os.listdir(path)
+                            if name.endswith(tuple(EXTENSIONS.values())))
+        else:
+            segments.extend(glob.glob(path))
+    return sorted(set(segments))
+
+
+def iter_records(path):
+    """逐条读取分段；崩溃时未写完的末尾记录被跳过"""
+    with _open_segment(path, 'rt') as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"存档 {path} 中有无法解析的记录，已跳过。")
+        except TRUNCATED_ERRORS as e:
+            logger.warning(f"存档 {path} 末尾不完整 ({e})，之前的记录已读取。")
+
+
+class ReplayLogFormatter(LogFormatter):
+    """回放时不再逐条记录 Scraped/Dropped 日志：这些记录会 pformat 整个 Item，占回放耗时的大头"""
+    def scraped(self, item, response, spider):
+        return None
+
+    def dropped(self, item, exception, response, spider):
+        return None
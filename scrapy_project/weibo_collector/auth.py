@@ -0,0 +1,54 @@
+import json
+import os
+import time
+
+# 默认会话状态文件，由 generate_weibo_state.py 生成
+DEFAULT_AUTH_STATE_PATH = os.path.join(os.path.dirname(__file__), 'spiders', 'weibo_auth_state.json')
+LOGIN_HOST_MARKERS = ("login.sina.com.cn", "passport.weibo.com")
+
+
+def is_login_url(url):
+    """判断 URL 是否为微博登录/通行证页面"""
+    return bool(url) and any(marker in url for marker in LOGIN_HOST_MARKERS)
+
+
+def resolve_auth_state_path(settings):
+    """按 WEIBO_AUTH_STATE_PATH 设置定位会话状态文件，不存在时返回 None"""
+    path = settings.get('WEIBO_AUTH_STATE_PATH') or DEFAULT_AUTH_STATE_PATH
+    return path if os.path.exists(path) else None
+
+
+def load_storage_state(path):
+    """读取 Playwright storage_state 文件，失败时返回 None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _domain_matches(cookie_domain, host):
+    cookie_domain = (cookie_domain or '').lstrip('.')
+    return host == cookie_domain or host.endswith('.' + cookie_domain)
+
+
+def cookies_for_host(storage_state, host, now=None):
+    """从 storage_state 中挑出适用于 host 且未过期的 cookie，返回 {name: value}"""
+    if not storage_state:
+        return {}
+    now = time.time() if now is None else now
+    cookies = {}
+    for cookie in storage_state.get('cookies', []):
+        expires = cookie.get('expires', -1)
+        if expires and 0 < expires < now:
+            continue
+        if _domain_matches(cookie.get('domain'), host):
+            cookies[cookie['name']] = cookie['value']
+    return cookies
+
+
+def build_cookie_header(cookies):
+    """把 {name: value} 拼成 Cookie 请求头"""
+    return "; ".join(f"{name}={value}" for name, value in cookies.items())
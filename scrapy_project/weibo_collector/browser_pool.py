@@ -0,0 +1,193 @@
+import asyncio
+from urllib.parse import urlparse
+
+from .metrics import get_metrics
+
+CONTEXT_NAME_PREFIX = "weibo-auth"
+API_PATH = "/api/container/getIndex"
+
+
+class _ContextSlot:
+    """池中的一个上下文槽位；generation 变化即表示该槽位的上下文已被回收重建"""
+
+    def __init__(self, index):
+        self.index = index
+        self.generation = 0
+        self.uses = 0
+        self.in_flight = {}
+        self.idle_pages = []
+        self.contexts = {}  # generation -> 从该代页面上得知的 BrowserContext，用于回收后关闭
+
+    @property
+    def name(self):
+        return f"{CONTEXT_NAME_PREFIX}-{self.index}-{self.generation}"
+
+    def load(self):
+        return self.in_flight.get(self.generation, 0)
+
+
+class BrowserContextPool:
+    """
+    预认证、长生命周期的 Playwright 上下文池。
+
+    借助 scrapy-playwright 的命名上下文 (playwright_context) 与页面复用 (playwright_page)：
+    请求真正下载前由 ContextPoolMiddleware 调用 acquire() 选定负载最低的上下文并尽量分配一个热页面，
+    在调度器里排队的请求不占槽位；回调/errback 中 release() 归还页面，
+    上下文使用次数达到上限或遇到登录重定向时整体回收。getIndex 的 JSON 由页面的 response
+    事件直接捕获，不再回读 DOM。
+    """
+
+    def __init__(self, size=4, max_uses=200, warm_pages=2, context_kwargs=None, stats=None, logger=None,
+                 metrics=None):
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.warm_pages = warm_pages
+        self.context_kwargs = context_kwargs or {}
+        self.stats = stats
+        self.logger = logger
+        self.slots = [_ContextSlot(i) for i in range(self.size)]
+        self._captured = {}
+        self._capture_events = {}
+        if metrics:
+            metrics.register_gauge('browser_pages_in_use', lambda: sum(slot.load() for slot in self.slots))
+            metrics.register_gauge('browser_idle_pages', lambda: sum(len(slot.idle_pages) for slot in self.slots))
+
+    @classmethod
+    def from_crawler(cls, crawler, storage_state_path=None, logger=None):
+        settings = crawler.settings
+        return cls(
+            size=settings.getint('WEIBO_CONTEXT_POOL_SIZE', 4),
+            max_uses=settings.getint('WEIBO_CONTEXT_MAX_USES', 200),
+            warm_pages=settings.getint('WEIBO_CONTEXT_WARM_PAGES', 2),
+            context_kwargs=cls.build_context_kwargs(settings, storage_state_path),
+            stats=crawler.stats,
+            logger=logger,
+            metrics=get_metrics(crawler),
+        )
+
+    @staticmethod
+    def build_context_kwargs(settings, storage_state_path=None):
+        context_kwargs = dict(settings.getdict('PLAYWRIGHT_DEFAULT_CONTEXT_ARGS'))
+        if storage_state_path:
+            context_kwargs['storage_state'] = storage_state_path
+        return context_kwargs
+
+    @classmethod
+    def contexts_setting(cls, settings, storage_state_path=None):
+        """生成 PLAYWRIGHT_CONTEXTS，使池中第一代上下文在爬虫启动时即被创建"""
+        context_kwargs = cls.build_context_kwargs(settings, storage_state_path)
+        size = max(1, settings.getint('WEIBO_CONTEXT_POOL_SIZE', 4))
+        return {f"{CONTEXT_NAME_PREFIX}-{i}-0": dict(context_kwargs) for i in range(size)}
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(f"weibo/context_pool/{key}", count)
+
+    def acquire(self, meta):
+        """为请求选定上下文槽位，写入 scrapy-playwright 需要的 meta 字段"""
+        meta.pop('playwright_page', None)
+        meta.pop('playwright_page_event_handlers', None)
+        slot = min(self.slots, key=lambda s: s.load())
+        slot.in_flight[slot.generation] = slot.load() + 1
+        meta['weibo_pool_slot'] = (slot.index, slot.generation)
+        meta['playwright_context'] = slot.name
+        meta['playwright_context_kwargs'] = dict(self.context_kwargs)
+        meta['playwright_include_page'] = True
+        while slot.idle_pages:
+            page = slot.idle_pages.pop()
+            if not page.is_closed():
+                slot.contexts.setdefault(slot.generation, page.context)
+                self._captured.pop(page, None)
+                self._capture_events.pop(page, None)
+                meta['playwright_page'] = page
+                self._inc_stat('warm_page_hits')
+                return meta
+        # 新页面会由 scrapy-playwright 创建，届时挂上 JSON 捕获监听器；复用页面已挂过，不重复挂载
+        meta['playwright_page_event_handlers'] = {'response': self._on_response}
+        self._inc_stat('new_pages')
+        return meta
+
+    async def _on_response(self, response):
+        if not urlparse(response.url).path.endswith(API_PATH):
+            return
+        page = response.frame.page
+        try:
+            data = await response.json()
+        except Exception:
+            data = None
+        self._captured[page] = data
+        self._capture_events.setdefault(page, asyncio.Event()).set()
+
+    async def captured_json(self, page, timeout=5.0):
+        """等待并取出该页面最近一次捕获到的 getIndex JSON，超时返回 None"""
+        if page not in self._captured:
+            event = self._capture_events.setdefault(page, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self._capture_events.pop(page, None)
+        return self._captured.pop(page, None)
+
+    async def release(self, page, meta, login_redirect=False, broken=False):
+        """归还页面；达到使用上限或遇到登录重定向时回收整个上下文。同一请求重复调用时只归还一次"""
+        slot_key = meta.pop('weibo_pool_slot', None)
+        if slot_key is None:
+            if page and not page.is_closed() and not any(page in slot.idle_pages for slot in self.slots):
+                await page.close()
+            return
+        index, generation = slot_key
+        slot = self.slots[index]
+        slot.in_flight[generation] = max(0, slot.in_flight.get(generation, 0) - 1)
+        if page is not None:
+            slot.contexts.setdefault(generation, page.context)
+            self._captured.pop(page, None)
+            self._capture_events.pop(page, None)
+
+        if generation != slot.generation:
+            # 旧代上下文：最后一个在途页面归还时关闭整个上下文
+            await self._close_stale(page, slot, generation)
+            return
+
+        slot.uses += 1
+        if login_redirect or slot.uses >= self.max_uses:
+            reason = "登录重定向" if login_redirect else f"使用次数达到 {self.max_uses}"
+            if self.logger:
+                self.logger.info(f"回收浏览器上下文 {slot.name} ({reason})。")
+            self._inc_stat('recycled/login_redirect' if login_redirect else 'recycled/max_uses')
+            idle_pages, slot.idle_pages = slot.idle_pages, []
+            for idle_page in idle_pages:
+                if not idle_page.is_closed():
+                    await idle_page.close()
+            slot.generation += 1
+            slot.uses = 0
+            await self._close_stale(page, slot, generation)
+            return
+
+        if page is None or page.is_closed():
+            return
+        if broken or len(slot.idle_pages) >= self.warm_pages:
+            await page.close()
+            return
+        slot.idle_pages.append(page)
+
+    async def _close_stale(self, page, slot, generation):
+        """旧代上下文：仍有在途页面时只关闭本页面，最后一个归还时 (无论页面是否还在) 关闭整个上下文"""
+        if slot.in_flight.get(generation, 0) > 0:
+            if page is not None and not page.is_closed():
+                await page.close()
+            return
+        slot.in_flight.pop(generation, None)
+        context = slot.contexts.pop(generation, None)
+        if context is not None:
+            await context.close()
+
+    async def close(self):
+        """爬虫结束时关闭热页面与尚未关闭的旧代上下文 (当前代由 scrapy-playwright 关闭)"""
+        for slot in self.slots:
+            idle_pages, slot.idle_pages = slot.idle_pages, []
+            for page in idle_pages:
+                if not page.is_closed():
+                    await page.close()
+            for generation in [generation for generation in slot.contexts if generation != slot.generation]:
+                await slot.contexts.pop(generation).close()
@@ -0,0 +1,92 @@
+"""
+浏览器抓取配置 (WEIBO_BROWSER_PROFILE)。
+
+- production: 无头、无 slow_mo；通过路由拦截中止图片/字体/样式/媒体与统计脚本请求；导航只等到 DOM 就绪，
+  getIndex 的 JSON 由页面 response 事件送达，详情页等待正文选择器出现。每个页面共用一个超时预算
+  (WEIBO_PAGE_TIMEOUT 秒)，导航已用掉的时间从后续等待中扣除。
+- debug: 原有行为，有界面、slow_mo 500，加载全部资源，等到 networkidle 后再固定等待，便于肉眼观察页面。
+"""
+from urllib.parse import urlparse
+
+from scrapy.settings import SETTINGS_PRIORITIES
+from scrapy_playwright.page import PageMethod
+
+PROFILES = {
+    'production': {'headless': True, 'slow_mo': 0, 'block_resources': True,
+                   'wait_until': 'domcontentloaded', 'settle_ms': 0, 'page_timeout': 15.0},
+    'debug': {'headless': False, 'slow_mo': 500, 'block_resources': False,
+              'wait_until': 'networkidle', 'settle_ms': 2000, 'page_timeout': 30.0},
+}
+DETAIL_TEXT_SELECTOR = 'div.WB_text, div.detail_wbtext_wrap'
+
+
+class ResourceBlocker:
+    """PLAYWRIGHT_ABORT_REQUEST 判定：按资源类型与统计/广告域名 (含子域名) 中止浏览器请求"""
+
+    def __init__(self, resource_types, hosts):
+        self.resource_types = frozenset(resource_types)
+        self.hosts = tuple(host.lower().lstrip('.') for host in hosts)
+
+    def __call__(self, request):
+        if request.resource_type in self.resource_types:
+            return True
+        host = (urlparse(request.url).hostname or '').lower()
+        return any(host == blocked or host.endswith('.' + blocked) for blocked in self.hosts)
+
+
+def _set_keeping_priority(settings, name, value):
+    """以不低于现有值的优先级写入，命令行 -s 给出的设置也会被补全而不是被忽略"""
+    priority = max(settings.getpriority(name) or 0, SETTINGS_PRIORITIES['spider'])
+    settings.set(name, value, priority=priority)
+
+
+class BrowserProfile:
+    def __init__(self, name='production', page_timeout=None):
+        if name not in PROFILES:
+            raise ValueError(f"未知的 WEIBO_BROWSER_PROFILE: {name} (可选 {', '.join(PROFILES)})")
+        options = PROFILES[name]
+        self.name = name
+        self.headless = options['headless']
+        self.slow_mo = options['slow_mo']
+        self.block_resources = options['block_resources']
+        self.wait_until = options['wait_until']
+        self.settle_ms = options['settle_ms']
+        self.page_timeout = page_timeout or options['page_timeout']
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get('WEIBO_BROWSER_PROFILE', 'production'),
+                   page_timeout=settings.getfloat('WEIBO_PAGE_TIMEOUT', 0) or None)
+
+    @classmethod
+    def apply(cls, settings):
+        """按配置补全 PLAYWRIGHT_LAUNCH_OPTIONS (显式给出的 headless / slow_mo 优先) 与 PLAYWRIGHT_ABORT_REQUEST"""
+        profile = cls.from_settings(settings)
+        launch_options = {'headless': profile.headless, 'slow_mo': profile.slow_mo}
+        launch_options.update(settings.getdict('PLAYWRIGHT_LAUNCH_OPTIONS'))
+        _set_keeping_priority(settings, 'PLAYWRIGHT_LAUNCH_OPTIONS', launch_options)
+        if profile.block_resources and not settings.get('PLAYWRIGHT_ABORT_REQUEST'):
+            blocker = ResourceBlocker(settings.getlist('WEIBO_BROWSER_BLOCK_RESOURCE_TYPES'),
+                                      settings.getlist('WEIBO_BROWSER_BLOCK_HOSTS'))
+            _set_keeping_priority(settings, 'PLAYWRIGHT_ABORT_REQUEST', blocker)
+        return profile
+
+    def goto_kwargs(self):
+        return {'wait_until': self.wait_until, 'timeout': self.page_timeout * 1000}
+
+    def page_methods(self):
+        return [PageMethod('wait_for_timeout', self.settle_ms)] if self.settle_ms else []
+
+    def remaining(self, meta):
+        """页面预算扣除导航耗时 (download_latency) 后剩余的秒数"""
+        return max(0.5, self.page_timeout - meta.get('download_latency', 0))
+
+    async def settle_detail(self, page, meta):
+        """详情页：production 等正文选择器出现；debug 滚动到底再回顶部并固定等待，让懒加载内容出现"""
+        if not self.settle_ms:
+            await page.wait_for_selector(DETAIL_TEXT_SELECTOR, timeout=self.remaining(meta) * 1000)
+            return
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        await page.wait_for_timeout(3000)
+        await page.evaluate("window.scrollTo(0, 0)")
+        await page.wait_for_timeout(1000)
@@ -0,0 +1,191 @@
+"""
+微博发布时间归一化。
+
+覆盖微博各端出现的时间写法：刚刚、N秒/分钟/小时/天前、今天/昨天/前天 HH:MM、MM-DD、MM月DD日 HH:MM、
+YYYY-MM-DD[ HH:MM[:SS]] 以及 API 的 "Sat Oct 18 10:00:00 +0800 2026"。
+所有写法由一个预编译正则一次匹配分派；相对时间以调用方传入的抓取时间 (每个响应取一次) 为锚点。
+返回带时区的 datetime，pymongo 会将其存为 BSON Date (UTC)，可直接建立范围索引。
+分析端 (命令行的起止日期) 使用同一个函数，不带时区的时间一律按北京时间解释；成批的字符串 (Parquet 导出与快照读取时
+旧数据里的字符串日期) 用 to_datetime64 一次转换为 numpy 数组。
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+CST = timezone(timedelta(hours=8), name='Asia/Shanghai')
+
+_MONTHS = {name: index for index, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), start=1)}
+_AGO_UNITS = {'秒': 'seconds', '分钟': 'minutes', '小时': 'hours', '天': 'days'}
+_DAY_OFFSETS = {'今天': 0, '昨天': 1, '前天': 2}
+
+_DATE_RE = re.compile(r'''
+    ^\s*(?:
+        (?P<just>刚刚)
+      | (?P<ago>\d+)\s*(?P<ago_unit>秒|分钟|小时|天)前
+      | (?P<rel>今天|昨天|前天)\s*(?:(?P<rel_h>\d{1,2}):(?P<rel_mi>\d{2}))?
+      | [A-Z][a-z]{2}\s+(?P<api_mon>[A-Z][a-z]{2})\s+(?P<api_d>\d{1,2})\s+
+        (?P<api_h>\d{2}):(?P<api_mi>\d{2}):(?P<api_s>\d{2})\s+(?P<api_tz>[+-]\d{4})\s+(?P<api_y>\d{4})
+      | (?:(?P<y>\d{4})\s*[-/.年]\s*)?(?P<mo>\d{1,2})\s*[-/.月]\s*(?P<d>\d{1,2})\s*日?
+        (?:\s*(?P<h>\d{1,2}):(?P<mi>\d{2})(?::(?P<s>\d{2}))?)?
+    )\s*$
+''', re.VERBOSE)
+
+
+def _anchor(now):
+    if now is None:
+        return datetime.now(CST)
+    if now.tzinfo is None:
+        return now.replace(tzinfo=CST)
+    return now.astimezone(CST)
+
+
+def normalize_date(raw, now=None):
+    """把一条微博时间字符串转换为带时区的 datetime；无法识别时返回 None。now 为相对时间的锚点"""
+    if isinstance(raw, datetime):
+        return raw if raw.tzinfo else raw.replace(tzinfo=CST)
+    if not raw or not isinstance(raw, str):
+        return None
+    m = _DATE_RE.match(raw)
+    if m is None:
+        return None
+    try:
+        return _build(m, _anchor(now))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _build(m, now):
+    if m.group('just'):
+        return now
+    ago = m.group('ago')
+    if ago:
+        return now - timedelta(**{_AGO_UNITS[m.group('ago_unit')]: int(ago)})
+    rel = m.group('rel')
+    if rel:
+        day = now - timedelta(days=_DAY_OFFSETS[rel])
+        if m.group('rel_h') is None:
+            return day.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day.replace(hour=int(m.group('rel_h')), minute=int(m.group('rel_mi')), second=0, microsecond=0)
+    api_mon = m.group('api_mon')
+    if api_mon:
+        tz = m.group('api_tz')
+        offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5]))
+        tzinfo = CST if tz == '+0800' else timezone(-offset if tz[0] == '-' else offset)
+        return datetime(int(m.group('api_y')), _MONTHS[api_mon], int(m.group('api_d')),
+                        int(m.group('api_h')), int(m.group('api_mi')), int(m.group('api_s')), tzinfo=tzinfo)
+    hour = int(m.group('h') or 0)
+    minute = int(m.group('mi') or 0)
+    second = int(m.group('s') or 0)
+    if m.group('y'):
+        return datetime(int(m.group('y')), int(m.group('mo')), int(m.group('d')), hour, minute, second, tzinfo=CST)
+    # 不带年份：取锚点所在年份，若因此落在锚点之后 (跨年)，则归到上一年
+    parsed = datetime(now.year, int(m.group('mo')), int(m.group('d')), hour, minute, second, tzinfo=CST)
+    if parsed - now > timedelta(days=1):
+        parsed = parsed.replace(year=now.year - 1)
+    return parsed
+
+
+
+# 同一正则的 RE2 写法 (供 pyarrow.compute.extract_regex)：去掉 VERBOSE 空白，\s 补上全角空格与不换行空格
+_ARROW_DATE_PATTERN = re.sub(r'\s+', '', _DATE_RE.pattern).replace('\\s', r'[\s\x{3000}\x{a0}]')
+_DAY_MS = 86_400_000
+_CST_MS = 8 * 3_600_000
+_AGO_UNIT_MS = {'秒': 1000, '分钟': 60_000, '小时': 3_600_000, '天': _DAY_MS}
+
+
+def _civil_ms(year, month, day, hour, minute, second):
+    """年月日时分秒整数列 -> (本地毫秒数, 是否为合法日期)，非法处的毫秒数无意义"""
+    import numpy as np
+    valid = (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60) & (second < 60)
+    month_start = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + np.clip(month - 1, 0, 11)
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(np.int64)
+    valid &= day <= days_in_month
+    days = month_start.astype('datetime64[D]').astype(np.int64) + day - 1
+    return days * _DAY_MS + ((hour * 60 + minute) * 60 + second) * 1000, valid
+
+
+def _captures(strings):
+    """
+    对字符串数组逐个匹配 (在 Arrow 的 C++ 实现中)，返回 {分组名: numpy 列}：
+    数字分组为 int64 (缺失为 0)，其余为是否捕获到的布尔列，以及 ago_unit/rel/api_mon 在各自取值表中的下标。
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    matched = pc.extract_regex(strings, _ARROW_DATE_PATTERN)
+    columns = {}
+    for name in _DATE_RE.groupindex:
+        field = pc.fill_null(matched.field(name), '')
+        present = pc.not_equal(field, '')
+        columns[f"has_{name}"] = present.to_numpy(zero_copy_only=False)
+        if name in ('ago_unit', 'rel', 'api_mon'):
+            table = {'ago_unit': _AGO_UNIT_MS, 'rel': _DAY_OFFSETS, 'api_mon': _MONTHS}[name]
+            index = pc.index_in(field, value_set=pa.array(list(table)))
+            columns[name] = np.asarray(list(table.values()), dtype=np.int64)[
+                pc.fill_null(index, 0).to_numpy(zero_copy_only=False)]
+        elif name == 'api_tz':
+            digits = pc.cast(pc.if_else(present, pc.utf8_slice_codeunits(field, 1), '0'), pa.int64())
+            sign = np.where(pc.starts_with(field, '-').to_numpy(zero_copy_only=False), -1, 1)
+            columns[name] = sign * (digits.to_numpy() // 100 * 60 + digits.to_numpy() % 100) * 60_000
+        elif name != 'just':
+            columns[name] = pc.cast(pc.if_else(present, field, '0'), pa.int64()).to_numpy()
+    return columns
+
+
+def to_datetime64(values, now=None):
+    """
+    批量归一化为 datetime64[ms] (UTC) 数组，无法识别的为 NaT。values 为字符串序列 (None 视为无法识别)；
+    now 为单个锚点，或与 values 等长的 datetime64 数组 (如每条旧数据各自的抓取时间，NaT 处相对时间无法解析)。
+    先字典编码，每个不同的字符串只匹配一次正则；分组捕获转为整数列后，日期运算全部在 numpy 中按列完成。
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    encoded = pc.dictionary_encode(pc.fill_null(pa.array(values, type=pa.string()), ''))
+    inverse = encoded.indices.to_numpy()
+    col = _captures(encoded.dictionary)
+    per_element = isinstance(now, np.ndarray)
+    if per_element:
+        # 锚点逐条不同时在展开后的列上计算；否则在去重后的列上计算再展开
+        col = {name: column[inverse] for name, column in col.items()}
+        anchors = now.astype('datetime64[ms]')
+    else:
+        anchors = np.full(len(encoded.dictionary), np.datetime64(int(_anchor(now).timestamp() * 1000), 'ms'))
+    anchored = ~np.isnat(anchors)
+    anchor = np.where(anchored, anchors.astype(np.int64), 0)
+    local_anchor = anchor + _CST_MS
+    anchor_year = local_anchor.astype('datetime64[ms]').astype('datetime64[Y]').astype(np.int64) + 1970
+    result = np.zeros(len(anchor), dtype=np.int64)
+    valid = np.zeros(len(anchor), dtype=bool)
+
+    just = col['has_just']
+    result[just], valid[just] = anchor[just], anchored[just]
+
+    ago = col['has_ago']
+    result[ago], valid[ago] = (anchor - col['ago'] * col['ago_unit'])[ago], anchored[ago]
+
+    rel = col['has_rel']
+    day_start = local_anchor // _DAY_MS * _DAY_MS - col['rel'] * _DAY_MS
+    rel_ms = day_start + (col['rel_h'] * 60 + col['rel_mi']) * 60_000 - _CST_MS
+    result[rel], valid[rel] = rel_ms[rel], (anchored & (col['rel_h'] < 24) & (col['rel_mi'] < 60))[rel]
+
+    api = col['has_api_mon']
+    api_ms, api_valid = _civil_ms(col['api_y'], col['api_mon'], col['api_d'], col['api_h'], col['api_mi'],
+                                  col['api_s'])
+    result[api], valid[api] = (api_ms - col['api_tz'])[api], api_valid[api]
+
+    dated = col['has_mo']
+    with_year = dated & col['has_y']
+    year = np.where(with_year, col['y'], anchor_year)
+    clock = (col['h'], col['mi'], col['s'])
+    first_ms, first_valid = _civil_ms(year, col['mo'], col['d'], *clock)
+    # 不带年份：取锚点所在年份，若因此落在锚点之后 (跨年)，则归到上一年
+    rollback = ~with_year & (first_ms - _CST_MS - anchor > _DAY_MS)
+    final_ms, final_valid = _civil_ms(year - rollback, col['mo'], col['d'], *clock)
+    dated_valid = first_valid & final_valid & (with_year | anchored)
+    result[dated], valid[dated] = (final_ms - _CST_MS)[dated], dated_valid[dated]
+
+    parsed = np.where(valid, result, np.iinfo(np.int64).min).astype('datetime64[ms]')
+    return parsed if per_element else parsed[inverse]
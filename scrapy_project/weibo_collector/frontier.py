@@ -0,0 +1,125 @@
+"""
+持久化的关键词前沿 (SQLite)：多个爬虫进程共享同一个数据库文件。
+
+每个关键词一行，记录状态 (pending / leased / done)、租约持有者与到期时间、已连续处理完的页数与下一页的 since_id、
+本轮见到的最新帖子 id，以及上一轮完成时的最新帖子 id (增量抓取翻到这里为止)。
+租约在 BEGIN IMMEDIATE 事务中领取，同一关键词同一时刻只属于一个进程；进程崩溃后租约到期，由其他进程从检查点接着抓。
+"""
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+PENDING, LEASED, DONE = 'pending', 'leased', 'done'
+
+KeywordLease = namedtuple('KeywordLease', ['keyword', 'page', 'since_id', 'newest_id', 'last_seen_id'])
+
+
+class KeywordFrontier:
+    def __init__(self, path, lease_ttl=600.0, clock=time.time):
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.clock = clock
+        self._conn = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: 自己控制事务，领取租约时用 BEGIN IMMEDIATE 先拿写锁
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            "keyword TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending', owner TEXT, lease_expires REAL, "
+            "page INTEGER NOT NULL DEFAULT 0, since_id TEXT, newest_id INTEGER, last_seen_id INTEGER, "
+            "runs INTEGER NOT NULL DEFAULT 0, updated_at REAL)")
+        return self
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def add_keywords(self, keywords):
+        """加入新关键词 (已存在的保留原有进度)，返回新加入的数量"""
+        now = self.clock()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO keywords (keyword, updated_at) VALUES (?, ?)",
+                             [(keyword, now) for keyword in keywords])
+            return conn.total_changes - before
+
+    def new_run(self):
+        """开始新一轮增量抓取：未被租用 (或租约已过期) 的关键词都从第 1 页重新开始，保留 last_seen_id，返回重置的数量"""
+        now = self.clock()
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE keywords SET status = ?, owner = NULL, lease_expires = NULL, page = 0, since_id = NULL, "
+                "newest_id = NULL, updated_at = ? WHERE status != ? OR lease_expires < ?",
+                (PENDING, now, LEASED, now)).rowcount
+
+    def lease(self, owner, limit=1, exclude=()):
+        """原子地领取最多 limit 个待抓 (或租约已过期) 的关键词，返回 KeywordLease 列表"""
+        now = self.clock()
+        exclude = set(exclude)
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT keyword, page, since_id, newest_id, last_seen_id FROM keywords "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY rowid LIMIT ?",
+                (PENDING, LEASED, now, limit + len(exclude))).fetchall()
+            leases = [KeywordLease(*row) for row in rows if row[0] not in exclude][:limit]
+            conn.executemany(
+                "UPDATE keywords SET status = ?, owner = ?, lease_expires = ?, updated_at = ? WHERE keyword = ?",
+                [(LEASED, owner, now + self.lease_ttl, now, lease.keyword) for lease in leases])
+        return leases
+
+    def checkpoint(self, keyword, owner, page, since_id=None, newest_id=None):
+        """记录已连续处理完的页数并续租；租约已不属于 owner 时返回 False"""
+        now = self.clock()
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE keywords SET page = ?, since_id = ?, newest_id = MAX(COALESCE(newest_id, 0), ?), "
+                "lease_expires = ?, updated_at = ? WHERE keyword = ? AND owner = ? AND status = ?",
+                (page, since_id, newest_id or 0, now + self.lease_ttl, now, keyword, owner, LEASED)).rowcount > 0
+
+    def complete(self, keyword, owner, newest_id=None):
+        """本轮该关键词抓完：最新帖子 id 成为下一轮的 last_seen_id"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE keywords SET status = ?, owner = NULL, lease_expires = NULL, runs = runs + 1, "
+                "last_seen_id = MAX(COALESCE(last_seen_id, 0), COALESCE(newest_id, 0), ?), updated_at = ? "
+                "WHERE keyword = ? AND owner = ? AND status = ?",
+                (DONE, newest_id or 0, self.clock(), keyword, owner, LEASED)).rowcount > 0
+
+    def release(self, keyword, owner):
+        """未抓完的关键词交还前沿，保留检查点"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE keywords SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE keyword = ? AND owner = ? AND status = ?",
+                (PENDING, self.clock(), keyword, owner, LEASED)).rowcount > 0
+
+    def release_owner(self, owner):
+        """交还 owner 持有的全部租约，返回数量"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE keywords SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE owner = ? AND status = ?", (PENDING, self.clock(), owner, LEASED)).rowcount
+
+    def counts(self):
+        counts = {PENDING: 0, LEASED: 0, DONE: 0}
+        for status, count in self._conn.execute("SELECT status, COUNT(*) FROM keywords GROUP BY status"):
+            counts[status] = count
+        return counts
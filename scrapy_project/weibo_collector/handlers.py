@@ -0,0 +1,38 @@
+"""
+按需启动的 Playwright 下载处理器。
+
+scrapy-playwright 在 engine_started 时就为 http、https 各启动一个 Playwright 驱动进程。HTTP 下载模式下浏览器
+只是登录重定向/非 JSON 响应时的回退通道，离线回放则完全用不到浏览器，因此推迟到第一个 playwright 请求时
+再启动；WEIBO_DOWNLOAD_MODE = 'playwright' 时仍在引擎启动时启动，预先创建上下文池。
+"""
+import asyncio
+
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+
+class LazyPlaywrightDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.eager = crawler.settings.get('WEIBO_DOWNLOAD_MODE', 'http') == 'playwright'
+        self.launched = False
+        self.lazy_launch_lock = asyncio.Lock()
+
+    def _engine_started(self):
+        if self.eager:
+            return super()._engine_started()
+        return None
+
+    async def _launch(self):
+        await super()._launch()
+        self.launched = True
+
+    async def _download_request(self, request, spider):
+        if not self.launched:
+            async with self.lazy_launch_lock:
+                if not self.launched:
+                    await self._launch()
+        return await super()._download_request(request, spider)
+
+    async def _close(self):
+        if self.launched:
+            await super()._close()
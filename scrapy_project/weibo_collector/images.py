@@ -0,0 +1,117 @@
+"""
+图片存储的辅助：尺寸变体 URL 的规范化、URL -> 内容哈希的持久索引、进程池中执行的缩略图生成。
+"""
+import os
+import re
+import sqlite3
+import time
+from io import BytesIO
+from urllib.parse import urlsplit, urlunsplit
+
+# 新浪图床同一张图的各种尺寸前缀：/<size>/<pid>.jpg
+SIZE_PREFIXES = frozenset({
+    'thumbnail', 'thumb150', 'thumb180', 'thumb300', 'square', 'small', 'bmiddle', 'middle',
+    'orj180', 'orj360', 'orj480', 'orj960', 'mw240', 'mw600', 'mw690', 'mw1024', 'mw2000',
+    'large', 'woriginal', 'original',
+})
+# wx1~wx4 / ww1~ww4 是同一图床的镜像域名
+MIRROR_HOST_RE = re.compile(r'^(?:wx|ww)\d\.sinaimg\.cn$')
+CANONICAL_HOST = 'wx1.sinaimg.cn'
+
+
+def canonical_image_url(url, size='large', hosts=('sinaimg.cn',)):
+    """把同一张图的不同尺寸、不同镜像域名的 URL 统一为一个规范 URL；不认识的 URL 原样返回"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if not any(host == suffix or host.endswith('.' + suffix) for suffix in hosts):
+        return url
+    segments = parts.path.lstrip('/').split('/', 1)
+    if len(segments) != 2 or segments[0] not in SIZE_PREFIXES:
+        return url
+    if MIRROR_HOST_RE.match(host):
+        # 图床镜像同时支持 http/https，统一协议与域名后同一张图只对应一个 URL
+        return urlunsplit(('https', CANONICAL_HOST, f"/{size}/{segments[1]}", parts.query, ''))
+    return urlunsplit((parts.scheme, parts.netloc, f"/{size}/{segments[1]}", parts.query, ''))
+
+
+class ImageIndex:
+    """
+    规范 URL -> (内容哈希, 存储路径) 的持久索引 (SQLite)。启动时整表读入内存，查询不访问磁盘；
+    新记录逐条插入，每 commit_every 条提交一次，关闭时提交剩余部分。
+    """
+    def __init__(self, path, commit_every=100):
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self.urls = {}
+        self.contents = {}
+        self._conn = None
+        self._uncommitted = 0
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "url TEXT PRIMARY KEY, checksum TEXT NOT NULL, path TEXT NOT NULL, size INTEGER, stored_at REAL)")
+        for url, checksum, path in self._conn.execute("SELECT url, checksum, path FROM images"):
+            self.urls[url] = (checksum, path)
+            self.contents[checksum] = path
+        return self
+
+    def __len__(self):
+        return len(self.urls)
+
+    def get(self, url):
+        return self.urls.get(url)
+
+    def path_for_content(self, checksum):
+        return self.contents.get(checksum)
+
+    def add(self, url, checksum, path, size=None):
+        if self.urls.get(url) == (checksum, path):
+            return
+        self.urls[url] = (checksum, path)
+        self.contents.setdefault(checksum, path)
+        self._conn.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)",
+                           (url, checksum, path, size, time.time()))
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        if self._conn is not None and self._uncommitted:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
+
+
+def _to_rgb(image):
+    """与 ImagesPipeline.convert_image 相同的透明背景处理"""
+    from PIL import Image
+    if image.mode in ('RGBA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255))
+        background.paste(image, image)
+        return background.convert('RGB')
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def make_thumbnails(body, thumbs):
+    """在 worker 进程中解码原图并生成各尺寸缩略图，返回 [(thumb_id, JPEG 字节, 宽, 高), ...]"""
+    from PIL import Image
+    image = _to_rgb(Image.open(BytesIO(body)))
+    result = []
+    for thumb_id, size in thumbs.items():
+        thumb = image.copy()
+        thumb.thumbnail(size, Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        thumb.save(buf, 'JPEG')
+        result.append((thumb_id, buf.getvalue(), thumb.width, thumb.height))
+    return result
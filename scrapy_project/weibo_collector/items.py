@@ -8,4 +8,7 @@ class WeiboPostItem(scrapy.Item):
     image_urls = scrapy.Field()   # 图片下载 URL 列表
     images = scrapy.Field()       # ImagesPipeline 处理结果
     segmented_text = scrapy.Field() # 新增：分词后的文本内容 (列表)
-    post_url = scrapy.Field()       # 新增：帖子原始链接，方便追溯
\ No newline at end of file
+    post_url = scrapy.Field()       # 新增：帖子原始链接，方便追溯
+    post_id = scrapy.Field()        # 微博 mblog.id/mid，作为帖子唯一标识
+    keyword = scrapy.Field()        # 抓到该帖子的搜索关键词
+    fetched_at = scrapy.Field()     # 抓取该帖子所在响应的时间，相对时间的解析锚点
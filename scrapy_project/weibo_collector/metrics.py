@@ -0,0 +1,270 @@
+"""
+分阶段延迟埋点。
+
+CrawlMetrics 是每个 crawler 一份的轻量注册表：各组件在热路径上只调用 observe(stage, 秒数)
+(一次 bisect + 几次加法)，队列深度等瞬时值以回调形式注册为 gauge，只在汇报时才求值。
+MetricsExtension 负责汇报：
+  - 下载耗时来自 response_received 信号与 download_latency，浏览器请求再拆出固定等待 (wait_for_timeout)；
+  - 每隔 WEIBO_METRICS_INTERVAL 秒写入 Scrapy stats 并打印一行摘要；
+  - 可选写出 Prometheus textfile (WEIBO_METRICS_TEXTFILE) 或开放 HTTP 端点 (WEIBO_METRICS_PORT)。
+"""
+import logging
+import os
+import time
+from bisect import bisect_left
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界 (秒)，与 Prometheus histogram 的 le 语义一致
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+# 登录重定向计数：stats 键 -> Prometheus 标签
+LOGIN_REDIRECT_STATS = {
+    'weibo/http_fallback/redirect': 'http',
+    'weibo/context_pool/recycled/login_redirect': 'browser',
+}
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """按桶线性插值估算分位数 (与 Prometheus histogram_quantile 相同)，落在最后一个桶时取最大值"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                upper = BUCKETS[index]
+                if upper == float('inf'):
+                    return self.max
+                lower = BUCKETS[index - 1] if index else 0.0
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, self.max)
+            cumulative += bucket_count
+        return self.max
+
+
+class CrawlMetrics:
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+
+    def observe(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def register_gauge(self, name, read):
+        """read() 返回当前值；同名 gauge 后注册的覆盖先注册的"""
+        self.gauges[name] = read
+
+    def read_gauges(self):
+        values = {}
+        for name, read in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                logger.debug(f"读取指标 {name} 失败: {e}")
+        return values
+
+
+def get_metrics(crawler):
+    """crawler 共享的 CrawlMetrics；WEIBO_METRICS_ENABLED 为 False 时返回 None，埋点全部跳过"""
+    if crawler is None or not crawler.settings.getbool('WEIBO_METRICS_ENABLED', True):
+        return None
+    metrics = getattr(crawler, 'weibo_metrics', None)
+    if metrics is None:
+        metrics = crawler.weibo_metrics = CrawlMetrics()
+    return metrics
+
+
+def _fixed_wait_seconds(meta):
+    """请求的 playwright_page_methods 中 wait_for_timeout 的总时长 (秒)"""
+    total = 0.0
+    for method in meta.get('playwright_page_methods') or ():
+        if getattr(method, 'method', None) == 'wait_for_timeout':
+            args = method.args or tuple(method.kwargs.values())
+            if args:
+                total += float(args[0]) / 1000
+    return total
+
+
+class MetricsExtension:
+    def __init__(self, crawler, metrics, interval=60.0, textfile=None, port=None, host='127.0.0.1'):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.metrics = metrics
+        self.interval = interval
+        self.textfile = textfile
+        self.port = port
+        self.host = host
+        self._loop = None
+        self._listening_port = None
+        self._started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        metrics = get_metrics(crawler)
+        if metrics is None:
+            raise NotConfigured
+        ext = cls(
+            crawler,
+            metrics,
+            interval=crawler.settings.getfloat('WEIBO_METRICS_INTERVAL', 60.0),
+            textfile=crawler.settings.get('WEIBO_METRICS_TEXTFILE'),
+            port=crawler.settings.getint('WEIBO_METRICS_PORT', 0) or None,
+            host=crawler.settings.get('WEIBO_METRICS_HOST', '127.0.0.1'),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        return ext
+
+    def spider_opened(self, spider):
+        self._started = time.monotonic()
+        self._register_engine_gauges()
+        if self.port:
+            self._listen()
+        if self.interval > 0:
+            self._loop = task.LoopingCall(self.report, spider)
+            self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self._loop and self._loop.running:
+            self._loop.stop()
+        self.report(spider)
+        if self._listening_port is not None:
+            self._listening_port.stopListening()
+            self._listening_port = None
+
+    def _register_engine_gauges(self):
+        engine = self.crawler.engine
+        self.metrics.register_gauge('scheduler_queue', lambda: len(engine.slot.scheduler) if engine.slot else 0)
+        self.metrics.register_gauge('downloader_active', lambda: len(engine.downloader.active))
+        self.metrics.register_gauge('scraper_queue',
+                                    lambda: len(engine.scraper.slot.queue) if engine.scraper.slot else 0)
+        self.metrics.register_gauge('items_in_pipelines',
+                                    lambda: engine.scraper.slot.itemproc_size if engine.scraper.slot else 0)
+        self.metrics.register_gauge('playwright_open_pages',
+                                    lambda: (self.stats.get_value('playwright/page_count', 0)
+                                             - self.stats.get_value('playwright/page_count/closed', 0)))
+
+    def request_reached_downloader(self, request, spider):
+        request.meta['weibo_reached_downloader'] = time.perf_counter()
+
+    def response_received(self, response, request, spider):
+        meta = request.meta
+        latency = meta.get('download_latency')
+        if latency is None:
+            return
+        if meta.get('playwright'):
+            waits = _fixed_wait_seconds(meta)
+            self.metrics.observe('playwright_download', latency)
+            self.metrics.observe('playwright_navigation', max(0.0, latency - waits))
+            if waits:
+                self.metrics.observe('playwright_fixed_wait', waits)
+        else:
+            self.metrics.observe(meta.get('weibo_stage', 'http_download'), latency)
+        reached = meta.get('weibo_reached_downloader')
+        if reached is not None:
+            # 进入下载器到开始下载之间的排队：DOWNLOAD_DELAY、AutoThrottle 与并发槽位
+            self.metrics.observe('download_slot_wait', max(0.0, time.perf_counter() - reached - latency))
+
+    def report(self, spider):
+        gauges = self.metrics.read_gauges()
+        for name, value in gauges.items():
+            self.stats.set_value(f'metrics/{name}', value)
+            self.stats.max_value(f'metrics/{name}_max', value)
+        summaries = []
+        for stage, histogram in sorted(self.metrics.histograms.items()):
+            p50, p95 = histogram.quantile(0.5) * 1000, histogram.quantile(0.95) * 1000
+            self.stats.set_value(f'latency/{stage}/count', histogram.count)
+            self.stats.set_value(f'latency/{stage}/mean_ms', histogram.sum / histogram.count * 1000)
+            self.stats.set_value(f'latency/{stage}/p50_ms', p50)
+            self.stats.set_value(f'latency/{stage}/p95_ms', p95)
+            self.stats.set_value(f'latency/{stage}/max_ms', histogram.max * 1000)
+            summaries.append(f"{stage} n={histogram.count} p50={p50:.0f}ms p95={p95:.0f}ms")
+        redirects = sum(self.stats.get_value(key, 0) for key in LOGIN_REDIRECT_STATS)
+        gauge_str = ", ".join(f"{name}={value}" for name, value in gauges.items())
+        spider.logger.info(f"[指标] {gauge_str}, login_redirects={redirects} | {'; '.join(summaries) or '暂无延迟数据'}")
+        if self.textfile:
+            self._write_textfile()
+
+    def render_prometheus(self):
+        """Prometheus 文本格式 (0.0.4)"""
+        lines = [
+            "# HELP weibo_stage_latency_seconds Latency of each crawl stage.",
+            "# TYPE weibo_stage_latency_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.metrics.histograms.items()):
+            cumulative = 0
+            for upper, bucket_count in zip(BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if upper == float('inf') else repr(upper)
+                lines.append(f'weibo_stage_latency_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'weibo_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'weibo_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, value in sorted(self.metrics.read_gauges().items()):
+            lines.append(f"# TYPE weibo_{name} gauge")
+            lines.append(f"weibo_{name} {value}")
+        lines.append("# TYPE weibo_login_redirects_total counter")
+        for key, path in LOGIN_REDIRECT_STATS.items():
+            lines.append(f'weibo_login_redirects_total{{path="{path}"}} {self.stats.get_value(key, 0)}')
+        lines.append("# TYPE weibo_items_scraped_total counter")
+        lines.append(f"weibo_items_scraped_total {self.stats.get_value('item_scraped_count', 0)}")
+        lines.append("# TYPE weibo_items_dropped_total counter")
+        lines.append(f"weibo_items_dropped_total {self.stats.get_value('item_dropped_count', 0)}")
+        if self._started is not None:
+            lines.append("# TYPE weibo_uptime_seconds gauge")
+            lines.append(f"weibo_uptime_seconds {time.monotonic() - self._started:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def _write_textfile(self):
+        """先写临时文件再原子替换，node_exporter 不会读到写了一半的文件"""
+        tmp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, self.textfile)
+        except OSError as e:
+            logger.warning(f"写入指标文件 {self.textfile} 失败: {e}")
+
+    def _listen(self):
+        from twisted.internet import reactor
+        from twisted.web import resource, server
+
+        render = self.render_prometheus
+
+        class MetricsResource(resource.Resource):
+            isLeaf = True
+
+            def render_GET(self, request):
+                request.setHeader(b"Content-Type", b"text/plain; version=0.0.4; charset=utf-8")
+                return render().encode("utf-8")
+
+        try:
+            self._listening_port = reactor.listenTCP(self.port, server.Site(MetricsResource()), interface=self.host)
+        except Exception as e:
+            logger.error(f"指标 HTTP 端点监听 {self.host}:{self.port} 失败: {e}")
+            return
+        logger.info(f"指标 HTTP 端点: http://{self.host}:{self.port}/metrics")
@@ -1,29 +1,472 @@
+import asyncio
+import logging
+import os
 import random, time
 from scrapy import signals
-from scrapy.exceptions import IgnoreRequest
-from twocaptcha import TwoCaptcha
-import undetected_chromedriver as uc  # :contentReference[oaicite:5]{index=5}
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.misc import load_object
+from .accounts import HEALTHY, AccountPool
+from .auth import build_cookie_header, is_login_url
+from .metrics import get_metrics
+from .proxy_pool import CLOSED, OPEN, ProxyPool, proxy_label
+from .rate_control import ACCOUNT_REASONS, HARD_BAN, SUCCESS, RateController, classify_response
+from .scheduler import SCHEDULE_DELAY_KEY, DelayedRequestScheduler
+
+logger = logging.getLogger(__name__)
+
+# 风控验证页的特征 (只检查 HTML 响应的开头部分)
+CAPTCHA_MARKERS = (b'captcha', b'geetest', '安全验证'.encode('utf-8'), '验证码'.encode('utf-8'))
 
 class ProxyMiddleware:
-    def __init__(self, proxy_list, proxy_enabled):
-        self.proxies = proxy_list
-        self.proxy_enabled = proxy_enabled 
+    """
+    按健康度从 ProxyPool 选取代理 (见 proxy_pool.py)。封禁信号 (PROXY_BAN_STATUS、验证码页、登录重定向)、
+    PROXY_RETRY_STATUS 与连接错误记为该代理的失败，并换一个代理重试，每个请求最多重试 PROXY_MAX_RETRIES 次。
+    须排在 RedirectMiddleware (600) 之后、HttpProxyMiddleware (750) 之前，才能看到原始的 3xx 响应。
+    浏览器请求的代理由上下文决定，这里不处理。
+    """
+    def __init__(self, pool, stats=None, max_retries=2, ban_status=(403, 418), retry_status=(429, 500, 502, 503, 504)):
+        self.pool = pool
+        self.stats = stats
+        self.max_retries = max_retries
+        self.ban_status = {int(status) for status in ban_status}
+        self.retry_status = {int(status) for status in retry_status}
+        self._by_url = {proxy.url: proxy for proxy in pool.proxies}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        proxy_list = settings.getlist('PROXY_LIST')
+        if not settings.getbool('PROXY_ENABLED', True) or not proxy_list: # 从settings读取是否启用代理, 默认True
+            raise NotConfigured("ProxyMiddleware disabled: PROXY_ENABLED is false or PROXY_LIST is not set.")
+        pool = ProxyPool(
+            proxy_list,
+            alpha=settings.getfloat('PROXY_EWMA_ALPHA', 0.3),
+            failure_threshold=settings.getint('PROXY_FAILURE_THRESHOLD', 3),
+            cooldown=settings.getfloat('PROXY_COOLDOWN', 30.0),
+            max_cooldown=settings.getfloat('PROXY_MAX_COOLDOWN', 600.0),
+        )
+        middleware = cls(
+            pool,
+            stats=crawler.stats,
+            max_retries=settings.getint('PROXY_MAX_RETRIES', 2),
+            ban_status=settings.getlist('PROXY_BAN_STATUS', [403, 418]),
+            retry_status=settings.getlist('PROXY_RETRY_STATUS', [429, 500, 502, 503, 504]),
+        )
+        metrics = get_metrics(crawler)
+        if metrics:
+            metrics.register_gauge('proxies_healthy', lambda: pool.counts()[CLOSED])
+            metrics.register_gauge('proxies_cooling', lambda: pool.counts()[OPEN])
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(f"weibo/proxy_pool/{key}", count)
+
+    def process_request(self, request, spider):
+        if request.meta.get('playwright'):
+            return None
+        stale = self._take_proxy(request)
+        outcome = request.meta.get('weibo_rate_outcome')
+        if stale is not None and outcome:
+            # 上一次尝试的响应被后面的中间件 (RateControlMiddleware 的限流重试) 截下，按它的判定记一次失败
+            self._record_failure(stale, None, f"rate_control/{outcome}", spider, ban=outcome == HARD_BAN)
+        tried = request.meta.get('weibo_proxy_tried', [])
+        if request.meta.pop('weibo_rate_deferred', False) and tried:
+            tried = tried[:-1] # 上次选中的代理因限速交还调度器，并没有真正发出请求
+        proxy, available = self.pool.choose(exclude=tried)
+        if not available:
+            self._inc_stat('all_cooling')
+        self.pool.acquire(proxy)
+        request.meta['proxy'] = proxy.url
+        request.meta['weibo_proxy'] = proxy.url
+        request.meta['weibo_proxy_tried'] = tried + [proxy.url]
+        self._inc_stat('requests')
+        spider.logger.debug(f"正在使用代理: {proxy.label} 发送请求 {request.url}")
+        return None
+
+    def _take_proxy(self, request):
+        """取出请求所用的代理并释放在途计数；同一请求只释放一次"""
+        proxy = self._by_url.get(request.meta.pop('weibo_proxy', None))
+        if proxy is not None:
+            self.pool.release(proxy)
+        return proxy
+
+    def _ban_reason(self, request, response):
+        if response.status in self.ban_status:
+            return f"status_{response.status}"
+        if 300 <= response.status < 400:
+            # 带账号的请求被重定向到登录页是账号过期，不怪代理
+            if is_login_url(response.headers.get('Location', b'').decode('utf-8', 'ignore')) \
+                    and not request.meta.get('weibo_account'):
+                return 'login_redirect'
+            return None
+        if b'html' in response.headers.get('Content-Type', b'').lower():
+            head = response.body[:4096].lower()
+            if any(marker in head for marker in CAPTCHA_MARKERS):
+                return 'captcha'
+        return None
+
+    def process_response(self, request, response, spider):
+        proxy = self._take_proxy(request)
+        if proxy is None:
+            return response
+        latency = request.meta.get('download_latency')
+        ban_reason = self._ban_reason(request, response)
+        if ban_reason:
+            self._record_failure(proxy, latency, f"ban/{ban_reason}", spider, ban=True)
+            return self._retry(request, proxy, ban_reason, spider) or response
+        if response.status in self.retry_status:
+            self._record_failure(proxy, latency, f"failure/status_{response.status}", spider)
+            return self._retry(request, proxy, f"status_{response.status}", spider) or response
+        self.pool.record_success(proxy, latency)
+        self._inc_stat('ok')
+        return response
+
+    def process_exception(self, request, exception, spider):
+        proxy = self._take_proxy(request)
+        if proxy is None or isinstance(exception, IgnoreRequest):
+            return None
+        reason = type(exception).__name__
+        self._record_failure(proxy, None, f"failure/{reason}", spider)
+        return self._retry(request, proxy, reason, spider)
+
+    def _record_failure(self, proxy, latency, stat, spider, ban=False):
+        self._inc_stat(stat)
+        cooldown = self.pool.record_failure(proxy, latency, ban=ban)
+        if cooldown is not None:
+            self._inc_stat('circuit_open')
+            spider.logger.warning(f"代理 {proxy.label} 熔断 {cooldown:.0f} 秒 ({stat}，第 {proxy.trips} 次)")
+
+    def _retry(self, request, proxy, reason, spider):
+        """换一个代理重新调度；超过重试次数时返回 None，交由后续中间件/回调处理"""
+        tried = request.meta.get('weibo_proxy_tried', [])
+        if request.meta.get('dont_retry'):
+            return None
+        if len(tried) > self.max_retries:
+            self._inc_stat('gave_up')
+            spider.logger.warning(f"请求 {request.url} 已尝试 {len(tried)} 个代理仍失败 ({reason})，不再重试。")
+            return None
+        self._inc_stat('retried')
+        spider.logger.debug(f"代理 {proxy.label} 请求 {request.url} 失败 ({reason})，换代理重试。")
+        retry = request.replace(dont_filter=True)
+        retry.meta.pop('proxy', None)
+        retry.meta.pop('download_latency', None)
+        return retry
+
+    def spider_closed(self, spider):
+        if self.stats:
+            self.stats.set_value('weibo/proxy_pool/proxies', self.pool.snapshot())
+
+class RateControlMiddleware:
+    """
+    取代固定 DOWNLOAD_DELAY 的按会话限速 (见 rate_control.py)。会话 = AccountMiddleware 选定的账号
+    (meta['weibo_session']，未启用多账号时为空) × ProxyMiddleware 选定的代理，因此须排在两者之后。
+    令牌最多等待 RATE_CONTROL_MAX_WAIT 秒；更长的等待 (会话被暂停或速率很低) 把请求交还 DelayedRequestScheduler，
+    RATE_CONTROL_MAX_WAIT 秒后重新选择代理与账号，不占下载器的并发名额。
+    软限流与硬封禁的请求在该会话降速/暂停后重新调度，最多 RATE_CONTROL_MAX_RETRIES 次；
+    登录重定向交给爬虫回退到浏览器，带账号请求的登录失效与 ok:0 由 AccountMiddleware 换账号重试。
+    """
+    def __init__(self, controller, stats=None, metrics=None, hosts=(), soft_status=(414, 429), hard_status=(418,),
+                 max_retries=3, max_wait=5.0, defer=True):
+        self.controller = controller
+        self.stats = stats
+        self.metrics = metrics
+        self.hosts = tuple(hosts)
+        self.soft_status = {int(status) for status in soft_status}
+        self.hard_status = {int(status) for status in hard_status}
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.defer = defer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('RATE_CONTROL_ENABLED', True):
+            raise NotConfigured("RateControlMiddleware disabled: RATE_CONTROL_ENABLED is false.")
+        controller = RateController(
+            start_rate=settings.getfloat('RATE_CONTROL_START_RATE', 0.33),
+            min_rate=settings.getfloat('RATE_CONTROL_MIN_RATE', 0.05),
+            max_rate=settings.getfloat('RATE_CONTROL_MAX_RATE', 4.0),
+            increase=settings.getfloat('RATE_CONTROL_INCREASE', 0.02),
+            backoff=settings.getfloat('RATE_CONTROL_BACKOFF', 0.5),
+            burst=settings.getint('RATE_CONTROL_BURST', 1),
+            ban_pause=settings.getfloat('RATE_CONTROL_BAN_PAUSE', 300.0),
+        )
+        defer = issubclass(load_object(settings.get('SCHEDULER')), DelayedRequestScheduler)
+        if not defer:
+            logger.warning("SCHEDULER 不是 DelayedRequestScheduler，限速等待的请求会一直占用下载并发名额。")
+        metrics = get_metrics(crawler)
+        middleware = cls(
+            controller,
+            stats=crawler.stats,
+            metrics=metrics,
+            hosts=settings.getlist('RATE_CONTROL_HOSTS', ['weibo.cn', 'weibo.com']),
+            soft_status=settings.getlist('RATE_CONTROL_SOFT_STATUS', [414, 429]),
+            hard_status=settings.getlist('RATE_CONTROL_HARD_STATUS', [418]),
+            max_retries=settings.getint('RATE_CONTROL_MAX_RETRIES', 3),
+            max_wait=settings.getfloat('RATE_CONTROL_MAX_WAIT', 5.0),
+            defer=defer,
+        )
+        if metrics:
+            metrics.register_gauge('rate_control_total_rate',
+                                   lambda: round(sum(b.rate for b in controller.buckets.values()), 3))
+            metrics.register_gauge('rate_control_paused_sessions', controller.paused)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(f"weibo/rate_control/{key}", count)
+
+    def _controlled(self, request):
+        if not self.hosts:
+            return True
+        host = urlparse_cached(request).hostname or ''
+        return any(host == suffix or host.endswith('.' + suffix) for suffix in self.hosts)
+
+    @staticmethod
+    def session_key(request):
+        proxy = request.meta.get('proxy')
+        key = proxy_label(proxy) if proxy else 'direct'
+        session = request.meta.get('weibo_session')
+        return f"{session}@{key}" if session else key
 
+    async def process_request(self, request, spider):
+        request.meta.pop('weibo_rate_outcome', None)
+        if not self._controlled(request):
+            return None
+        key = self.session_key(request)
+        bucket = self.controller.bucket(key)
+        start = time.perf_counter()
+        while True:
+            delay = bucket.take(self.controller.clock())
+            if delay <= 0:
+                break
+            if self.defer and delay > self.max_wait:
+                return self._deferred(request, key)
+            await asyncio.sleep(delay)
+        request.meta['weibo_rate_session'] = key
+        request.meta['weibo_rate_sent'] = self.controller.clock()
+        if self.metrics:
+            self.metrics.observe('rate_control_wait', time.perf_counter() - start)
+        return None
+
+    def _deferred(self, request, key):
+        """交还调度器，max_wait 秒后重新选择代理与账号"""
+        self._inc_stat('deferred')
+        logger.debug(f"会话 {key} 需要等待超过 {self.max_wait:.0f} 秒，请求 {request.url} 交还调度器。")
+        deferred = request.replace(dont_filter=True)
+        deferred.meta[SCHEDULE_DELAY_KEY] = self.max_wait
+        deferred.meta['weibo_rate_deferred'] = True
+        deferred.meta.pop('proxy', None)
+        return deferred
+
+    def process_response(self, request, response, spider):
+        key = request.meta.pop('weibo_rate_session', None)
+        if key is None:
+            return response
+        outcome, reason = classify_response(response, self.soft_status, self.hard_status)
+        bucket = self.controller.bucket(key)
+        if reason in ACCOUNT_REASONS and request.meta.get('weibo_account'):
+            # 账号层面的结果只作用于该账号 × 代理会话：ok:0 降速，登录失效暂停 (已在等令牌的请求随之交还调度器，
+            # 换账号重发)；隔离账号与换账号重试由 AccountMiddleware 负责
+            self._inc_stat(f"account/{reason}")
+            self.controller.record(bucket, outcome, request.meta.get('weibo_rate_sent'))
+            return response
+        decreased = self.controller.record(bucket, outcome, request.meta.get('weibo_rate_sent'))
+        if outcome == SUCCESS:
+            self._inc_stat('success')
+            return response
+        self._inc_stat(f"{outcome}/{reason}")
+        if outcome == HARD_BAN:
+            spider.logger.warning(f"会话 {key} 被封禁 ({reason})，暂停 {self.controller.ban_pause:.0f} 秒，"
+                                  f"速率降至 {bucket.rate:.2f} 次/秒。")
+        elif decreased:
+            spider.logger.info(f"会话 {key} 被限流 ({reason})，速率降至 {bucket.rate:.2f} 次/秒。")
+        retries = request.meta.get('weibo_rate_retries', 0)
+        # 没有账号可换时，登录重定向交给爬虫回退到浏览器
+        if reason == 'login_redirect':
+            return response
+        if request.meta.get('dont_retry') or retries >= self.max_retries:
+            return response
+        self._inc_stat('retried')
+        request.meta['weibo_rate_outcome'] = outcome
+        retry = request.replace(dont_filter=True)
+        retry.meta['weibo_rate_retries'] = retries + 1
+        retry.meta.pop('proxy', None)
+        retry.meta.pop('download_latency', None)
+        return retry
+
+    def spider_closed(self, spider):
+        if self.stats:
+            self.stats.set_value('weibo/rate_control/sessions', self.controller.snapshot())
+
+
+class AccountMiddleware:
+    """
+    多账号会话池 (见 accounts.py)：微博请求分给在途请求最少的健康账号并写入该账号的 Cookie，
+    再把账号名写入 meta['weibo_session']，由 RateControlMiddleware 按账号 × 代理的会话各自做 AIMD 限速，
+    因此须排在 ProxyMiddleware (700) 之后、RateControlMiddleware (720) 之前。
+    账号遇到登录重定向或连续 ok:0 时被隔离；这类响应由本中间件换一个账号重新调度，最多 RATE_CONTROL_MAX_RETRIES 次，
+    其余限流/封禁响应由 RateControlMiddleware 处理。浏览器请求使用上下文自带的会话状态，这里不处理。
+    """
+    def __init__(self, pool, stats=None, soft_status=(414, 429), hard_status=(418,), max_retries=3):
+        self.pool = pool
+        self.stats = stats
+        self.soft_status = {int(status) for status in soft_status}
+        self.hard_status = {int(status) for status in hard_status}
+        self.max_retries = max_retries
+        self._by_name = {account.name: account for account in pool.accounts}
+        self._host_has_cookies = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        accounts_dir = settings.get('WEIBO_ACCOUNTS_DIR')
+        if not accounts_dir or not os.path.isdir(accounts_dir):
+            raise NotConfigured("AccountMiddleware disabled: WEIBO_ACCOUNTS_DIR is not set or not a directory.")
+        pool = AccountPool.from_directory(
+            accounts_dir,
+            quarantine=settings.getfloat('WEIBO_ACCOUNT_QUARANTINE', 600.0),
+            max_throttles=settings.getint('WEIBO_ACCOUNT_MAX_THROTTLES', 3),
+            reload_interval=settings.getfloat('WEIBO_ACCOUNT_RELOAD_INTERVAL', 30.0),
+        )
+        if not len(pool):
+            raise NotConfigured(f"AccountMiddleware disabled: no account state files in {accounts_dir}.")
+        middleware = cls(
+            pool,
+            stats=crawler.stats,
+            soft_status=settings.getlist('RATE_CONTROL_SOFT_STATUS', [414, 429]),
+            hard_status=settings.getlist('RATE_CONTROL_HARD_STATUS', [418]),
+            max_retries=settings.getint('RATE_CONTROL_MAX_RETRIES', 3),
+        )
+        counts = pool.counts()
+        logger.info(f"从 {accounts_dir} 载入 {len(pool)} 个账号，可用 {counts[HEALTHY]} 个。")
+        metrics = get_metrics(crawler)
+        if metrics:
+            metrics.register_gauge('accounts_healthy', lambda: pool.counts()[HEALTHY])
+            metrics.register_gauge('accounts_quarantined', lambda: len(pool) - pool.counts()[HEALTHY])
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(f"weibo/accounts/{key}", count)
+
+    def _needs_account(self, host):
+        needed = self._host_has_cookies.get(host)
+        if needed is None:
+            needed = self._host_has_cookies[host] = any(account.cookies(host) for account in self.pool.accounts)
+        return needed
+
+    def process_request(self, request, spider):
+        if request.meta.get('playwright'):
+            return None
+        # 被后面的中间件截下重新调度的请求 (限速交还、限流重试) 先释放上一次选定的账号
+        self._take_account(request)
+        request.meta.pop('weibo_account', None)
+        request.meta.pop('weibo_session', None)
+        host = urlparse_cached(request).hostname or ''
+        if not self._needs_account(host):
+            return None
+        account = self.pool.choose(host)
+        if account is None:
+            self._inc_stat('none_available')
+            return None
+        self.pool.acquire(account)
+        cookies = account.cookies(host)
+        request.headers['Cookie'] = build_cookie_header(cookies)
+        if 'XSRF-TOKEN' in cookies:
+            request.headers['X-XSRF-TOKEN'] = cookies['XSRF-TOKEN']
+        request.meta['weibo_account'] = account.name
+        request.meta['weibo_session'] = account.name
+        request.meta['weibo_account_in_flight'] = True
+        return None
+
+    def _take_account(self, request):
+        """取出请求所用的账号并释放在途计数；同一请求只释放一次"""
+        if not request.meta.pop('weibo_account_in_flight', False):
+            return None
+        account = self._by_name.get(request.meta.get('weibo_account'))
+        if account is not None:
+            self.pool.release(account)
+        return account
+
+    def process_response(self, request, response, spider):
+        account = self._take_account(request)
+        if account is None:
+            return response
+        outcome, reason = classify_response(response, self.soft_status, self.hard_status)
+        if reason in ('login_redirect', 'login_required'):
+            if self.pool.record_expired(account):
+                self._inc_stat('expired')
+                spider.logger.warning(f"账号 {account.name} 会话失效 ({reason})，隔离至状态文件 {account.path} 被重新生成。")
+        elif reason == 'ok_0':
+            if self.pool.record_throttle(account):
+                self._inc_stat('quarantined')
+                spider.logger.warning(f"账号 {account.name} 连续 {account.consecutive_throttles} 次 ok:0，"
+                                      f"隔离 {self.pool.quarantine:.0f} 秒。")
+        else:
+            if outcome == SUCCESS:
+                self.pool.record_success(account)
+            # 414/429/418 是 IP 层面的限流，由 RateControlMiddleware 处理
+            return response
+        retries = request.meta.get('weibo_account_retries', 0)
+        if request.meta.get('dont_retry') or retries >= self.max_retries:
+            return response
+        self._inc_stat('retried')
+        retry = request.replace(dont_filter=True)
+        retry.meta['weibo_account_retries'] = retries + 1
+        retry.meta.pop('proxy', None)
+        retry.meta.pop('download_latency', None)
+        return retry
+
+    def process_exception(self, request, exception, spider):
+        self._take_account(request)
+        return None
+
+    def spider_closed(self, spider):
+        health = self.pool.snapshot()
+        if self.stats:
+            self.stats.set_value('weibo/accounts/health', health)
+        for name, info in health.items():
+            spider.logger.info(f"账号 {name}: {info}")
+
+
+class ContextPoolMiddleware:
+    """
+    浏览器请求 (meta['weibo_context_pool']) 在真正下载前才从爬虫的 BrowserContextPool 领取上下文槽位与热页面，
+    在调度器中排队、被去重丢弃或仍在限速等待的请求都不占槽位。须排在 RateControlMiddleware (720) 之后。
+    下载出错时立即归还槽位并关闭页面，重试的请求重新领取；正常响应由爬虫回调 / errback 归还。
+    爬虫关闭时调用 BrowserContextPool.close() 关闭热页面与尚未关闭的旧代上下文。
+    """
     @classmethod
     def from_crawler(cls, crawler):
-        proxy_list = crawler.settings.getlist('PROXY_LIST')
-        proxy_enabled = crawler.settings.getbool('PROXY_ENABLED', True) # 从settings读取是否启用代理, 默认True
-        #     raise NotConfigured("ProxyMiddleware disabled: PROXY_ENABLED is false or PROXY_LIST is not set.")
-        return cls(proxy_list, proxy_enabled)
+        middleware = cls()
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
 
     def process_request(self, request, spider):
-        if self.proxy_enabled and self.proxies:
-            proxy = random.choice(self.proxies)
-            request.meta['proxy'] = proxy
-            spider.logger.debug(f"正在使用代理: {proxy} 发送请求 {request.url}")
-        elif self.proxy_enabled and not self.proxies:
-            spider.logger.warning(f"代理功能已启用 (PROXY_ENABLED=True)，但 PROXY_LIST 为空。请求将不通过代理发送: {request.url}")
-        
+        pool = getattr(spider, 'context_pool', None)
+        if pool is None or not request.meta.get('weibo_context_pool') or 'weibo_pool_slot' in request.meta:
+            return None
+        pool.acquire(request.meta)
+        return None
+
+    async def process_exception(self, request, exception, spider):
+        if 'weibo_pool_slot' in request.meta:
+            await spider.context_pool.release(request.meta.pop('playwright_page', None), request.meta, broken=True)
+        return None
+
+    def spider_closed(self, spider):
+        pool = getattr(spider, 'context_pool', None)
+        if pool is not None:
+            return deferred_from_coro(pool.close())
+
+
 class UAMiddleware:
     def __init__(self, uas):
         self.uas = uas
@@ -37,11 +480,15 @@ class UAMiddleware:
 
 class CaptchaMiddleware:
     def __init__(self, api_key):
+        from twocaptcha import TwoCaptcha # 只在启用时导入
         self.solver = TwoCaptcha(api_key)
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings.get('TWO_CAPTCHA_KEY'))
+        api_key = crawler.settings.get('TWO_CAPTCHA_KEY')
+        if not api_key:
+            raise NotConfigured("未设置 TWO_CAPTCHA_KEY")
+        return cls(api_key)
 
     def process_response(self, request, response, spider):
         if b'captcha' in response.body.lower():
@@ -0,0 +1,99 @@
+class KeywordCursor:
+    """单个关键词的分页游标：记录已调度页码、since_id 以及已见过的帖子 id"""
+
+    def __init__(self, keyword, base_api_url, max_pages=10, fanout=3, stop_at=None):
+        self.keyword = keyword
+        self.base_api_url = base_api_url
+        self.max_pages = max_pages
+        self.fanout = max(1, fanout)
+        self.scheduled_page = 0   # 已经发出请求的最大页码
+        self.pages_done = 0       # 已经处理完的页数
+        self.since_id = None
+        self.exhausted = False
+        self.seen_ids = set()
+        self.stop_at = stop_at    # 上一轮见过的最新帖子 id，不比它新的帖子视为旧帖
+        self.newest_id = None     # 本轮见到的最新帖子 id
+        self.checkpoint_page = 0  # 从第 1 页起连续处理完的页数
+        self.checkpoint_since_id = None
+        self.exhausted_page = None  # 最早判定结束的页码
+        self.error_page = None      # 重试后仍然失败的最早页码，此后不再翻页
+        self._done_pages = {}       # 已处理完、尚未并入检查点的页码 -> 下一页的 since_id
+
+    def resume(self, page, since_id=None):
+        """从检查点恢复：前 page 页已处理完，since_id 为第 page + 1 页的游标"""
+        self.scheduled_page = self.pages_done = self.checkpoint_page = page
+        self.since_id = self.checkpoint_since_id = since_id
+
+    def page_url(self, page=1, since_id=None):
+        """根据页码或 since_id 拼出 getIndex 请求地址"""
+        if since_id:
+            return f"{self.base_api_url}&since_id={since_id}"
+        if page <= 1:
+            return self.base_api_url
+        return f"{self.base_api_url}&page_type=searchall&page={page}"
+
+    def _is_new(self, post_id):
+        if post_id in self.seen_ids:
+            return False
+        if self.stop_at is None:
+            return True
+        try:
+            return int(post_id) > self.stop_at
+        except ValueError:
+            return True
+
+    def observe(self, post_ids):
+        """记录一页的帖子 id，返回其中新出现的数量；空页或全是旧帖时标记为结束"""
+        self.pages_done += 1
+        new_ids = [post_id for post_id in post_ids if self._is_new(post_id)]
+        self.seen_ids.update(new_ids)
+        for post_id in new_ids:
+            if post_id.isdigit() and (self.newest_id is None or int(post_id) > self.newest_id):
+                self.newest_id = int(post_id)
+        if not post_ids or not new_ids:
+            self.exhausted = True
+        return len(new_ids)
+
+    def stop_on_error(self, page):
+        """第 page 页重试后仍然失败：停止调度后续页，但不算翻到底，检查点停在该页之前；返回是否首次出错"""
+        first = self.error_page is None
+        if first or page < self.error_page:
+            self.error_page = page
+        return first
+
+    @property
+    def stopped(self):
+        """已翻到底或因出错停止，不再调度后续页"""
+        return self.exhausted or self.error_page is not None
+
+    def mark_done(self, page, next_since_id=None, end=False):
+        """第 page 页处理完毕 (end 表示这一页判定关键词已翻到底)，推进连续检查点；返回检查点是否前进"""
+        if end:
+            self.exhausted = True
+            if self.exhausted_page is None or page < self.exhausted_page:
+                self.exhausted_page = page
+        self._done_pages[page] = next_since_id
+        advanced = False
+        while self.checkpoint_page + 1 in self._done_pages:
+            # 检查点的 since_id 取自它所在的那一页，而不是最后完成的页
+            self.checkpoint_since_id = self._done_pages.pop(self.checkpoint_page + 1)
+            self.checkpoint_page += 1
+            advanced = True
+        return advanced
+
+    @property
+    def finished(self):
+        """结束页之前的页都已处理完 (并发调度的前序页可能还在途)，或已达到最大页数"""
+        if self.checkpoint_page >= self.max_pages:
+            return True
+        return self.exhausted_page is not None and self.checkpoint_page >= self.exhausted_page
+
+    def next_pages(self, page):
+        """处理完第 page 页后，返回需要并发调度的后续页码 (最多领先 fanout 页)"""
+        if self.stopped:
+            return []
+        target = min(self.max_pages, page + self.fanout)
+        pages = list(range(self.scheduled_page + 1, target + 1))
+        if pages:
+            self.scheduled_page = pages[-1]
+        return pages
@@ -1,29 +1,305 @@
-import re
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from array import array
+from bisect import bisect_left
 import pymongo
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from twisted.internet import defer, task, threads
 from scrapy.pipelines.images import ImagesPipeline
-from scrapy import Request
-from datetime import datetime
-import jieba
-STOP_WORDS = set([
-    "的", "了", "我", "你", "他", "她", "它", "们", "是", "有", "在", "也", "都",
-    "不", "就", "吧", "吗", "呢", "啊", "哦", "嗯", "嘿", "哈", "啦", "咯", "啧",
-    "唰", "哼", "吁", "唉", "呀", "おい", "この", "あの", "その", "どの", "ここ",
-    "そこ", "あそこ", "どこ", "これ", "それ", "あれ", "どれ", "!", "\"", "#",
-    "$", "%", "&", "'", "(", ")", "*", "+", ",", "-", ".", "/", ":", ";", "<",
-    "=", ">", "?", "@", "[", "\\", "]", "^", "_", "`", "{", "|", "}", "~", "、",
-    "。", "〈", "〉", "《", "》", "「", "」", "『", "』", "【", "】", "〔", "〕",
-    "〖", "〗", "〘", "〙", "〚", "〛", "〜", "〝", "〞", "〟", "–", "—", "‘", "’",
-    "“", "”", "…", "❞", "❝", " specialty", " ", "　"
-])
-class DataCleaningPipeline:
+from scrapy import Request, signals
+from scrapy.http.request import NO_CALLBACK
+from scrapy.settings import Settings
+from scrapy.exceptions import DropItem, NotConfigured
+from scrapy.utils.conf import build_component_list
+from scrapy.utils.misc import load_object
+from .dateparse import normalize_date
+from .images import ImageIndex, canonical_image_url, make_thumbnails
+from .metrics import get_metrics
+from .segmentation import clean_text, init_worker, load_dictionary, segment, segment_batch
+
+# MongoPipeline 发出的写入结果信号，参数 post_ids
+posts_stored = object()
+posts_store_failed = object()
+
+class SeenPostIds:
+    """紧凑的已见帖子 id 集合：启动时载入的 id 存成有序 int64 数组，运行中新增的 id 放在小集合里"""
+    def __init__(self, seed_ids=()):
+        self._sorted = array('q')
+        self._others = set()
+        self._recent = set()
+        for post_id in seed_ids:
+            post_id = str(post_id)
+            if post_id.isdigit():
+                self._sorted.append(int(post_id))
+            else:
+                self._others.add(post_id)
+        self._sorted = array('q', sorted(set(self._sorted)))
+
+    def __len__(self):
+        return len(self._sorted) + len(self._others) + len(self._recent)
+
+    def __contains__(self, post_id):
+        post_id = str(post_id)
+        if not post_id.isdigit():
+            return post_id in self._others
+        value = int(post_id)
+        pos = bisect_left(self._sorted, value)
+        return (pos < len(self._sorted) and self._sorted[pos] == value) or value in self._recent
+
+    def add(self, post_id):
+        """加入 post_id，已存在时返回 False"""
+        post_id = str(post_id)
+        if not post_id.isdigit():
+            if post_id in self._others:
+                return False
+            self._others.add(post_id)
+            return True
+        value = int(post_id)
+        pos = bisect_left(self._sorted, value)
+        if pos < len(self._sorted) and self._sorted[pos] == value:
+            return False
+        if value in self._recent:
+            return False
+        self._recent.add(value)
+        return True
+
+class DuplicatesPipeline:
+    """
+    在清洗/分词与写库之前按 post_id 丢弃重复帖子，已见集合可由 MongoDB 中已有 id 预热。
+    帖子确认写入 (启用 MongoPipeline 时等它的写入确认，否则以走完全部管道为准) 后才记入已见集合；
+    在此之前同一 post_id 的其他副本也会被丢弃，但写入失败或在后续管道被丢弃时会被放行，之后再遇到可以重新抓取。
+    """
+    def __init__(self, mongo_uri, mongo_db, seed_from_mongo=True, stats=None):
+        self.mongo_uri = mongo_uri
+        self.mongo_db = mongo_db
+        self.seed_from_mongo = seed_from_mongo
+        self.stats = stats
+        self.seen = SeenPostIds()
+        self.pending = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(
+            mongo_uri=crawler.settings.get('MONGO_URI'),
+            mongo_db=crawler.settings.get('MONGO_DATABASE', 'items'),
+            seed_from_mongo=crawler.settings.getbool('DEDUP_SEED_FROM_MONGO', True),
+            stats=crawler.stats,
+        )
+        pipelines = build_component_list(crawler.settings.getwithbase('ITEM_PIPELINES'))
+        if any(issubclass(load_object(path), MongoPipeline) for path in pipelines):
+            crawler.signals.connect(pipeline.posts_stored, signal=posts_stored)
+            crawler.signals.connect(pipeline.posts_store_failed, signal=posts_store_failed)
+        else:
+            crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.item_discarded, signal=signals.item_dropped)
+        crawler.signals.connect(pipeline.item_discarded, signal=signals.item_error)
+        return pipeline
+
+    def open_spider(self, spider):
+        if not self.seed_from_mongo:
+            return
+        try:
+            client = pymongo.MongoClient(self.mongo_uri)
+            cursor = client[self.mongo_db].posts.find(
+                {'post_id': {'$type': 'string'}}, {'post_id': 1, '_id': 0}, batch_size=10000)
+            self.seen = SeenPostIds(doc['post_id'] for doc in cursor)
+            client.close()
+        except PyMongoError as e:
+            spider.logger.warning(f"从 MongoDB 预热已见帖子集合失败: {e}")
+            return
+        if self.stats:
+            self.stats.set_value('dedup/seeded', len(self.seen))
+        spider.logger.info(f"已从 MongoDB 载入 {len(self.seen)} 个已见帖子 id。")
+
     def process_item(self, item, spider):
+        post_id = item.get('post_id')
+        if not post_id:
+            return item
+        post_id = str(post_id)
+        if post_id in self.pending or post_id in self.seen:
+            if self.stats:
+                self.stats.inc_value('dedup/dropped')
+            raise DropItem(f"重复帖子: {post_id}")
+        self.pending[post_id] = item
+        return item
+
+    def posts_stored(self, post_ids):
+        for post_id in post_ids:
+            self.pending.pop(post_id, None)
+            self.seen.add(post_id)
+
+    def posts_store_failed(self, post_ids):
+        released = sum(1 for post_id in post_ids if self.pending.pop(post_id, None) is not None)
+        if self.stats and released:
+            self.stats.inc_value('dedup/released', released)
+
+    def item_scraped(self, item):
+        post_id = item.get('post_id')
+        if post_id:
+            self.posts_stored([str(post_id)])
+
+    def item_discarded(self, item):
+        """在后续管道被丢弃或出错的帖子 (不是本管道丢弃的重复副本) 不记为已见"""
+        post_id = item.get('post_id')
+        if post_id and self.pending.get(str(post_id)) is item:
+            self.posts_store_failed([str(post_id)])
+
+class DataCleaningPipeline:
+    """
+    文本清洗 + 分词。SEGMENTATION_WORKERS > 0 时分词在进程池中按批执行，结果异步合并回 Item；
+    相同清洗文本的分词结果保存在有界 LRU 缓存中，转发帖不会重复分词。
+    启动时从预编译缓存载入 jieba 词典 (见 segmentation.py)；worker 由 forkserver 启动 (不 fork 运行着 reactor 与
+    线程池的爬虫进程)，各自在 init_worker 中从同一缓存载入一次。
+    """
+    def __init__(self, workers=0, batch_size=64, batch_delay=0.05, cache_size=10000, stats=None, metrics=None,
+                 dict_cache_dir=None, user_dicts=(), stopwords_path=None):
+        self.workers = workers
+        self.dictionary_options = (dict_cache_dir, tuple(user_dicts), stopwords_path)
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+        self.cache_size = cache_size
+        self.stats = stats
+        self.executor = None
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._batch = []
+        self._flush_handle = None
+        self.metrics = metrics
+        if metrics:
+            metrics.register_gauge('segmentation_in_flight', lambda: len(self._in_flight))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        workers = crawler.settings.get('SEGMENTATION_WORKERS')
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)
+        return cls(
+            workers=int(workers),
+            batch_size=crawler.settings.getint('SEGMENTATION_BATCH_SIZE', 64),
+            batch_delay=crawler.settings.getfloat('SEGMENTATION_BATCH_DELAY', 0.05),
+            cache_size=crawler.settings.getint('SEGMENTATION_CACHE_SIZE', 10000),
+            stats=crawler.stats,
+            metrics=get_metrics(crawler),
+            dict_cache_dir=crawler.settings.get('SEGMENTATION_DICT_CACHE_DIR'),
+            user_dicts=crawler.settings.getlist('SEGMENTATION_USER_DICTS'),
+            stopwords_path=crawler.settings.get('SEGMENTATION_STOPWORDS_PATH'),
+        )
+
+    def open_spider(self, spider):
+        start = time.perf_counter()
+        path = load_dictionary(*self.dictionary_options)
+        spider.logger.info(f"jieba 词典已就绪，用时 {time.perf_counter() - start:.2f} 秒 ({path})")
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                initargs=self.dictionary_options,
+                                                mp_context=multiprocessing.get_context('forkserver'))
+            spider.logger.info(f"分词进程池已启动，worker 数量: {self.workers}")
+
+    def close_spider(self, spider):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self.executor is not None:
+            # 在线程中等待 worker 退出，forkserver 启动的进程退出前要释放各自的信号量
+            executor, self.executor = self.executor, None
+            return threads.deferToThread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    def _remember(self, key, words):
+        self._cache[key] = words
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _segment(self, text, spider):
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self._inc_stat('segmentation/cache_hits')
+            return list(cached)
+        self._inc_stat('segmentation/cache_misses')
+        start = time.perf_counter()
+        if self.executor is None:
+            words = segment(text)
+            self._remember(key, words)
+            self._observe('segmentation', start)
+            return list(words)
+
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._in_flight[key] = future
+            self._batch.append((key, text))
+            if len(self._batch) >= self.batch_size:
+                self._flush_batch()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_delay, self._flush_batch)
+        try:
+            words = await future
+        except Exception as e:
+            spider.logger.warning(f"分词进程池执行失败，改为在当前进程分词: {e}")
+            words = segment(text)
+        # 进程池模式下包含排队、攒批与进程间传输的时间，即 Item 在分词上实际等待的时长
+        self._observe('segmentation', start)
+        return list(words)
+
+    def _observe(self, stage, start):
+        if self.metrics:
+            self.metrics.observe(stage, time.perf_counter() - start)
+
+    def _flush_batch(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        keys = [key for key, _ in batch]
+        texts = [text for _, text in batch]
+        self._inc_stat('segmentation/batches')
+        loop = asyncio.get_running_loop()
+        try:
+            result = loop.run_in_executor(self.executor, segment_batch, texts)
+        except RuntimeError as e: # 进程池已关闭
+            self._resolve(keys, None, e)
+            return
+        result.add_done_callback(lambda fut: self._on_batch_done(keys, fut))
+
+    def _on_batch_done(self, keys, fut):
+        if fut.cancelled():
+            self._resolve(keys, None, RuntimeError("分词批次被取消"))
+        elif fut.exception() is not None:
+            self._resolve(keys, None, fut.exception())
+        else:
+            self._resolve(keys, fut.result(), None)
+
+    def _resolve(self, keys, results, error):
+        for index, key in enumerate(keys):
+            future = self._in_flight.pop(key, None)
+            if future is None or future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                self._remember(key, results[index])
+                future.set_result(results[index])
+
+    async def process_item(self, item, spider):
         if 'text' in item and item['text']:
-            text = re.sub(r'<[^>]+>', '', item['text'])
-            text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9\s]', '', text)
-            text = text.strip().lower()
-            seg_list = jieba.cut(text, cut_all=False)
-            processed_words = [word for word in seg_list if word not in STOP_WORDS and len(word.strip()) > 0]
-            item['segmented_text'] = processed_words
+            text = clean_text(item['text'])
+            item['segmented_text'] = await self._segment(text, spider)
             item['text'] = text
         else:
             item['segmented_text'] = []
@@ -31,40 +307,181 @@ class DataCleaningPipeline:
 
         if 'date' in item and item['date']:
             raw_date_str = item['date']
-            parsed_date = None
-            try:
-                if "今天" in raw_date_str:
-                    time_str = raw_date_str.split(" ")[1]
-                    parsed_date = datetime.strptime(f"{datetime.now().strftime('%Y-%m-%d')} {time_str}", '%Y-%m-%d %H:%M')
-                elif "分钟前" in raw_date_str:
-                    minutes_ago = int(re.findall(r'(\d+)分钟前', raw_date_str)[0])
-                    parsed_date = datetime.now() - datetime.timedelta(minutes=minutes_ago)
-                elif "小时前" in raw_date_str:
-                    hours_ago = int(re.findall(r'(\d+)小时前', raw_date_str)[0])
-                    parsed_date = datetime.now() - datetime.timedelta(hours=hours_ago)
-                elif "月" in raw_date_str and "日" in raw_date_str and ":" in raw_date_str: 
-                    current_year = datetime.now().year
-                    parsed_date = datetime.strptime(f"{current_year}年{raw_date_str}", '%Y年%m月%d日 %H:%M')
-                elif re.match(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', raw_date_str):
-                    parsed_date = datetime.strptime(raw_date_str, '%Y-%m-%d %H:%M:%S')
-                elif re.match(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}', raw_date_str):
-                    parsed_date = datetime.strptime(raw_date_str, '%Y-%m-%d %H:%M')
-                item['date'] = parsed_date.isoformat() if parsed_date else raw_date_str 
-            except Exception as e:
-                spider.logger.warning(f"日期解析失败: {raw_date_str}, 错误: {e}")
+            parsed_date = normalize_date(raw_date_str, now=item.get('fetched_at'))
+            if parsed_date is None:
+                spider.logger.warning(f"日期解析失败: {raw_date_str}")
                 item['date'] = raw_date_str
+            else:
+                item['date'] = parsed_date
         else:
             item['date'] = None
 
         return item
 
 class WeiboImagesPipeline(ImagesPipeline):
+    """
+    内容寻址的图片存储：
+      - 图片 URL 先规范化为同一尺寸 (IMAGES_CANONICAL_SIZE)，同一张图的缩略图/中图/大图只下载一次；
+      - 规范 URL -> 内容哈希的持久索引 (IMAGES_INDEX_PATH)，已入库的图片不再请求；
+        文件以原始字节的 SHA1 命名，不同 URL 的相同内容只存一份；
+      - 每次抓取的图片字节预算 (IMAGES_MAX_BYTES) 与并发下载上限 (IMAGES_MAX_CONCURRENCY)，避免挤占 API 请求；
+      - IMAGES_THUMBS_WORKERS > 0 时缩略图在进程池中生成，不阻塞 reactor。
+    """
+    def __init__(self, store_uri, download_func=None, settings=None, *, crawler=None):
+        super().__init__(store_uri, download_func=download_func, settings=settings, crawler=crawler)
+        settings = crawler.settings if crawler is not None else Settings(settings)
+        self.stats = crawler.stats if crawler is not None else None
+        self.canonical_size = settings.get('IMAGES_CANONICAL_SIZE', 'large')
+        self.variant_hosts = tuple(settings.getlist('IMAGES_SIZE_VARIANT_HOSTS', ['sinaimg.cn']))
+        index_path = settings.get('IMAGES_INDEX_PATH')
+        if not index_path:
+            store = str(store_uri)
+            local = '://' not in store or store.startswith('file://')
+            index_path = (os.path.join(store.replace('file://', '', 1), 'index.sqlite3') if local
+                          else 'images_index.sqlite3')
+        self.index = ImageIndex(index_path)
+        self.max_bytes = settings.getint('IMAGES_MAX_BYTES', 0)
+        self.max_image_bytes = settings.getint('IMAGES_MAX_IMAGE_BYTES', 10 * 1024 * 1024)
+        self.download_slots = defer.DeferredSemaphore(max(1, settings.getint('IMAGES_MAX_CONCURRENCY', 2)))
+        self.thumb_workers = settings.getint('IMAGES_THUMBS_WORKERS', 0)
+        self.executor = None
+        self.bytes_downloaded = 0
+        self._pending_thumbs = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get('IMAGES_STORE'):
+            raise NotConfigured("未设置 IMAGES_STORE")
+        return super().from_crawler(crawler)
+
+    def open_spider(self, spider):
+        super().open_spider(spider)
+        self.index.open()
+        spider.logger.info(f"图片索引 {self.index.path} 已载入 {len(self.index)} 条记录。")
+        if self.thumbs and self.thumb_workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.thumb_workers,
+                                                mp_context=multiprocessing.get_context('forkserver'))
+
+    def close_spider(self, spider):
+        d = defer.DeferredList(list(self._pending_thumbs))
+        d.addBoth(lambda _: self._close(spider))
+        return d
+
+    def _close(self, spider):
+        self.index.close()
+        spider.logger.info(f"本次抓取下载图片 {self.bytes_downloaded / 1024 ** 2:.1f} MB，索引共 {len(self.index)} 条。")
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            return threads.deferToThread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
     def get_media_requests(self, item, info):
-        if 'image_urls' in item:
-            for image_url in item.get('image_urls', []):
-                if image_url.startswith('//'):
-                    image_url = 'http:' + image_url
-                yield Request(image_url)
+        urls = []
+        for image_url in item.get('image_urls') or []:
+            if image_url.startswith('//'):
+                image_url = 'http:' + image_url
+            image_url = canonical_image_url(image_url, self.canonical_size, self.variant_hosts)
+            if image_url not in urls:
+                urls.append(image_url)
+        if self.max_bytes and self.bytes_downloaded >= self.max_bytes:
+            # 字节预算已用尽：已入库的图片照常引用，其余不再下载
+            known = [url for url in urls if self.index.get(url)]
+            self._inc_stat('images/budget_skipped', len(urls) - len(known))
+            urls = known
+        return [Request(url, callback=NO_CALLBACK,
+                        meta={'weibo_stage': 'image_download', 'download_maxsize': self.max_image_bytes})
+                for url in urls]
+
+    def media_to_download(self, request, info, *, item=None):
+        """索引命中时直接返回已存储的结果；否则占用一个下载名额后再下载"""
+        entry = self.index.get(request.url)
+        if entry is not None:
+            checksum, path = entry
+            self._inc_stat('images/index_hits')
+            return {'url': request.url, 'path': path, 'checksum': checksum, 'status': 'indexed'}
+        return self.download_slots.acquire().addCallback(self._slot_acquired, request)
+
+    def _slot_acquired(self, _, request):
+        request.meta['weibo_image_slot'] = True
+        return None  # None 表示需要下载
+
+    def _release_slot(self, request):
+        # media_downloaded 抛出的异常还会进入 media_failed，名额只能归还一次
+        if request.meta.pop('weibo_image_slot', False):
+            self.download_slots.release()
+
+    def media_failed(self, failure, request, info):
+        self._release_slot(request)
+        return super().media_failed(failure, request, info)
+
+    def media_downloaded(self, response, request, info, *, item=None):
+        self._release_slot(request)
+        self.bytes_downloaded += len(response.body)
+        self._inc_stat('images/bytes', len(response.body))
+        result = super().media_downloaded(response, request, info, item=item)
+        self.index.add(request.url, result['checksum'], result['path'], len(response.body))
+        return result
+
+    def _content_hash(self, request, response):
+        checksum = request.meta.get('weibo_image_sha1')
+        if checksum is None:
+            checksum = request.meta['weibo_image_sha1'] = hashlib.sha1(response.body).hexdigest()
+        return checksum
+
+    def file_path(self, request, response=None, info=None, *, item=None):
+        if response is not None:
+            return f"full/{self._content_hash(request, response)}.jpg"
+        entry = self.index.get(request.url)
+        if entry is not None:
+            return entry[1]
+        return super().file_path(request, response=response, info=info, item=item)
+
+    def thumb_path(self, request, thumb_id, response=None, info=None, *, item=None):
+        if response is not None:
+            return f"thumbs/{thumb_id}/{self._content_hash(request, response)}.jpg"
+        return super().thumb_path(request, thumb_id, response=response, info=info, item=item)
+
+    def image_downloaded(self, response, request, info, *, item=None):
+        """相同内容已经存过 (其他 URL) 时不再转码写入；返回原始字节的 SHA1"""
+        checksum = self._content_hash(request, response)
+        if self.index.path_for_content(checksum) is not None:
+            self._inc_stat('images/content_dedup')
+            return checksum
+        for path, image, buf in self.get_images(response, request, info, item=item):
+            width, height = image.size
+            self.store.persist_file(path, buf, info, meta={'width': width, 'height': height},
+                                    headers={'Content-Type': 'image/jpeg'})
+        return checksum
+
+    def get_images(self, response, request, info, *, item=None):
+        images = super().get_images(response, request, info, item=item)
+        if self.executor is None:
+            yield from images
+            return
+        # 原图照常在当前进程转存，缩略图交给进程池
+        yield next(images)
+        images.close()
+        self._schedule_thumbnails(response, request, info, item)
+
+    def _schedule_thumbnails(self, response, request, info, item):
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, make_thumbnails, response.body, dict(self.thumbs))
+        d = defer.Deferred.fromFuture(future)
+        d.addCallback(self._persist_thumbnails, response, request, info, item)
+        d.addErrback(lambda failure: info.spider.logger.warning(
+            f"生成缩略图失败 {request.url}: {failure.getErrorMessage()}"))
+        self._pending_thumbs.add(d)
+        d.addBoth(lambda _: self._pending_thumbs.discard(d))
+
+    def _persist_thumbnails(self, thumbnails, response, request, info, item):
+        for thumb_id, data, width, height in thumbnails:
+            path = self.thumb_path(request, thumb_id, response=response, info=info, item=item)
+            self.store.persist_file(path, BytesIO(data), info, meta={'width': width, 'height': height},
+                                    headers={'Content-Type': 'image/jpeg'})
+        self._inc_stat('images/thumbnails', len(thumbnails))
 
     def item_completed(self, results, item, info):
         image_paths = [x['path'] for ok, x in results if ok]
@@ -73,41 +490,195 @@ class WeiboImagesPipeline(ImagesPipeline):
         return item
 
 class MongoPipeline:
-    def __init__(self, mongo_uri, mongo_db):
+    """
+    写后缓冲的 MongoDB 管道：Item 先进入内存缓冲，按数量 (MONGO_BULK_SIZE) 或时间 (MONGO_FLUSH_INTERVAL)
+    组成 bulk_write 批次，在线程池中写入，避免阻塞 reactor 线程。
+    在途批次达到 MONGO_MAX_PENDING_BATCHES 时不再发起新的写入，Item 留在缓冲中；缓冲攒满一批后
+    process_item 返回 Deferred 形成背压，直到有批次写完、空出的位置把缓冲写出去。
+    每个批次写完后按 post_id 发出 posts_stored / posts_store_failed 信号，DuplicatesPipeline 据此更新已见集合。
+    """
+    def __init__(self, mongo_uri, mongo_db, bulk_size=500, flush_interval=2.0, max_pending_batches=4, stats=None,
+                 metrics=None, signal_manager=None):
         self.mongo_uri = mongo_uri
         self.mongo_db = mongo_db
+        self.bulk_size = max(1, bulk_size)
+        self.flush_interval = flush_interval
+        self.max_pending_batches = max(1, max_pending_batches)
+        self.stats = stats
+        self.signal_manager = signal_manager
         self.client = None
         self.db = None
+        self._buffer = []
+        self._buffer_ids = []
+        self._buffer_started = None
+        self._in_flight = 0
+        self._pending = set()
+        self._waiters = []
+        self._flush_loop = None
+        self.metrics = metrics
+        if metrics:
+            metrics.register_gauge('mongo_buffered_items', lambda: len(self._buffer))
+            metrics.register_gauge('mongo_pending_batches', lambda: self._in_flight)
+            metrics.register_gauge('mongo_backpressure_waiters', lambda: len(self._waiters))
 
     @classmethod
     def from_crawler(cls, crawler):
         return cls(
             mongo_uri=crawler.settings.get('MONGO_URI'),
-            mongo_db=crawler.settings.get('MONGO_DATABASE', 'items')
+            mongo_db=crawler.settings.get('MONGO_DATABASE', 'items'),
+            bulk_size=crawler.settings.getint('MONGO_BULK_SIZE', 500),
+            flush_interval=crawler.settings.getfloat('MONGO_FLUSH_INTERVAL', 2.0),
+            max_pending_batches=crawler.settings.getint('MONGO_MAX_PENDING_BATCHES', 4),
+            stats=crawler.stats,
+            metrics=get_metrics(crawler),
+            signal_manager=crawler.signals,
         )
 
     def open_spider(self, spider):
         self.client = pymongo.MongoClient(self.mongo_uri)
         self.db = self.client[self.mongo_db]
+        try:
+            self.db.posts.create_index(
+                'post_id', unique=True, name='post_id_unique',
+                partialFilterExpression={'post_id': {'$type': 'string'}})
+            self.db.posts.create_index('date', name='date')
+        except PyMongoError as e:
+            spider.logger.warning(f"Could not create unique index on posts.post_id: {e}")
+        if self.flush_interval > 0:
+            self._flush_loop = task.LoopingCall(self._flush_if_stale, spider)
+            self._flush_loop.start(self.flush_interval, now=False)
         spider.logger.info("MongoDB connection opened.")
 
     def close_spider(self, spider):
+        if self._flush_loop and self._flush_loop.running:
+            self._flush_loop.stop()
+        # 收尾时不受在途批次数限制，把缓冲 (含等待中的 Item) 全部写出
+        while self._buffer:
+            self._flush(spider)
+        d = defer.DeferredList(list(self._pending))
+        d.addBoth(lambda _: self._close_client(spider))
+        return d
+
+    def _close_client(self, spider):
+        self._release_waiters()
         if self.client:
             self.client.close()
             spider.logger.info("MongoDB connection closed.")
 
     def process_item(self, item, spider):
+        self._buffer.append(self._to_operation(item))
+        self._buffer_ids.append(str(item['post_id']) if item.get('post_id') else None)
+        if self._buffer_started is None:
+            self._buffer_started = time.monotonic()
+        if len(self._buffer) >= self.bulk_size and self._has_slot():
+            self._flush(spider)
+        if len(self._buffer) >= self.bulk_size:
+            # 在途批次已满且缓冲已攒满一批：Item 留在缓冲中，等空出位置写出后再放行
+            self._inc_stat('mongo/bulk/backpressure_waits')
+            waiter = defer.Deferred()
+            waiter.addCallback(lambda _: item)
+            self._waiters.append(waiter)
+            return waiter
+        return item
+
+    def _to_operation(self, item):
+        if item.get('post_id'):
+            return UpdateOne({'post_id': item['post_id']}, {'$set': dict(item)}, upsert=True)
+        if 'post_url' in item and item['post_url']:
+            return UpdateOne({'post_url': item['post_url']}, {'$set': dict(item)}, upsert=True)
+        return InsertOne(dict(item))
+
+    def _has_slot(self):
+        return self._in_flight < self.max_pending_batches
+
+    def _is_stale(self):
+        return self._buffer_started is not None and time.monotonic() - self._buffer_started >= self.flush_interval
+
+    def _flush_if_stale(self, spider):
+        if self._is_stale() and self._has_slot():
+            self._flush(spider)
+
+    def _flush(self, spider):
+        """把缓冲中最早的至多 bulk_size 条组成一个批次交给线程池"""
+        if not self._buffer:
+            return None
+        operations, self._buffer = self._buffer[:self.bulk_size], self._buffer[self.bulk_size:]
+        post_ids, self._buffer_ids = self._buffer_ids[:self.bulk_size], self._buffer_ids[self.bulk_size:]
+        self._buffer_started = time.monotonic() if self._buffer else None
+        self._in_flight += 1
+        d = threads.deferToThread(self._write_batch, operations)
+        d.addCallback(self._on_batch_written, post_ids, spider)
+        d.addErrback(self._on_batch_failed, post_ids, spider)
+        d.addBoth(self._on_batch_finished, d, spider)
+        self._pending.add(d)
+        return d
+
+    def _write_batch(self, operations):
+        """在线程池中执行 bulk_write，返回 (耗时秒数, 失败条数, 错误信息, 未写入的操作下标, 重复键条数)"""
+        start = time.perf_counter()
+        message, failed, duplicates = None, [], 0
         try:
-            if 'post_url' in item and item['post_url']:
-                self.db.posts.update_one(
-                    {'post_url': item['post_url']},
-                    {'$set': dict(item)},
-                    upsert=True
-                )
-                spider.logger.debug(f"Upserted item to MongoDB with post_url: {item['post_url']}")
-            else:
-                self.db.posts.insert_one(dict(item))
-                spider.logger.debug("Inserted item to MongoDB (no post_url).")
-        except Exception as e:
-            spider.logger.error(f"Error inserting item to MongoDB: {e}")
-        return item
\ No newline at end of file
+            self.db.posts.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            # 11000: 并发 upsert 撞上唯一索引，文档已经存在，不算写入失败
+            rejected = [error for error in write_errors if error.get('code') != 11000]
+            duplicates = len(write_errors) - len(rejected)
+            failed = [error['index'] for error in rejected]
+            message = rejected[0].get('errmsg') if rejected else None
+        except PyMongoError as e:
+            message = str(e)
+            failed = list(range(len(operations)))
+        return time.perf_counter() - start, len(failed), message, failed, duplicates
+
+    def _on_batch_written(self, result, post_ids, spider):
+        latency, errors, message, failed, duplicates = result
+        count = len(post_ids)
+        failed = set(failed)
+        self._send_signal(posts_stored, [post_id for index, post_id in enumerate(post_ids)
+                                         if post_id and index not in failed])
+        self._send_signal(posts_store_failed, [post_ids[index] for index in sorted(failed) if post_ids[index]])
+        latency_ms = latency * 1000
+        if self.metrics:
+            self.metrics.observe('mongo_bulk_write', latency)
+        self._inc_stat('mongo/bulk/batches')
+        self._inc_stat('mongo/bulk/items', count - errors)
+        self._inc_stat('mongo/bulk/latency_ms_total', latency_ms)
+        if self.stats:
+            self.stats.max_value('mongo/bulk/latency_ms_max', latency_ms)
+            self.stats.set_value('mongo/bulk/latency_ms_last', latency_ms)
+        if duplicates:
+            self._inc_stat('mongo/bulk/duplicate_keys', duplicates)
+        if errors:
+            self._inc_stat('mongo/bulk/errors', errors)
+            spider.logger.error(f"Error writing {errors}/{count} items to MongoDB: {message}")
+        else:
+            spider.logger.debug(f"Bulk wrote {count} items to MongoDB in {latency_ms:.1f} ms.")
+
+    def _on_batch_failed(self, failure, post_ids, spider):
+        self._send_signal(posts_store_failed, [post_id for post_id in post_ids if post_id])
+        self._inc_stat('mongo/bulk/errors', len(post_ids))
+        spider.logger.error(f"Error inserting items to MongoDB: {failure.getErrorMessage()}")
+
+    def _send_signal(self, signal, post_ids):
+        if self.signal_manager is not None and post_ids:
+            self.signal_manager.send_catch_log(signal=signal, post_ids=post_ids)
+
+    def _on_batch_finished(self, result, d, spider):
+        self._in_flight -= 1
+        self._pending.discard(d)
+        # 空出的位置先留给缓冲中已攒满 (或已超时) 的批次，缓冲不满一批后再放行等待中的 Item
+        if len(self._buffer) >= self.bulk_size or (self.flush_interval > 0 and self._is_stale()):
+            self._flush(spider)
+        if len(self._buffer) < self.bulk_size:
+            self._release_waiters()
+        return result
+
+    def _release_waiters(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter.callback(None)
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
@@ -0,0 +1,145 @@
+"""
+带健康评分的代理池。
+
+每个代理维护下载延迟与成功率的指数滑动平均 (EWMA)，按 成功率² / 延迟 / (1 + 在途请求数) 加权随机选取；
+连续失败达到阈值或遇到封禁信号 (403/418、验证码页、登录重定向) 时熔断，冷却期随连续熔断次数翻倍，
+冷却结束后只放行一个探测请求，探测成功即恢复。
+"""
+import random
+import time
+from urllib.parse import urlsplit
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+MIN_SUCCESS = 0.05
+MIN_LATENCY = 0.01
+
+
+def proxy_label(url):
+    """去掉认证信息的 host:port，用于日志与 stats"""
+    parts = urlsplit(url if '://' in url else f'http://{url}')
+    if not parts.hostname:
+        return url
+    return f"{parts.hostname}:{parts.port}" if parts.port else parts.hostname
+
+
+class ProxyState:
+    __slots__ = ('url', 'label', 'latency', 'success', 'in_flight', 'requests', 'failures', 'bans',
+                 'consecutive_failures', 'trips', 'cooldown_until')
+
+    def __init__(self, url):
+        self.url = url
+        self.label = proxy_label(url)
+        self.latency = None
+        self.success = 1.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.bans = 0
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.cooldown_until = 0.0
+
+    def state(self, now):
+        if not self.trips:
+            return CLOSED
+        return OPEN if now < self.cooldown_until else HALF_OPEN
+
+
+class ProxyPool:
+    def __init__(self, proxies, alpha=0.3, failure_threshold=3, cooldown=30.0, max_cooldown=600.0,
+                 default_latency=1.0, rng=None, clock=time.monotonic):
+        self.proxies = [ProxyState(url) for url in dict.fromkeys(proxies)]
+        self.alpha = alpha
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.default_latency = default_latency
+        self.rng = rng or random.Random()
+        self.clock = clock
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def weight(self, proxy):
+        latency = proxy.latency if proxy.latency is not None else self.default_latency
+        return max(proxy.success, MIN_SUCCESS) ** 2 / max(latency, MIN_LATENCY) / (1 + proxy.in_flight)
+
+    def choose(self, exclude=()):
+        """
+        按健康度加权选取一个可用代理；熔断中的代理不参与，半开的代理同一时间只放行一个探测请求。
+        排除 exclude 后没有可用代理时忽略 exclude；全部在冷却时返回最早恢复的代理，第二个返回值为 False。
+        """
+        now = self.clock()
+        for excluded in (exclude, ()):
+            candidates = [proxy for proxy in self.proxies
+                          if proxy.url not in excluded and (not proxy.trips or
+                                                             (now >= proxy.cooldown_until and not proxy.in_flight))]
+            if candidates:
+                weights = [self.weight(proxy) for proxy in candidates]
+                return self.rng.choices(candidates, weights)[0], True
+            if not exclude:
+                break
+        if not self.proxies:
+            return None, False
+        return min(self.proxies, key=lambda proxy: proxy.cooldown_until), False
+
+    def acquire(self, proxy):
+        proxy.in_flight += 1
+        proxy.requests += 1
+
+    def release(self, proxy):
+        proxy.in_flight = max(0, proxy.in_flight - 1)
+
+    def _observe_latency(self, proxy, latency):
+        if latency is None:
+            return
+        proxy.latency = latency if proxy.latency is None else (1 - self.alpha) * proxy.latency + self.alpha * latency
+
+    def record_success(self, proxy, latency=None):
+        self._observe_latency(proxy, latency)
+        proxy.success = (1 - self.alpha) * proxy.success + self.alpha
+        proxy.consecutive_failures = 0
+        proxy.trips = 0
+
+    def record_failure(self, proxy, latency=None, ban=False):
+        """记录一次失败；返回本次触发熔断的冷却秒数，未熔断时返回 None"""
+        self._observe_latency(proxy, latency)
+        proxy.success = (1 - self.alpha) * proxy.success
+        proxy.failures += 1
+        proxy.consecutive_failures += 1
+        if ban:
+            proxy.bans += 1
+        # 封禁信号与半开探测失败立即熔断，普通失败累计到阈值才熔断
+        if ban or proxy.trips or proxy.consecutive_failures >= self.failure_threshold:
+            return self._trip(proxy)
+        return None
+
+    def _trip(self, proxy):
+        proxy.trips += 1
+        proxy.consecutive_failures = 0
+        cooldown = min(self.max_cooldown, self.cooldown * 2 ** (proxy.trips - 1))
+        proxy.cooldown_until = self.clock() + cooldown
+        return cooldown
+
+    def counts(self):
+        now = self.clock()
+        counts = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+        for proxy in self.proxies:
+            counts[proxy.state(now)] += 1
+        return counts
+
+    def snapshot(self):
+        """每个代理的健康状况，键为不含认证信息的 host:port"""
+        now = self.clock()
+        return {
+            proxy.label: {
+                'state': proxy.state(now),
+                'success_rate': round(proxy.success, 3),
+                'latency_ms': round(proxy.latency * 1000, 1) if proxy.latency is not None else None,
+                'requests': proxy.requests,
+                'failures': proxy.failures,
+                'bans': proxy.bans,
+                'trips': proxy.trips,
+            }
+            for proxy in self.proxies
+        }
@@ -0,0 +1,140 @@
+"""
+按会话 (账号 × 代理) 的自适应限速。
+
+每个会话一个令牌桶，速率按 AIMD 调整：成功响应使速率每秒线性增加 increase 次/秒，
+软限流 (ok:0、414/429) 时速率乘以 backoff，硬封禁 (418、登录重定向) 时同样降速并暂停该会话 ban_pause 秒，
+暂停期间该会话的请求由 RateControlMiddleware 交还调度器 (见 scheduler.py)，不再发出，也不占下载并发。
+未启用多账号 (AccountMiddleware) 时会话只按代理区分。
+"""
+import json
+import re
+import time
+
+from .auth import is_login_url
+
+SUCCESS, SOFT_THROTTLE, HARD_BAN = 'success', 'soft_throttle', 'hard_ban'
+OK_RE = re.compile(rb'"ok"\s*:\s*(-?\d+)')
+MSG_RE = re.compile(rb'"msg"\s*:\s*"((?:[^"\\]|\\.)*)"')
+# 使用多账号时归因于账号会话 (而非 IP) 的结果，由 AccountMiddleware 按账号处理
+ACCOUNT_REASONS = ('login_redirect', 'login_required', 'ok_0')
+# ok:0 但属于正常翻到底的提示，不算限流
+END_OF_RESULTS_MARKERS = ('还没有内容', '没有更多')
+
+
+def _json_message(head):
+    match = MSG_RE.search(head)
+    if not match:
+        return ''
+    try:
+        return json.loads(b'"' + match.group(1) + b'"')
+    except ValueError:
+        return match.group(1).decode('utf-8', 'ignore')
+
+
+def classify_response(response, soft_status=(414, 429), hard_status=(418,)):
+    """把响应分为 (SUCCESS / SOFT_THROTTLE / HARD_BAN, 原因)；只检查状态码、重定向目标与 JSON 开头的 ok/msg"""
+    status = response.status
+    if status in hard_status:
+        return HARD_BAN, f"status_{status}"
+    if 300 <= status < 400:
+        location = response.headers.get('Location', b'').decode('utf-8', 'ignore')
+        return (HARD_BAN, 'login_redirect') if is_login_url(location) else (SUCCESS, None)
+    if is_login_url(response.url):
+        # 浏览器请求的 response.url 是跳转后的页面地址
+        return HARD_BAN, 'login_redirect'
+    if status in soft_status:
+        return SOFT_THROTTLE, f"status_{status}"
+    if status == 200:
+        head = response.body[:512]
+        match = OK_RE.search(head)
+        if match:
+            ok = int(match.group(1))
+            if ok == -100:
+                return HARD_BAN, 'login_required'
+            if ok == 0:
+                message = _json_message(head)
+                if any(marker in message for marker in END_OF_RESULTS_MARKERS):
+                    return SUCCESS, None
+                return SOFT_THROTTLE, 'ok_0'
+    return SUCCESS, None
+
+
+class SessionBucket:
+    """单个会话的令牌桶 (按 GCRA 记录下一个可发送时刻)"""
+    __slots__ = ('key', 'rate', 'burst', 'tat', 'paused_until', 'last_decrease',
+                 'successes', 'throttles', 'bans')
+
+    def __init__(self, key, rate, burst=1):
+        self.key = key
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tat = 0.0
+        self.paused_until = 0.0
+        self.last_decrease = float('-inf')
+        self.successes = 0
+        self.throttles = 0
+        self.bans = 0
+
+    def take(self, now):
+        """
+        有令牌时取走并返回 0，否则返回距下一个令牌的秒数 (不预订)。
+        等待者醒来后重新竞争，速率变化与暂停立即对所有排队请求生效。
+        """
+        interval = 1 / self.rate
+        start = max(self.paused_until, self.tat - (self.burst - 1) * interval)
+        if start > now:
+            return start - now
+        self.tat = max(self.tat, now) + interval
+        return 0.0
+
+
+class RateController:
+    def __init__(self, start_rate=0.33, min_rate=0.05, max_rate=4.0, increase=0.02, backoff=0.5, burst=1,
+                 ban_pause=300.0, clock=time.monotonic):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.start_rate = min(max(start_rate, min_rate), self.max_rate)
+        self.increase = increase
+        self.backoff = backoff
+        self.burst = burst
+        self.ban_pause = ban_pause
+        self.clock = clock
+        self.buckets = {}
+
+    def bucket(self, key):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = SessionBucket(key, self.start_rate, self.burst)
+        return bucket
+
+    def record(self, bucket, outcome, sent_at=None):
+        """按响应分类调整会话速率，sent_at 为该请求发出的时刻；返回速率是否被下调"""
+        if outcome == SUCCESS:
+            bucket.successes += 1
+            # 每个成功响应加 increase / rate，折合每秒提速 increase 次/秒
+            bucket.rate = min(self.max_rate, bucket.rate + self.increase / bucket.rate)
+            return False
+        now = self.clock()
+        if outcome == HARD_BAN:
+            bucket.bans += 1
+            bucket.paused_until = now + self.ban_pause
+        else:
+            bucket.throttles += 1
+            # 上次降速前就已发出的请求也会陆续被限流，它们不再触发降速
+            if sent_at is not None and sent_at <= bucket.last_decrease:
+                return False
+        bucket.rate = max(self.min_rate, bucket.rate * self.backoff)
+        bucket.last_decrease = now
+        bucket.tat = now + 1 / bucket.rate
+        return True
+
+    def paused(self):
+        now = self.clock()
+        return sum(1 for bucket in self.buckets.values() if bucket.paused_until > now)
+
+    def snapshot(self):
+        return {
+            key: {'rate': round(bucket.rate, 3), 'successes': bucket.successes, 'throttles': bucket.throttles,
+                  'bans': bucket.bans}
+            for key, bucket in self.buckets.items()
+        }
@@ -0,0 +1,66 @@
+"""
+支持延后入队的调度器。
+
+带 meta['weibo_schedule_delay'] (秒) 的请求先放进内存中的定时堆，到期后再进入正常队列。RateControlMiddleware
+把需要长时间等待的请求 (会话被暂停或速率很低) 交还到这里，等待期间不占下载器的并发名额，其他会话的请求照常发出。
+延后的请求计入 len()，爬虫不会因此被判定为空闲而关闭；关闭时尚未到期的请求在设置了 JOBDIR 时随磁盘队列保存。
+"""
+import heapq
+import itertools
+import time
+
+from scrapy.core.scheduler import Scheduler
+from twisted.internet import reactor
+
+SCHEDULE_DELAY_KEY = 'weibo_schedule_delay'
+
+
+class DelayedRequestScheduler(Scheduler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._delayed = []
+        self._order = itertools.count()
+        self._timer = None
+        self._timer_due = None
+
+    def __len__(self):
+        return super().__len__() + len(self._delayed)
+
+    def enqueue_request(self, request):
+        delay = request.meta.pop(SCHEDULE_DELAY_KEY, None)
+        if not delay or delay <= 0:
+            return super().enqueue_request(request)
+        heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._order), request))
+        self.stats.inc_value('scheduler/delayed', spider=self.spider)
+        self._arm()
+        return True
+
+    def _arm(self):
+        """让定时器对准堆顶请求的到期时刻"""
+        if not self._delayed:
+            return
+        due = self._delayed[0][0]
+        if self._timer is not None and self._timer.active():
+            if self._timer_due <= due:
+                return
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer = reactor.callLater(max(0.0, due - time.monotonic()), self._release_due)
+
+    def _release_due(self):
+        self._timer = None
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, request = heapq.heappop(self._delayed)
+            # 经由 engine.crawl 重新入队，同时唤醒引擎取下一个请求
+            self.crawler.engine.crawl(request)
+        self._arm()
+
+    def close(self, reason):
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        delayed, self._delayed = self._delayed, []
+        if self.dqs is not None:
+            for _, _, request in sorted(delayed, key=lambda entry: entry[:2]):
+                self._dqpush(request)
+        return super().close(reason)
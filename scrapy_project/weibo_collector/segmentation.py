@@ -0,0 +1,140 @@
+"""
+文本清洗与 jieba 分词。
+
+jieba 在第一次用到时才导入。前缀词典连同用户词典 (SEGMENTATION_USER_DICTS) 与停用词文件
+(SEGMENTATION_STOPWORDS_PATH) 预编译成一个缓存文件：词表是一段换行分隔的文本，词频是一个 int64 数组，
+加载时直接拼回字典，不必像 jieba 自带的 marshal 缓存那样逐个反序列化对象，也不执行任何代码。
+缓存文件名由 jieba 版本与各源文件的路径、大小、修改时间决定，任一变化都会重新编译。
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from array import array
+
+STOP_WORDS = set([
+    "的", "了", "我", "你", "他", "她", "它", "们", "是", "有", "在", "也", "都",
+    "不", "就", "吧", "吗", "呢", "啊", "哦", "嗯", "嘿", "哈", "啦", "咯", "啧",
+    "唰", "哼", "吁", "唉", "呀", "おい", "この", "あの", "その", "どの", "ここ",
+    "そこ", "あそこ", "どこ", "これ", "それ", "あれ", "どれ", "!", "\"", "#",
+    "$", "%", "&", "'", "(", ")", "*", "+", ",", "-", ".", "/", ":", ";", "<",
+    "=", ">", "?", "@", "[", "\\", "]", "^", "_", "`", "{", "|", "}", "~", "、",
+    "。", "〈", "〉", "《", "》", "「", "」", "『", "』", "【", "】", "〔", "〕",
+    "〖", "〗", "〘", "〙", "〚", "〛", "〜", "〝", "〞", "〟", "–", "—", "‘", "’",
+    "“", "”", "…", "❞", "❝", " specialty", " ", "　"
+])
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+NON_TEXT_RE = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9\s]')
+
+
+def clean_text(text):
+    """去除 HTML 标签与非中英文数字字符，并转为小写"""
+    text = HTML_TAG_RE.sub('', text)
+    text = NON_TEXT_RE.sub('', text)
+    return text.strip().lower()
+
+
+def segment(text):
+    """jieba 精确模式分词并过滤停用词"""
+    import jieba
+    return [word for word in jieba.cut(text, cut_all=False) if word not in STOP_WORDS and len(word.strip()) > 0]
+
+
+DICT_CACHE_FORMAT = 1
+_loaded_dictionary = None
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return f"{os.path.abspath(path)}:missing"
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def dictionary_cache_path(cache_dir=None, user_dicts=(), stopwords_path=None):
+    import jieba
+    main_dict = jieba.dt.dictionary or os.path.join(os.path.dirname(jieba.__file__), jieba.DEFAULT_DICT_NAME)
+    sources = [str(DICT_CACHE_FORMAT), jieba.__version__, _file_signature(main_dict)]
+    sources += [_file_signature(path) for path in user_dicts]
+    if stopwords_path:
+        sources.append(_file_signature(stopwords_path))
+    key = hashlib.blake2b('\n'.join(sources).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(cache_dir or tempfile.gettempdir(), f"weibo-jieba-{key}.cache")
+
+
+def _read_stop_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def compile_dictionary(path, user_dicts=(), stopwords_path=None):
+    """在当前进程初始化 jieba、加载用户词典，把前缀词典与停用词写成缓存文件 (先写临时文件再改名)"""
+    import jieba
+    tokenizer = jieba.dt
+    tokenizer.initialize()
+    for user_dict in user_dicts:
+        tokenizer.load_userdict(user_dict)
+    stop_words = _read_stop_words(stopwords_path) if stopwords_path and os.path.exists(stopwords_path) else []
+    words = '\n'.join(tokenizer.FREQ).encode('utf-8')
+    header = {'format': DICT_CACHE_FORMAT, 'total': tokenizer.total, 'count': len(tokenizer.FREQ),
+              'words_bytes': len(words), 'tags': tokenizer.user_word_tag_tab, 'stop_words': stop_words}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.write(words)
+        f.write(array('q', tokenizer.FREQ.values()).tobytes())
+    os.replace(tmp_path, path)
+    return stop_words
+
+
+def _read_dictionary(path):
+    """读取缓存文件，返回 (header, 前缀词典)；文件不完整时抛出 ValueError"""
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != DICT_CACHE_FORMAT:
+            raise ValueError(f"词典缓存格式 {header.get('format')} 与当前版本不符")
+        words = f.read(header['words_bytes']).decode('utf-8').split('\n')
+        freqs = array('q')
+        freqs.frombytes(f.read())
+    if len(words) != header['count'] or len(freqs) != header['count']:
+        raise ValueError("词典缓存文件不完整")
+    return header, dict(zip(words, freqs))
+
+
+def load_dictionary(cache_dir=None, user_dicts=(), stopwords_path=None):
+    """为当前进程准备 jieba 词典与停用词：缓存可用时直接载入，否则编译并写入缓存；返回缓存文件路径"""
+    global _loaded_dictionary
+    user_dicts = tuple(user_dicts)
+    path = dictionary_cache_path(cache_dir, user_dicts, stopwords_path)
+    if _loaded_dictionary == path:
+        return path  # 本进程已载入
+    import jieba
+    try:
+        header, freq = _read_dictionary(path)
+    except (OSError, ValueError, KeyError):
+        stop_words = compile_dictionary(path, user_dicts, stopwords_path)
+    else:
+        tokenizer = jieba.dt
+        with tokenizer.lock:
+            tokenizer.FREQ, tokenizer.total = freq, header['total']
+            tokenizer.user_word_tag_tab.update(header['tags'])
+            tokenizer.initialized = True
+        stop_words = header['stop_words']
+    STOP_WORDS.update(stop_words)
+    _loaded_dictionary = path
+    return path
+
+
+def init_worker(cache_dir=None, user_dicts=(), stopwords_path=None):
+    """进程池 worker 初始化：每个进程只加载一次 jieba 词典"""
+    load_dictionary(cache_dir, user_dicts, stopwords_path)
+
+
+def segment_batch(texts):
+    """在 worker 进程中批量分词"""
+    return [segment(text) for text in texts]
@@ -1,18 +1,85 @@
 import scrapy
-from scrapy_playwright.page import PageMethod
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
 import json
 import os
-from urllib.parse import quote # 用于URL编码
+import socket
+import time
+from datetime import datetime
+from urllib.parse import quote, urlparse # 用于URL编码
 from ..items import WeiboPostItem
+from ..dateparse import CST
+from ..pagination import KeywordCursor
+from ..auth import (DEFAULT_AUTH_STATE_PATH, build_cookie_header, cookies_for_host, is_login_url,
+                    load_storage_state, resolve_auth_state_path)
+from ..browser_pool import BrowserContextPool
+from ..browser_profile import BrowserProfile
+from ..metrics import get_metrics
+from ..frontier import KeywordFrontier
+from ..archive import EXTEND, GET_INDEX, ResponseArchive, iter_records, list_segments
+from ..rate_control import END_OF_RESULTS_MARKERS
+CONTAINERID_SEARCH_PREFIX = "100103type%3D61%26q%3D"
+POST_URL_PREFIX = "https://m.weibo.cn/detail/"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36" # 使用您常用的User-Agent
 
 
+def parse_count(count_str):
+    """把 '1.2万'、'3亿'、'100万+' 或整数形式的计数转换为 int"""
+    if not count_str: return 0
+    if isinstance(count_str, int):
+        return count_str
+    if isinstance(count_str, str):
+        count_str = count_str.strip().rstrip('+')
+        try:
+            if '万' in count_str:
+                return int(float(count_str.replace('万', '')) * 10000)
+            if '亿' in count_str:
+                return int(float(count_str.replace('亿', '')) * 100000000)
+        except ValueError:
+            return 0
+        if count_str.isdigit():
+            return int(count_str)
+    return 0 # 默认或无法解析时
+
+
+def extract_image_urls(mblog):
+    """从 mblog.pics 中取图片地址，优先使用大图"""
+    image_urls = []
+    for pic in mblog.get('pics') or []:
+        if not isinstance(pic, dict):
+            continue
+        url = (pic.get('large') or {}).get('url') or pic.get('url')
+        if url:
+            image_urls.append('http:' + url if url.startswith('//') else url)
+    return image_urls
+
+
 class WeiboSpider(scrapy.Spider):
     name = 'weibo'
+    log_cards = True # 逐页/逐条的 INFO 日志，回放时关闭 (日志记录本身是回放的主要开销)
     custom_settings = {
         'PLAYWRIGHT_BROWSER_TYPE': 'chromium',
     }
 
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        BrowserProfile.apply(settings)
+        # 浏览器模式下预先创建池中的认证上下文，避免首批请求冷启动
+        if settings.get('WEIBO_DOWNLOAD_MODE', 'http') == 'playwright' and not settings.getdict('PLAYWRIGHT_CONTEXTS'):
+            settings.set('PLAYWRIGHT_CONTEXTS',
+                         BrowserContextPool.contexts_setting(settings, resolve_auth_state_path(settings)),
+                         priority='spider')
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.metrics = get_metrics(crawler)
+        spider.archive = ResponseArchive.from_crawler(crawler)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        return spider
+
     async def _get_json_from_page(self, page, keyword_for_debug):
         """尝试从页面内容中提取JSON"""
         try:
@@ -41,201 +108,554 @@ class WeiboSpider(scrapy.Spider):
             self.logger.error(f"关键词 '{keyword_for_debug}': 从页面提取JSON时发生严重错误: {e}")
             return None
 
+    def _load_keywords(self):
+        """关键词来源优先级: -a keywords=/-a keywords_file= > WEIBO_KEYWORDS_FILE > WEIBO_KEYWORDS"""
+        keywords_arg = getattr(self, 'keywords', None)
+        if keywords_arg:
+            return [kw.strip() for kw in keywords_arg.split(',') if kw.strip()]
+        keywords_file = getattr(self, 'keywords_file', None) or self.settings.get('WEIBO_KEYWORDS_FILE')
+        if keywords_file:
+            try:
+                with open(keywords_file, 'r', encoding='utf-8') as f:
+                    keywords = [line.strip() for line in f if line.strip()]
+                self.logger.info(f"从文件 {keywords_file} 加载了 {len(keywords)} 个关键词。")
+                return keywords
+            except OSError as e:
+                self.logger.error(f"读取关键词文件 {keywords_file} 失败: {e}，改用 WEIBO_KEYWORDS。")
+        return self.settings.getlist('WEIBO_KEYWORDS', ["#正能量#"])
+
     def start_requests(self):
-        keywords = ["#正能量#"]
-        CONTAINERID_SEARCH_PREFIX = "100103type%3D61%26q%3D"
-        API_BASE_URL = "https://m.weibo.cn/api/container/getIndex"
-        storage_state_file_path = os.path.join(os.path.dirname(__file__), 'weibo_auth_state.json')
-        playwright_context_args = {}
-        if os.path.exists(storage_state_file_path):
-            playwright_context_args['storage_state'] = storage_state_file_path
-            self.logger.info(f"已配置使用会话状态文件: {storage_state_file_path}")
+        if getattr(self, 'replay', None):
+            yield from self._replay_requests()
+            return
+        self.api_base_url = self.settings.get('WEIBO_API_BASE_URL', "https://m.weibo.cn/api/container/getIndex")
+        self.download_mode = self.settings.get('WEIBO_DOWNLOAD_MODE', 'http')
+        self.storage_state_file_path = resolve_auth_state_path(self.settings)
+        if self.storage_state_file_path:
+            self.logger.info(f"已配置使用会话状态文件: {self.storage_state_file_path}")
         else:
-            self.logger.warning(f"会话状态文件 '{storage_state_file_path}' 未找到。爬虫将无法携带认证信息。")
-
-        for keyword in keywords:
-            keyword_url_encoded = quote(keyword)
-            full_containerid = f"{CONTAINERID_SEARCH_PREFIX}{keyword_url_encoded}"
-            api_url = f"{API_BASE_URL}?containerid={full_containerid}"
-            self.logger.info(f"关键词 '{keyword}': 准备请求 API URL: {api_url}")
-            meta = {
-                'playwright': True,
-                'playwright_include_page': True,
-                'playwright_context_args': playwright_context_args.copy(),
-                'playwright_page_methods': [
-                    PageMethod('goto', api_url, kwargs={"wait_until": "networkidle", "timeout": 30000}),
-                    PageMethod('wait_for_timeout', 2000),
-                ],
-                'playwright_headers': {
-                    'User-Agent': USER_AGENT,
-                    'Referer': 'https://m.weibo.cn/search',
-                    'X-Requested-With': 'XMLHttpRequest',
-                    'Accept': 'application/json, text/plain, */*',
-                },
-                'keyword': keyword,
-                'api_url': api_url
-            }
-            yield scrapy.Request(
-                api_url,
-                meta=meta,
-                callback=self.parse_api_response,
-                errback=self.errback_handle,
-            )
-async def parse_api_response(self, response):
-    keyword = response.meta['keyword']
-    api_url = response.meta['api_url']
-    page = response.meta.get("playwright_page")
-
-    self.logger.info(f"回调函数 parse_api_response - 关键词 '{keyword}', 请求URL: {api_url}")
-    if not page or page.is_closed():
-        self.logger.error(f"关键词 '{keyword}': 页面对象无效或已关闭 (parse_api_response)。")
-        return
-    current_url = page.url
-    if "login.sina.com.cn" in current_url or "passport.weibo.com" in current_url:
-        self.logger.error(f"关键词 '{keyword}': 请求API {api_url} 时被重定向到登录页: {current_url}。会话状态无效。")
-        await page.close()
-        return
-    json_data = await self._get_json_from_page(page, keyword)
-
-    if page and not page.is_closed():
-        await page.close()
-
-    if not json_data:
-        self.logger.error(f"关键词 '{keyword}': 未能从API响应 {api_url} 中获取有效的 JSON 数据。")
-        return
-    self.logger.info(f"关键词 '{keyword}': 成功获取API响应JSON数据 (部分): {str(json_data)[:500]}...")
-
-    cards = []
-    if isinstance(json_data, dict) and json_data.get('ok') == 1:
-        if 'cards' in json_data.get('data', {}):
-            cards = json_data['data']['cards']
-        elif 'cards' in json_data:
-            cards = json_data['cards']
-        else:
-            self.logger.warning(f"关键词 '{keyword}': JSON响应中未找到 'cards' 字段。响应结构: {list(json_data.keys())}")
-    else:
-        self.logger.error(f"关键词 '{keyword}': API响应表明请求失败或格式不正确。ok: {json_data.get('ok') if isinstance(json_data, dict) else 'N/A'}, msg: {json_data.get('msg') if isinstance(json_data, dict) else 'N/A'}")
-        return
-
-    if not cards:
-        self.logger.info(f"关键词 '{keyword}': API响应中没有找到任何卡片 (帖子)。")
-        return
-
-    for card_idx, card_group in enumerate(cards):
-        actual_cards_in_group = []
-        if isinstance(card_group, dict) and 'card_group' in card_group:
-             actual_cards_in_group.extend(card_group.get('card_group', []))
-        elif isinstance(card_group, dict): # 直接是card
-             actual_cards_in_group.append(card_group)
-
-        for card in actual_cards_in_group:
-            card_type = card.get('card_type')
-            if card_type == 9 or card_type == 11: 
-                mblog = card.get('mblog')
-                if not mblog:
-                    self.logger.warning(f"关键词 '{keyword}', 卡片组 {card_idx+1}: card_type {card_type} 但缺少 mblog 字段。")
-                    continue
-                item = WeiboPostItem()
-                item['text'] = mblog.get('text', '')
+            self.logger.warning(f"会话状态文件 '{self.settings.get('WEIBO_AUTH_STATE_PATH') or DEFAULT_AUTH_STATE_PATH}' 未找到。爬虫将无法携带认证信息。")
+        self.storage_state = load_storage_state(self.storage_state_file_path)
+        self.context_pool = BrowserContextPool.from_crawler(self.crawler, self.storage_state_file_path, logger=self.logger)
+        self.browser_profile = BrowserProfile.from_settings(self.settings)
+        self.logger.info(f"API 下载模式: {self.download_mode}，浏览器配置: {self.browser_profile.name}")
+        self.max_pages = self.settings.getint('WEIBO_MAX_PAGES', 10)
+        self.fanout = self.settings.getint('WEIBO_PAGE_FANOUT', 3)
+        self.cursors = {}
+        self.keyword_frontier = self._open_frontier()
+        if self.keyword_frontier is None:
+            for keyword in self._load_keywords():
+                yield self._start_keyword(keyword)
+            return
+        yield from self._lease_requests(self.settings.getint('WEIBO_FRONTIER_BATCH', 4))
+
+    def _open_frontier(self):
+        """-a frontier=<路径> 或 WEIBO_FRONTIER_PATH 指定时从共享前沿领取关键词；前沿为空时先用关键词列表填充"""
+        self.leased = set()
+        self.stalled = set()
+        path = getattr(self, 'frontier', None) or self.settings.get('WEIBO_FRONTIER_PATH')
+        if not path:
+            return None
+        frontier = KeywordFrontier(path, lease_ttl=self.settings.getfloat('WEIBO_FRONTIER_LEASE_TTL', 600)).open()
+        if not any(frontier.counts().values()):
+            added = frontier.add_keywords(self._load_keywords())
+            self.logger.info(f"关键词前沿 {path} 为空，已加入 {added} 个关键词。")
+        self.worker = getattr(self, 'worker', None) or f"{socket.gethostname()}-{os.getpid()}"
+        self.logger.info(f"使用关键词前沿 {path} (worker {self.worker}): {frontier.counts()}")
+        return frontier
 
-                user_info = mblog.get('user')
-                if user_info:
-                    item['author'] = user_info.get('screen_name', '')
+    def _lease_requests(self, limit):
+        """从前沿领取最多 limit 个关键词，产出它们的起始请求"""
+        while limit > 0:
+            leases = self.keyword_frontier.lease(self.worker, limit, exclude=self.stalled)
+            if not leases:
+                return
+            self.crawler.stats.inc_value('weibo/frontier/leased', len(leases))
+            limit = 0
+            for lease in leases:
+                self.leased.add(lease.keyword)
+                request = self._start_keyword(lease.keyword, lease)
+                if request is None:
+                    limit += 1  # 检查点显示已经抓完，补领一个
                 else:
-                    item['author'] = '未知作者'
+                    yield request
 
-                item['date'] = mblog.get('created_at', '') 
-                self.logger.info(f"关键词 '{keyword}', 卡片 {card_idx+1}: 提取到微博 - {item['text'][:30]}...")
-                if item['text']:
-                    yield item
-    
-async def parse_post_detail(self, response, post_url):
-    page = response.meta.get("playwright_page")
-    if page:
+    def _start_keyword(self, keyword, lease=None):
+        """为关键词建立分页游标并返回第一个请求；lease 带有检查点时从断点所在页继续"""
+        api_url = f"{self.api_base_url}?containerid={CONTAINERID_SEARCH_PREFIX}{quote(keyword)}"
+        cursor = KeywordCursor(keyword, api_url, max_pages=self.max_pages, fanout=self.fanout,
+                               stop_at=lease.last_seen_id if lease else None)
+        self.cursors[keyword] = cursor
+        page, url = 1, api_url
+        if lease and lease.page:
+            cursor.resume(lease.page, lease.since_id)
+            cursor.newest_id = lease.newest_id or None
+            if cursor.finished:
+                self._complete_keyword(cursor)
+                return None
+            page = lease.page + 1
+            url = cursor.page_url(page=page, since_id=lease.since_id)
+            self.crawler.stats.inc_value('weibo/frontier/resumed')
+            self.logger.info(f"关键词 '{keyword}': 从检查点继续，前 {lease.page} 页已处理。")
+        self.logger.info(f"关键词 '{keyword}': 准备请求 API URL: {url}")
+        cursor.scheduled_page = page
+        return self._build_api_request(keyword, url, page=page)
+
+    def _complete_keyword(self, cursor):
+        self.leased.discard(cursor.keyword)
+        if self.keyword_frontier.complete(cursor.keyword, self.worker, cursor.newest_id):
+            self.crawler.stats.inc_value('weibo/frontier/completed')
+            self.logger.info(f"关键词 '{cursor.keyword}': 本轮抓取完成，最新帖子 id {cursor.newest_id}。")
+
+    def _checkpoint(self, cursor, page, next_since_id=None, end=False):
+        """把处理完的页记入游标；使用前沿时保存检查点，关键词抓完后领取下一个关键词"""
+        advanced = cursor.mark_done(page, next_since_id, end=end)
+        if self.keyword_frontier is None or cursor.keyword not in self.leased:
+            return
+        if cursor.finished:
+            self._complete_keyword(cursor)
+            yield from self._lease_requests(1)
+        elif advanced and not self.keyword_frontier.checkpoint(
+                cursor.keyword, self.worker, cursor.checkpoint_page, cursor.checkpoint_since_id, cursor.newest_id):
+            # 租约过期后已被其他进程领走，本进程停止翻页
+            self.logger.warning(f"关键词 '{cursor.keyword}': 租约已被其他进程接管，停止翻页。")
+            self.leased.discard(cursor.keyword)
+            cursor.exhausted = True
+
+    def spider_idle(self):
+        """请求全部完成后交还没抓完的关键词 (保留检查点)，再领取一批；前沿里没有可领的关键词时才允许关闭"""
+        if getattr(self, 'keyword_frontier', None) is None:
+            return
+        for keyword in list(self.leased):
+            # 前序页请求失败导致检查点停住的关键词，交给下次运行或其他进程
+            self.keyword_frontier.release(keyword, self.worker)
+            self.stalled.add(keyword)
+            self.crawler.stats.inc_value('weibo/frontier/released')
+            self.logger.warning(f"关键词 '{keyword}': 有分页请求失败，已交还前沿，下次从检查点继续。")
+        self.leased.clear()
+        requests = list(self._lease_requests(self.settings.getint('WEIBO_FRONTIER_BATCH', 4)))
+        if not requests:
+            return
+        for request in requests:
+            self.crawler.engine.crawl(request)
+        raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        if self.archive is not None:
+            self.archive.close()
+            self.logger.info(f"响应存档: 本次写入 {self.archive.records} 条记录，{self.archive.segments} 个分段。")
+        if getattr(self, 'keyword_frontier', None) is None:
+            return
+        released = self.keyword_frontier.release_owner(self.worker)
+        self.logger.info(f"关键词前沿: 交还 {released} 个未完成的关键词，当前状态 {self.keyword_frontier.counts()}")
+        self.keyword_frontier.close()
+
+    def _build_api_request(self, keyword, api_url, page=1):
+        """按当前下载模式构造 getIndex 请求"""
+        if self.download_mode == 'playwright':
+            return self._build_playwright_request(keyword, api_url, page=page)
+        return self._build_http_request(keyword, api_url, page=page)
+
+    def _build_playwright_request(self, keyword, api_url, page=1, dont_filter=False):
+        """通过上下文池中的 Playwright 浏览器页面请求 getIndex API"""
+        meta = {
+            'playwright': True,
+            'playwright_page_goto_kwargs': self.browser_profile.goto_kwargs(),
+            'playwright_page_methods': self.browser_profile.page_methods(),
+            'playwright_headers': {
+                'User-Agent': USER_AGENT,
+                'Referer': 'https://m.weibo.cn/search',
+                'X-Requested-With': 'XMLHttpRequest',
+                'Accept': 'application/json, text/plain, */*',
+            },
+            'keyword': keyword,
+            'api_url': api_url,
+            'page': page,
+            'weibo_context_pool': True, # 上下文槽位由 ContextPoolMiddleware 在下载前分配
+        }
+        return scrapy.Request(
+            api_url,
+            meta=meta,
+            callback=self.parse_api_response,
+            errback=self.errback_handle,
+            dont_filter=dont_filter,
+        )
+
+    def _api_headers(self, url, referer='https://m.weibo.cn/search'):
+        """m.weibo.cn JSON 接口的请求头，携带会话 cookie 与 XSRF token"""
+        headers = {
+            'User-Agent': USER_AGENT,
+            'Referer': referer,
+            'X-Requested-With': 'XMLHttpRequest',
+            'MWeibo-Pwa': '1',
+            'Accept': 'application/json, text/plain, */*',
+        }
+        cookies = cookies_for_host(self.storage_state, urlparse(url).hostname or '')
+        if cookies:
+            headers['Cookie'] = build_cookie_header(cookies)
+            if 'XSRF-TOKEN' in cookies:
+                headers['X-XSRF-TOKEN'] = cookies['XSRF-TOKEN']
+        return headers
+
+    def _build_http_request(self, keyword, api_url, page=1):
+        """使用 Scrapy 普通 HTTP 下载器直接请求 getIndex JSON 接口，携带会话 cookie"""
+        headers = self._api_headers(api_url)
+        meta = {
+            'dont_redirect': True,
+            'handle_httpstatus_list': [301, 302, 303, 307, 308],
+            'weibo_stage': 'api_download',
+            'keyword': keyword,
+            'api_url': api_url,
+            'page': page,
+        }
+        return scrapy.Request(
+            api_url,
+            headers=headers,
+            meta=meta,
+            callback=self.parse_http_api_response,
+            errback=self.errback_handle,
+        )
+
+    def parse_http_api_response(self, response):
+        """HTTP 快速通道回调：遇到登录重定向或非 JSON 响应时回退到浏览器页面"""
+        keyword = response.meta['keyword']
+        api_url = response.meta['api_url']
+        page = response.meta.get('page', 1)
+        if 300 <= response.status < 400:
+            location = response.headers.get('Location', b'').decode('utf-8', 'ignore')
+            if is_login_url(location):
+                self.logger.warning(f"关键词 '{keyword}': HTTP 请求被重定向到登录页 {location}，回退到浏览器模式。")
+            else:
+                self.logger.warning(f"关键词 '{keyword}': HTTP 请求返回重定向 {response.status} -> {location}，回退到浏览器模式。")
+            self.crawler.stats.inc_value('weibo/http_fallback/redirect')
+            yield self._build_playwright_request(keyword, api_url, page=page, dont_filter=True)
+            return
         try:
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await page.wait_for_timeout(3000) 
-            await page.evaluate("window.scrollTo(0, 0)")
-            await page.wait_for_timeout(1000)
-            new_content = await page.content()
-            response = response.replace(body=new_content)
-        except Exception as e:
-            self.logger.warning(f"在详情页 {response.url} Playwright 操作失败: {e}")
+            json_data = json.loads(response.text)
+        except (AttributeError, ValueError):
+            self.logger.warning(f"关键词 '{keyword}': HTTP 响应不是 JSON (前200字符): {response.body[:200]!r}，回退到浏览器模式。")
+            self.crawler.stats.inc_value('weibo/http_fallback/non_json')
+            yield self._build_playwright_request(keyword, api_url, page=page, dont_filter=True)
+            return
+        self.crawler.stats.inc_value('weibo/http_fast_path/ok')
+        yield from self._parse_cards(json_data, response.meta)
+
+    async def parse_api_response(self, response):
+        keyword = response.meta['keyword']
+        api_url = response.meta['api_url']
+        page = response.meta.get("playwright_page")
+
+        self.logger.info(f"回调函数 parse_api_response - 关键词 '{keyword}', 请求URL: {api_url}")
+        if not page or page.is_closed():
+            self.logger.error(f"关键词 '{keyword}': 页面对象无效或已关闭 (parse_api_response)。")
+            await self.context_pool.release(None, response.meta)
+            return
+        current_url = page.url
+        login_redirect = is_login_url(current_url)
+        try:
+            if login_redirect:
+                self.logger.error(f"关键词 '{keyword}': 请求API {api_url} 时被重定向到登录页: {current_url}。会话状态无效。")
+                return
+            start = time.perf_counter()
+            json_data = await self.context_pool.captured_json(page, timeout=self.browser_profile.remaining(response.meta))
+            if self.metrics:
+                self.metrics.observe('page_json_capture', time.perf_counter() - start)
+            if json_data is None:
+                start = time.perf_counter()
+                json_data = await self._get_json_from_page(page, keyword)
+                if self.metrics:
+                    self.metrics.observe('page_json_dom', time.perf_counter() - start)
         finally:
-            if page and not page.is_closed():
-                await page.close()
-
-    item = WeiboPostItem()
-    item['post_url'] = post_url
-    text_content_parts = response.css('div.WB_text ::text').getall() 
-    full_text = "".join(text_content_parts).strip()
-    if not full_text: 
-        text_content_parts = response.css('div.detail_wbtext_wrap ::text').getall() 
-        full_text = "".join(text_content_parts).strip()
-    item['text'] = full_text
-    author_name = response.css('div.WB_info a.W_f14::text').get()
-    if not author_name:
-            author_name = response.css('div.Feed_User_Nick a::text').get()
-    item['author'] = author_name.strip() if author_name else "未知作者"
-    date_str = response.css('div.WB_from a[suda-data*="time"]::text').get() 
-    if not date_str:
-        date_str = response.css('div.Frame_ λειτουργίες a.S_txt2::text').get()
-    if not date_str:
-        time_elements = response.xpath("//*[contains(text(),'发布于')]/following-sibling::span/text() | //*[contains(text(),'发布于')]/following-sibling::a/text()").getall()
-        date_str = " ".join(time_elements).strip() if time_elements else "未知时间"
-    item['date'] = date_str.strip()
-    repost_count_raw = response.css('a[action-type="feed_list_forward"] span em::text').get()
-    if not repost_count_raw: 
-        repost_count_raw = response.xpath("//*[contains(text(),'转发')]/ancestor::a/span/em/text() | //*[contains(text(),'转发')]/strong/text()").get()
-    comment_count_raw = response.css('a[action-type="feed_list_comment"] span em::text').get()
-    if not comment_count_raw:
-        comment_count_raw = response.xpath("//*[contains(text(),'评论')]/ancestor::a/span/em/text() | //*[contains(text(),'评论')]/strong/text()").get()
-    like_count_raw = response.css('a[action-type="feed_list_like"] span em::text').get()
-    if not like_count_raw:
-            like_count_raw = response.css('button.woo-like- meisjes span.woo-like-count::text').get()
-    if not like_count_raw:
-        like_count_raw = response.xpath("//*[contains(text(),'赞')]/ancestor::button/span/text() | //*[contains(text(),'赞')]/ancestor::a/span/em/text() | //*[contains(text(),'赞')]/strong/text()").get()
-
-
-    def parse_count(count_str):
-        if not count_str: return 0
-        if isinstance(count_str, str):
-            if '万' in count_str:
-                return int(float(count_str.replace('万', '')) * 10000)
-            if '亿' in count_str:
-                return int(float(count_str.replace('亿', '')) * 100000000)
-            if count_str.isdigit():
-                return int(count_str)
-        return 0 # 默认或无法解析时
-
-    item['metrics'] = {
-        'reposts': parse_count(repost_count_raw),
-        'comments': parse_count(comment_count_raw),
-        'likes': parse_count(like_count_raw),
-    }
-    image_urls = []
-    # 查找包含图片的 div 容器
-    media_boxes = response.css('div.media_box ul li img::attr(src)').getall() # 多图情况
-    if not media_boxes:
-            media_boxes = response.css('div.WB_pic img::attr(src)').getall() # 单图情况
-
-    for img_src in media_boxes:
-        if img_src:
-            # 有些图片链接可能是 // 开头，需要补全协议
-            if img_src.startswith('//'):
-                image_urls.append('http:' + img_src)
+            await self.context_pool.release(page, response.meta, login_redirect=login_redirect)
+
+        for item in self._parse_cards(json_data, response.meta):
+            yield item
+
+    def _replay_requests(self):
+        """-a replay=<目录/文件/通配符,...>: 每个存档分段一个 data: 请求，回调里离线解析，不访问网络也不启动浏览器"""
+        self.archive = None
+        self.log_cards = False
+        self.cursors = {}
+        self.storage_state = None
+        self.keyword_frontier = None
+        segments = list_segments([path for path in self.replay.split(',') if path])
+        self.logger.info(f"离线回放 {len(segments)} 个存档分段。")
+        for segment in segments:
+            yield scrapy.Request(f"data:,{quote(segment)}", callback=self.replay_segment,
+                                 cb_kwargs={'segment': segment}, dont_filter=True)
+
+    def replay_segment(self, response, segment):
+        """按存档顺序把 getIndex 记录交给 _parse_cards，长微博用同一分段里存档的 extend 响应补全"""
+        pending = {}
+        records = 0
+        for record in iter_records(segment):
+            records += 1
+            if record.get('kind') == EXTEND:
+                item = pending.pop(str(record.get('post_id')), None)
+                if item is not None:
+                    self._apply_long_text(item, record.get('body'))
+                    yield item
+                continue
+            meta = {'keyword': record.get('keyword'), 'api_url': record.get('url'), 'page': record.get('page') or 1}
+            fetched_at = datetime.fromisoformat(record['fetched_at']) if record.get('fetched_at') else None
+            for output in self._parse_cards(record.get('body'), meta, fetched_at=fetched_at):
+                if isinstance(output, scrapy.Request):
+                    # 回放时不发出翻页与全文请求
+                    item = output.cb_kwargs.get('item')
+                    if item is not None:
+                        pending[item['post_id']] = item
+                    continue
+                yield output
+        self.crawler.stats.inc_value('weibo/replay/records', records)
+        # 存档里没有全文的长微博保留截断正文
+        yield from pending.values()
+
+    def _parse_cards(self, json_data, meta, fetched_at=None):
+        """解析 getIndex 返回的 JSON，逐条产出微博 Item，并按游标调度后续分页请求"""
+        keyword = meta['keyword']
+        api_url = meta['api_url']
+        if fetched_at is None:
+            fetched_at = datetime.now(CST)
+            if self.archive is not None and isinstance(json_data, dict):
+                self.archive.write(GET_INDEX, json_data, keyword=keyword, page=meta.get('page', 1), url=api_url,
+                                   fetched_at=fetched_at)
+        if not json_data:
+            self.logger.error(f"关键词 '{keyword}': 未能从API响应 {api_url} 中获取有效的 JSON 数据。")
+            return
+        if self.log_cards:
+            self.logger.info(f"关键词 '{keyword}': 成功获取API响应JSON数据 (部分): {str(json_data)[:500]}...")
+
+        cards = []
+        if isinstance(json_data, dict) and json_data.get('ok') == 1:
+            if 'cards' in json_data.get('data', {}):
+                cards = json_data['data']['cards']
+            elif 'cards' in json_data:
+                cards = json_data['cards']
             else:
-                image_urls.append(img_src)
-    item['image_urls'] = image_urls
+                self.logger.warning(f"关键词 '{keyword}': JSON响应中未找到 'cards' 字段。响应结构: {list(json_data.keys())}")
+        else:
+            message = str(json_data.get('msg') or '') if isinstance(json_data, dict) else ''
+            if any(marker in message for marker in END_OF_RESULTS_MARKERS):
+                self.logger.info(f"关键词 '{keyword}': 没有更多结果 ({message})。")
+                yield from self._mark_exhausted(meta)
+                return
+            page = meta.get('page', 1)
+            self.logger.error(f"关键词 '{keyword}': 第 {page} 页API响应表明请求失败或格式不正确，因出错停止翻页。ok: {json_data.get('ok') if isinstance(json_data, dict) else 'N/A'}, msg: {message or 'N/A'}")
+            # 不记为处理完：使用前沿时该关键词停在检查点，空闲时交还
+            cursor = self.cursors.get(keyword)
+            if cursor and cursor.stop_on_error(page):
+                self.crawler.stats.inc_value('weibo/keywords/stopped_on_error')
+            return
+
+        if not cards:
+            self.logger.info(f"关键词 '{keyword}': API响应中没有找到任何卡片 (帖子)。")
+            yield from self._mark_exhausted(meta)
+            return
+
+        post_ids = []
+        for card_idx, card_group in enumerate(cards):
+            actual_cards_in_group = []
+            if isinstance(card_group, dict) and 'card_group' in card_group:
+                 actual_cards_in_group.extend(card_group.get('card_group', []))
+            elif isinstance(card_group, dict): # 直接是card
+                 actual_cards_in_group.append(card_group)
+
+            for card in actual_cards_in_group:
+                card_type = card.get('card_type')
+                if card_type == 9 or card_type == 11:
+                    mblog = card.get('mblog')
+                    if not mblog:
+                        self.logger.warning(f"关键词 '{keyword}', 卡片组 {card_idx+1}: card_type {card_type} 但缺少 mblog 字段。")
+                        continue
+                    post_id = mblog.get('id') or mblog.get('mid')
+                    if post_id:
+                        post_ids.append(str(post_id))
+                    item = WeiboPostItem()
+                    if post_id:
+                        item['post_id'] = str(post_id)
+                    item['text'] = mblog.get('text', '')
+
+                    user_info = mblog.get('user')
+                    if user_info:
+                        item['author'] = user_info.get('screen_name', '')
+                    else:
+                        item['author'] = '未知作者'
+
+                    item['date'] = mblog.get('created_at', '')
+                    item['fetched_at'] = fetched_at
+                    item['keyword'] = keyword
+                    item['metrics'] = {
+                        'reposts': parse_count(mblog.get('reposts_count')),
+                        'comments': parse_count(mblog.get('comments_count')),
+                        'likes': parse_count(mblog.get('attitudes_count')),
+                    }
+                    item['image_urls'] = extract_image_urls(mblog)
+                    if post_id:
+                        item['post_url'] = f"{POST_URL_PREFIX}{post_id}"
+                    if self.log_cards:
+                        self.logger.info(f"关键词 '{keyword}', 卡片 {card_idx+1}: 提取到微博 - {item['text'][:30]}...")
+                    if not item['text']:
+                        continue
+                    if mblog.get('isLongText') and post_id:
+                        # 仅长微博需要额外请求一次 extend 接口获取全文
+                        yield self._build_long_text_request(item)
+                    else:
+                        yield item
 
-    self.logger.info(f"成功解析帖子: {item.get('author')}, 赞: {item['metrics']['likes']}")
-    yield item
+        cardlist_info = json_data.get('data', {}).get('cardlistInfo') or {}
+        yield from self._schedule_next_pages(meta, post_ids, cardlist_info)
 
-async def errback_handle(self, failure):
-    self.logger.error(f"请求失败: {failure.request.url}, 错误类型: {failure.type}, 错误信息: {failure.value}")
-    page = failure.request.meta.get("playwright_page")
-    if page and not page.is_closed(): # 如果错误发生时page还存在，尝试关闭
+    def _build_long_text_request(self, item):
+        """请求 statuses/extend 接口补全长微博全文"""
+        long_text_url = f"{self.settings.get('WEIBO_LONGTEXT_URL', 'https://m.weibo.cn/statuses/extend')}?id={item['post_id']}"
+        return scrapy.Request(
+            long_text_url,
+            headers=self._api_headers(long_text_url, referer=item['post_url']),
+            meta={'dont_redirect': True, 'handle_httpstatus_list': [301, 302, 303, 307, 308],
+                  'weibo_stage': 'long_text_download'},
+            callback=self.parse_long_text,
+            errback=self.errback_long_text,
+            cb_kwargs={'item': item},
+        )
+
+    def parse_long_text(self, response, item):
+        """用 extend 接口返回的 longTextContent 替换截断的正文；失败时保留原正文"""
         try:
-            await page.close()
-        except Exception as e:
-            self.logger.warning(f"关闭Playwright页面时出错 (errback): {e}")
\ No newline at end of file
+            json_data = json.loads(response.text)
+        except (AttributeError, ValueError):
+            json_data = None
+        if self.archive is not None and isinstance(json_data, dict):
+            self.archive.write(EXTEND, json_data, keyword=item.get('keyword'), url=response.url,
+                               post_id=item.get('post_id'), fetched_at=item.get('fetched_at'))
+        if not self._apply_long_text(item, json_data):
+            self.logger.warning(f"帖子 {item.get('post_id')}: 获取长微博全文失败 (status {response.status})，保留截断正文。")
+        yield item
+
+    def _apply_long_text(self, item, json_data):
+        long_text = None
+        if isinstance(json_data, dict) and json_data.get('ok') == 1:
+            long_text = (json_data.get('data') or {}).get('longTextContent')
+        if long_text:
+            item['text'] = long_text
+            self.crawler.stats.inc_value('weibo/long_text/ok')
+            return True
+        self.crawler.stats.inc_value('weibo/long_text/failed')
+        return False
+
+    def errback_long_text(self, failure):
+        item = failure.request.cb_kwargs['item']
+        self.logger.warning(f"帖子 {item.get('post_id')}: 长微博全文请求失败: {failure.value}，保留截断正文。")
+        self.crawler.stats.inc_value('weibo/long_text/failed')
+        yield item
+
+    def _mark_exhausted(self, meta):
+        cursor = self.cursors.get(meta['keyword'])
+        if cursor:
+            yield from self._checkpoint(cursor, meta.get('page', 1), end=True)
+
+    def _schedule_next_pages(self, meta, post_ids, cardlist_info):
+        """根据游标决定是否继续翻页：达到深度、空页或整页都是已见帖子时停止"""
+        keyword = meta['keyword']
+        page = meta.get('page', 1)
+        cursor = self.cursors.get(keyword)
+        if cursor is None:
+            return
+        new_count = cursor.observe(post_ids)
+        if cursor.exhausted:
+            self.logger.info(f"关键词 '{keyword}': 第 {page} 页没有新帖子，停止翻页 (共处理 {cursor.pages_done} 页)。")
+            yield from self._checkpoint(cursor, page, end=not new_count)
+            return
+        self.crawler.stats.inc_value('weibo/pages/new_posts', new_count)
+
+        since_id = cardlist_info.get('since_id')
+        if since_id:
+            yield from self._checkpoint(cursor, page, next_since_id=since_id)
+            # since_id 游标只能顺序推进
+            if cursor.pages_done >= cursor.max_pages or cursor.stopped:
+                return
+            cursor.since_id = since_id
+            cursor.scheduled_page = max(cursor.scheduled_page, page + 1)
+            yield self._build_api_request(keyword, cursor.page_url(since_id=since_id), page=page + 1)
+            return
+        if not cardlist_info.get('page'):
+            yield from self._checkpoint(cursor, page, end=True)
+            return
+        yield from self._checkpoint(cursor, page)
+        for next_page in cursor.next_pages(page):
+            yield self._build_api_request(keyword, cursor.page_url(page=next_page), page=next_page)
+
+    async def parse_post_detail(self, response, post_url):
+        page = response.meta.get("playwright_page")
+        if page:
+            try:
+                await self.browser_profile.settle_detail(page, response.meta)
+                new_content = await page.content()
+                response = response.replace(body=new_content)
+            except Exception as e:
+                self.logger.warning(f"在详情页 {response.url} Playwright 操作失败: {e}")
+            finally:
+                await self.context_pool.release(page, response.meta)
+
+        item = WeiboPostItem()
+        item['post_url'] = post_url
+        text_content_parts = response.css('div.WB_text ::text').getall()
+        full_text = "".join(text_content_parts).strip()
+        if not full_text:
+            text_content_parts = response.css('div.detail_wbtext_wrap ::text').getall()
+            full_text = "".join(text_content_parts).strip()
+        item['text'] = full_text
+        author_name = response.css('div.WB_info a.W_f14::text').get()
+        if not author_name:
+                author_name = response.css('div.Feed_User_Nick a::text').get()
+        item['author'] = author_name.strip() if author_name else "未知作者"
+        date_str = response.css('div.WB_from a[suda-data*="time"]::text').get()
+        if not date_str:
+            date_str = response.css('div.Frame_ λειτουργίες a.S_txt2::text').get()
+        if not date_str:
+            time_elements = response.xpath("//*[contains(text(),'发布于')]/following-sibling::span/text() | //*[contains(text(),'发布于')]/following-sibling::a/text()").getall()
+            date_str = " ".join(time_elements).strip() if time_elements else "未知时间"
+        item['date'] = date_str.strip()
+        repost_count_raw = response.css('a[action-type="feed_list_forward"] span em::text').get()
+        if not repost_count_raw:
+            repost_count_raw = response.xpath("//*[contains(text(),'转发')]/ancestor::a/span/em/text() | //*[contains(text(),'转发')]/strong/text()").get()
+        comment_count_raw = response.css('a[action-type="feed_list_comment"] span em::text').get()
+        if not comment_count_raw:
+            comment_count_raw = response.xpath("//*[contains(text(),'评论')]/ancestor::a/span/em/text() | //*[contains(text(),'评论')]/strong/text()").get()
+        like_count_raw = response.css('a[action-type="feed_list_like"] span em::text').get()
+        if not like_count_raw:
+                like_count_raw = response.css('button.woo-like- meisjes span.woo-like-count::text').get()
+        if not like_count_raw:
+            like_count_raw = response.xpath("//*[contains(text(),'赞')]/ancestor::button/span/text() | //*[contains(text(),'赞')]/ancestor::a/span/em/text() | //*[contains(text(),'赞')]/strong/text()").get()
+
+
+        item['metrics'] = {
+            'reposts': parse_count(repost_count_raw),
+            'comments': parse_count(comment_count_raw),
+            'likes': parse_count(like_count_raw),
+        }
+        image_urls = []
+        # 查找包含图片的 div 容器
+        media_boxes = response.css('div.media_box ul li img::attr(src)').getall() # 多图情况
+        if not media_boxes:
+                media_boxes = response.css('div.WB_pic img::attr(src)').getall() # 单图情况
+
+        for img_src in media_boxes:
+            if img_src:
+                # 有些图片链接可能是 // 开头，需要补全协议
+                if img_src.startswith('//'):
+                    image_urls.append('http:' + img_src)
+                else:
+                    image_urls.append(img_src)
+        item['image_urls'] = image_urls
+
+        self.logger.info(f"成功解析帖子: {item.get('author')}, 赞: {item['metrics']['likes']}")
+        yield item
+
+    async def errback_handle(self, failure):
+        self.logger.error(f"请求失败: {failure.request.url}, 错误类型: {failure.type}, 错误信息: {failure.value}")
+        page = failure.request.meta.get("playwright_page")
+        if page is not None or 'weibo_pool_slot' in failure.request.meta: # 归还上下文槽位，出错的页面直接关闭
+            try:
+                await self.context_pool.release(page, failure.request.meta, broken=True)
+            except Exception as e:
+                self.logger.warning(f"关闭Playwright页面时出错 (errback): {e}")
\ No newline at end of file